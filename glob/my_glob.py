@@ -4,7 +4,9 @@ from pathlib import Path
 from typing import List
 
 
-def glob(pattern: str, case_sensitive: bool = True) -> List[Path]:
+def glob(
+    pattern: str, case_sensitive: bool = True, dir_cache=None
+) -> List[Path]:
     """
     pathlibを用いたglob関数。大文字小文字の区別を制御可能。
 
@@ -13,6 +15,8 @@ def glob(pattern: str, case_sensitive: bool = True) -> List[Path]:
         case_sensitive: Trueなら大文字小文字を区別する。Falseなら区別しない。
                         (Windowsなどの区別しないファイルシステムでTrueにした場合、
                          厳密にフィルタリングして返す)
+        dir_cache: ディレクトリ一覧のキャッシュ (pyetc の dir_cache.DirCache)。
+                   指定するとファイルシステムを読む代わりにその一覧を使う。
 
     Returns:
         Pathオブジェクトのリスト
@@ -78,13 +82,17 @@ def glob(pattern: str, case_sensitive: bool = True) -> List[Path]:
         try:
             # target_nameが大文字小文字違っても見つけるため
             found = []
-            for item in parent.iterdir():
+            if dir_cache is not None:
+                names = [e.name for e in dir_cache.list_dir(str(parent))]
+            else:
+                names = [item.name for item in parent.iterdir()]
+            for name in names:
                 if case_sensitive:
-                    if item.name == target_name:
-                        found.append(item)
+                    if name == target_name:
+                        found.append(parent / name)
                 else:
-                    if item.name.lower() == target_name.lower():
-                        found.append(item)
+                    if name.lower() == target_name.lower():
+                        found.append(parent / name)
             return found
         except OSError:
             return []
@@ -99,7 +107,19 @@ def glob(pattern: str, case_sensitive: bool = True) -> List[Path]:
         search_pattern = _make_case_insensitive(search_pattern)
 
     # pathlib.Path.glob を実行
-    candidates = list(current_root.glob(search_pattern))
+    if dir_cache is not None:
+        # キャッシュした一覧で同じ検索をする（pathlib と同じく隠しファイルも
+        # 候補に含め、末尾の "**" はディレクトリだけにマッチさせる）
+        candidates = [
+            Path(p)
+            for p in dir_cache.glob(
+                search_pattern, str(current_root), include_hidden=True
+            )
+        ]
+        if search_parts[-1] == "**":
+            candidates = [c for c in candidates if c.is_dir()]
+    else:
+        candidates = list(current_root.glob(search_pattern))
 
     # 隠しファイル除外ロジック (Python標準globに合わせる)パターンの各
     # コンポーネントの先頭が '.' でないのに、マッチしたパスの対応する
@@ -0,0 +1,69 @@
+"""Aho-Corasick 法による複数リテラルの同時検索。
+
+登録した全てのリテラルを、テキストを1回なめるだけで（重なりも含めて）
+見つけます。GrepTool.execute_many() で、どのリテラルパターンが行に
+含まれるかを一度に調べるのに使います。
+"""
+
+from collections import deque
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+
+class AhoCorasick:
+    """
+    words に渡したリテラルを同時に検索するオートマトンです。
+    見つかったリテラルは words 内のインデックスで返します。
+    """
+
+    def __init__(self, words: Sequence[str]):
+        self.words = list(words)
+        # ノードごとの遷移表、失敗遷移、出力（そのノードで終わる単語）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for i, word in enumerate(self.words):
+            self._add(word, i)
+        self._build()
+
+    def _add(self, word: str, index: int) -> None:
+        node = 0
+        for c in word:
+            nxt = self._goto[node].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(index)
+
+    def _build(self) -> None:
+        """幅優先で失敗遷移を張り、出力を失敗遷移先から引き継ぎます"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                fail = self._goto[f].get(c, 0)
+                self._fail[nxt] = fail if fail != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(終了位置, 単語インデックス) を出現順に返します"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for pos, c in enumerate(text):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            for index in out[node]:
+                yield pos + 1, index
+
+    def matched_indexes(self, text: str) -> Set[int]:
+        """text に含まれる単語のインデックス集合を返します"""
+        return {index for _, index in self.iter_matches(text)}
@@ -0,0 +1,441 @@
+"""ReadFileTool 用の、圧縮ファイル (.gz / .xz) の行索引。
+
+圧縮ファイルは途中から展開を始められないので、一度だけ全体を展開して
+行数を数え、そのとき途中から展開を再開するためのチェックポイントを
+記録しておきます。offset 行目からの読み込みでは、直前のチェックポイントから
+展開するだけで済みます。
+
+- gzip: 一定量（CHECKPOINT_SPAN）展開するごとに、展開器 (zlib.Decompress)
+  の状態をコピーして覚えます（zran の再開点と同じ考え方。Python の zlib には
+  ビット位置から再開する API が無いので、状態ごとメモリに持ちます）。
+- xz: ファイル末尾のインデックスからブロックの位置を読み、各ブロックの
+  先頭をチェックポイントにします（ブロックは単独で展開できる）。
+  ブロックが1つしかないファイル（xz を単一スレッドで作ったもの）は
+  先頭からしか展開できません。
+"""
+
+import abc
+import io
+import lzma
+import os
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from line_index import count_line_breaks
+
+# 拡張子と圧縮形式
+COMPRESSED_SUFFIXES = {".gz": "gzip", ".xz": "xz"}
+
+# gzip のチェックポイントの間隔（展開後のバイト数）
+# チェックポイント1つあたり、展開器の状態（辞書 32KB を含む）を持つ
+CHECKPOINT_SPAN = 8 * 1024 * 1024
+
+# 圧縮データの読み込み単位
+COMPRESSED_CHUNK_SIZE = 64 * 1024
+
+# 1回の展開で取り出す最大バイト数
+OUTPUT_CHUNK_SIZE = 1024 * 1024
+
+# zlib の展開器の型（モジュールからは名前で参照できない）
+_Decompress = type(zlib.decompressobj())
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+_XZ_FOOTER_MAGIC = b"YZ"
+_BCJ_FILTERS = (
+    lzma.FILTER_X86,
+    lzma.FILTER_POWERPC,
+    lzma.FILTER_IA64,
+    lzma.FILTER_ARM,
+    lzma.FILTER_ARMTHUMB,
+    lzma.FILTER_SPARC,
+)
+
+
+def compression_format(file_path: str) -> Optional[str]:
+    """拡張子から圧縮形式 ("gzip" / "xz") を返します。圧縮でなければ None"""
+    return COMPRESSED_SUFFIXES.get(os.path.splitext(file_path)[1].lower())
+
+
+class _LineCounter:
+    """展開したバイト列を順に受け取り、改行の数を数えます"""
+
+    def __init__(self):
+        self.breaks = 0
+        self.last: Optional[int] = None
+
+    def feed(self, data: bytes) -> None:
+        if not data:
+            return
+        # 境界で分かれた \r\n を2回数えないようにする
+        if self.last == 0x0D and data[0] == 0x0A:
+            self.breaks -= 1
+        self.breaks += count_line_breaks(data, 0, len(data), b"\r" in data)
+        self.last = data[-1]
+
+    @property
+    def line_count(self) -> int:
+        # 最後の行が改行で終わっていなくても1行として数える
+        if self.last is not None and self.last not in (0x0A, 0x0D):
+            return self.breaks + 1
+        return self.breaks
+
+
+class _ChunkReader(io.RawIOBase):
+    """バイト列のイテレータを読み込み可能なストリームに見せます"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buf = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buf = memoryview(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+class CompressedLineIndex(abc.ABC):
+    """
+    圧縮ファイルの行索引の共通部分です。
+    k 番目のチェックポイントから展開を再開すると、最初の改行までは
+    lines[k] 行目 (0-based) の続きです（行の途中から始まることがある）。
+    """
+
+    def __init__(
+        self, size: int, mtime_ns: int, line_count: int, lines: array
+    ):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.line_count = line_count
+        self.lines = lines
+
+    @classmethod
+    def build(
+        cls, file_path: str, st: os.stat_result
+    ) -> "CompressedLineIndex":
+        """拡張子に応じた索引を作ります"""
+        if compression_format(file_path) == "xz":
+            return XzLineIndex.build(file_path, st)
+        return GzipLineIndex.build(file_path, st)
+
+    @classmethod
+    def load(cls, sidecar_path: str) -> None:
+        # 展開器の状態は保存できないので、サイドカーは使わない
+        return None
+
+    def extend(self, file_path: str, st: os.stat_result) -> None:
+        # 圧縮ファイルは追記で伸ばせないので、変わったら作り直す
+        return None
+
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.mtime_ns, self.size) == (st.st_mtime_ns, st.st_size)
+
+    def read_lines(self, file_path: str, start: int, count: int) -> List[str]:
+        """
+        start 行目 (0-based) から最大 count 行を返します。
+        展開するのは直前のチェックポイントから読み終わりまでです。
+        """
+        if start >= self.line_count or count <= 0:
+            return []
+
+        # start 行目より前で始まるチェックポイントのうち最後のもの
+        k = max(bisect_left(self.lines, start) - 1, 0)
+        result = []
+        with open(file_path, "rb") as f:
+            reader = io.BufferedReader(_ChunkReader(self._stream(f, k)))
+            with io.TextIOWrapper(
+                reader, encoding="utf-8", errors="replace"
+            ) as text:
+                for _ in range(start - self.lines[k]):
+                    if not text.readline():
+                        return []
+                for _ in range(count):
+                    line = text.readline()
+                    if not line:
+                        break
+                    result.append(line)
+        return result
+
+    @abc.abstractmethod
+    def _stream(self, f: BinaryIO, k: int) -> Iterator[bytes]:
+        """k 番目のチェックポイントから末尾までの展開結果"""
+
+
+# --- gzip ---
+def _inflate(
+    f: BinaryIO, comp_pos: int, d: Optional[_Decompress]
+) -> Iterator[Tuple[bytes, int, Optional[_Decompress]]]:
+    """
+    圧縮データの comp_pos から展開を続け、(展開結果, 消費した位置, 展開器)
+    を返します。d が None なら comp_pos から新しいメンバーが始まります。
+    展開器が None で返るのはメンバーの切れ目です。
+    連結された gzip（複数メンバー）も続けて展開します。
+    """
+    f.seek(comp_pos)
+    data = b""
+    while True:
+        if d is None:
+            # 次のメンバーの先頭。末尾の 0 埋めなどは無視して終わる
+            while len(data) < 2:
+                more = f.read(COMPRESSED_CHUNK_SIZE)
+                if not more:
+                    break
+                data += more
+            if data[:2] != _GZIP_MAGIC:
+                return
+            d = zlib.decompressobj(wbits=31)
+
+        if not data:
+            data = f.read(COMPRESSED_CHUNK_SIZE)
+            if not data:
+                raise EOFError(
+                    "Compressed file ended before the end-of-stream marker "
+                    "was reached"
+                )
+
+        out = d.decompress(data, OUTPUT_CHUNK_SIZE)
+        if d.eof:
+            rest = d.unused_data
+            comp_pos += len(data) - len(rest)
+            data = rest
+            d = None
+        else:
+            comp_pos += len(data) - len(d.unconsumed_tail)
+            data = d.unconsumed_tail
+        yield out, comp_pos, d
+
+
+class GzipLineIndex(CompressedLineIndex):
+    """
+    gzip の行索引です。states[k] は k 番目のチェックポイントの
+    (圧縮データ上の位置, その時点の展開器のコピー) です。
+    """
+
+    def __init__(
+        self,
+        size: int,
+        mtime_ns: int,
+        line_count: int,
+        lines: array,
+        states: List[Tuple[int, Optional[_Decompress]]],
+    ):
+        super().__init__(size, mtime_ns, line_count, lines)
+        self.states = states
+
+    @classmethod
+    def build(cls, file_path: str, st: os.stat_result) -> "GzipLineIndex":
+        counter = _LineCounter()
+        lines = array("Q", [0])
+        states = [(0, None)]
+        produced = 0
+        next_checkpoint = CHECKPOINT_SPAN
+
+        with open(file_path, "rb") as f:
+            for out, comp_pos, d in _inflate(f, 0, None):
+                counter.feed(out)
+                produced += len(out)
+                # \r の直後は次が \n かどうか分からないので見送る
+                if produced >= next_checkpoint and counter.last != 0x0D:
+                    lines.append(counter.breaks)
+                    states.append((comp_pos, d.copy() if d else None))
+                    next_checkpoint = produced + CHECKPOINT_SPAN
+
+        return cls(
+            st.st_size, st.st_mtime_ns, counter.line_count, lines, states
+        )
+
+    def _stream(self, f: BinaryIO, k: int) -> Iterator[bytes]:
+        comp_pos, d = self.states[k]
+        # 覚えている展開器は何度でも使えるよう、コピーして使う
+        for out, _, _ in _inflate(f, comp_pos, d.copy() if d else None):
+            yield out
+
+
+# --- xz ---
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """xz 形式の可変長整数を読みます。(値, 次の位置) を返します"""
+    value = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("Invalid xz varint")
+
+
+def _parse_block_filters(header: bytes) -> Optional[List[Dict]]:
+    """ブロックヘッダーのフィルタ指定を lzma モジュールの形式にします"""
+    flags = header[1]
+    pos = 2
+    if flags & 0x40:
+        _, pos = _read_varint(header, pos)  # 圧縮後のサイズ
+    if flags & 0x80:
+        _, pos = _read_varint(header, pos)  # 展開後のサイズ
+
+    filters = []
+    for _ in range((flags & 0x03) + 1):
+        filter_id, pos = _read_varint(header, pos)
+        props_size, pos = _read_varint(header, pos)
+        props = header[pos : pos + props_size]
+        pos += props_size
+
+        if filter_id == lzma.FILTER_LZMA2:
+            b = props[0]
+            if b > 40:
+                return None
+            dict_size = (
+                0xFFFFFFFF if b == 40 else (2 | (b & 1)) << (b // 2 + 11)
+            )
+            filters.append({"id": filter_id, "dict_size": dict_size})
+        elif filter_id == lzma.FILTER_DELTA:
+            filters.append({"id": filter_id, "dist": props[0] + 1})
+        elif filter_id in _BCJ_FILTERS:
+            spec = {"id": filter_id}
+            if props_size == 4:
+                spec["start_offset"] = int.from_bytes(props, "little")
+            filters.append(spec)
+        else:
+            return None
+    return filters
+
+
+def _xz_blocks(f: BinaryIO, size: int) -> Optional[List[Tuple[int, List]]]:
+    """
+    xz ファイルのブロックごとの (圧縮データの開始位置, フィルタ) を返します。
+    ストリームが1つで、インデックスが読めるときだけ使えます（それ以外は None）。
+    """
+    try:
+        f.seek(0)
+        if f.read(12)[:6] != _XZ_MAGIC:
+            return None
+        f.seek(size - 12)
+        footer = f.read(12)
+        if footer[10:12] != _XZ_FOOTER_MAGIC:
+            return None
+
+        index_size = (int.from_bytes(footer[4:8], "little") + 1) * 4
+        index_start = size - 12 - index_size
+        f.seek(index_start)
+        index = f.read(index_size)
+        if index[0] != 0x00:
+            return None
+
+        record_count, pos = _read_varint(index, 1)
+        blocks = []
+        offset = 12
+        for _ in range(record_count):
+            unpadded_size, pos = _read_varint(index, pos)
+            _, pos = _read_varint(index, pos)  # 展開後のサイズ
+
+            f.seek(offset)
+            header_size = (f.read(1)[0] + 1) * 4
+            f.seek(offset)
+            filters = _parse_block_filters(f.read(header_size))
+            if filters is None:
+                return None
+            blocks.append((offset + header_size, filters))
+            # ブロックは 4 バイト境界に揃えられている
+            offset += (unpadded_size + 3) & ~3
+
+        # 複数ストリームなどでブロックの並びが合わないときは使わない
+        if offset != index_start:
+            return None
+        return blocks
+    except (IndexError, ValueError, OSError, lzma.LZMAError):
+        return None
+
+
+class XzLineIndex(CompressedLineIndex):
+    """
+    xz の行索引です。blocks[k] は k 番目のブロックの
+    (圧縮データの開始位置, フィルタ) で、各ブロックの先頭がチェックポイントです。
+    blocks が None のファイルは先頭から順に展開します。
+    """
+
+    def __init__(
+        self,
+        size: int,
+        mtime_ns: int,
+        line_count: int,
+        lines: array,
+        blocks: Optional[List[Tuple[int, List]]],
+    ):
+        super().__init__(size, mtime_ns, line_count, lines)
+        self.blocks = blocks
+
+    @classmethod
+    def build(cls, file_path: str, st: os.stat_result) -> "XzLineIndex":
+        counter = _LineCounter()
+        lines = array("Q")
+
+        with open(file_path, "rb") as f:
+            blocks = _xz_blocks(f, st.st_size)
+            if blocks is None:
+                lines.append(0)
+                for out in cls._stream_all(f):
+                    counter.feed(out)
+            else:
+                for k in range(len(blocks)):
+                    # \r\n がブロックの境界で分かれていたら、\n から読み始めた
+                    # ときにもう1つ改行を数えるので、その分を引いておく
+                    breaks = counter.breaks
+                    first = True
+                    for out in cls._stream_blocks(f, blocks[k : k + 1]):
+                        if first and out:
+                            if counter.last == 0x0D and out[0] == 0x0A:
+                                breaks -= 1
+                            first = False
+                        counter.feed(out)
+                    lines.append(breaks)
+
+        return cls(
+            st.st_size, st.st_mtime_ns, counter.line_count, lines, blocks
+        )
+
+    def _stream(self, f: BinaryIO, k: int) -> Iterator[bytes]:
+        if self.blocks is None:
+            return self._stream_all(f)
+        return self._stream_blocks(f, self.blocks[k:])
+
+    @staticmethod
+    def _stream_blocks(
+        f: BinaryIO, blocks: List[Tuple[int, List]]
+    ) -> Iterator[bytes]:
+        for data_offset, filters in blocks:
+            d = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=filters)
+            f.seek(data_offset)
+            while not d.eof:
+                data = b""
+                if d.needs_input:
+                    data = f.read(COMPRESSED_CHUNK_SIZE)
+                    if not data:
+                        raise EOFError(
+                            "Compressed file ended before the "
+                            "end-of-stream marker was reached"
+                        )
+                yield d.decompress(data, OUTPUT_CHUNK_SIZE)
+
+    @staticmethod
+    def _stream_all(f: BinaryIO) -> Iterator[bytes]:
+        f.seek(0)
+        with lzma.LZMAFile(f) as xz:
+            while True:
+                out = xz.read(OUTPUT_CHUNK_SIZE)
+                if not out:
+                    return
+                yield out
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# pyetc のモジュールは互いを直接 import するので、このディレクトリをパスに加える
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _random_text(rng, n_lines, max_line_length=40, tail=None):
+    """
+    \\n, \\r\\n, 単独の \\r と、改行で終わらない最後の行を混ぜたテキスト。
+    tail が None なら、最後の行を付けるかどうかも乱数で決める。
+    """
+    parts = []
+    for _ in range(n_lines):
+        body = "".join(
+            rng.choice("abcxyz あい\t")
+            for _ in range(rng.randrange(0, max_line_length))
+        )
+        parts.append(body + rng.choice(["\n", "\r\n", "\r", "\n", "\n"]))
+    if tail is None:
+        tail = rng.random() < 0.5
+    if tail:
+        parts.append("tail without newline")
+    return "".join(parts).encode("utf-8")
+
+
+@pytest.fixture
+def random_text():
+    """_random_text(rng, n_lines, max_line_length, tail) を返す"""
+    return _random_text
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(request, monkeypatch):
+    """
+    テストモジュールの SMALL_CHUNKS ({(モジュール, 定数名): 値}) のとおりに
+    チャンクやチェックポイントの大きさを小さくして、小さなファイルでも
+    境界を何度もまたがせる。
+    """
+    overrides = getattr(request.module, "SMALL_CHUNKS", {})
+    for (module, name), value in overrides.items():
+        monkeypatch.setattr(module, name, value)
+
+
+@pytest.fixture
+def make_tree(tmp_path, monkeypatch):
+    """
+    files ({相対パス: 中身}) からツリーを作り、そのパスを返す関数を返す。
+    kind が "git" なら git リポジトリにし、"python" なら外部コマンドを
+    使わせずに GrepTool を Python Fallback で検索させる
+    （"grep" / "plain" はツリーを作るだけ）。
+    ツリーは tmp_path の下の name に作るので、tmp_path には索引などを置ける。
+    """
+
+    def make(files, kind="plain", name="tree"):
+        root = tmp_path / name
+        root.mkdir(exist_ok=True)
+        for rel, text in files.items():
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(text, bytes):
+                path.write_bytes(text)
+            else:
+                path.write_text(text, encoding="utf-8")
+        if kind == "git":
+            subprocess.run(["git", "init", "-q", str(root)], check=True)
+        elif kind == "python":
+            from grep import GrepTool
+
+            monkeypatch.setattr(
+                GrepTool, "_is_command_available", lambda self, cmd: False
+            )
+        return root
+
+    return make
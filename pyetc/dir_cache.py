@@ -0,0 +1,529 @@
+"""ディレクトリ内容のキャッシュ。
+
+LsTool / FileGlobTool / my_glob.glob が同じディレクトリを何度も読み直さない
+よう、ディレクトリごとのエントリ一覧をメモリに保持します。
+
+キャッシュの無効化には Linux の inotify（ctypes 経由）を使います。
+ディレクトリを読む前に監視を登録し、変更イベントを受け取ったバックグラウンド
+スレッドがそのディレクトリの一覧を捨てるので、キャッシュが有効な間は
+システムコールを発行せずに一覧を返せます。
+inotify が使えない環境（Linux 以外、監視数の上限など）では、アクセスの
+たびにディレクトリの mtime を stat で確認するポーリングに切り替えます
+（この場合はエントリの追加・削除・名前変更だけを検出し、既存ファイルの
+サイズや更新日時の変化は検出しません）。
+
+全体の使用量はおおよそのバイト数で管理し、上限を超えたら古いもの (LRU) から
+捨てます。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# エントリ1件あたりの概算メモリ（オブジェクト本体と名前以外の分）
+ENTRY_COST = 120
+# stat 結果を持つ場合の追加分
+STAT_COST = 150
+
+# inotify のイベントマスク (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# 一覧（名前・種別）とサイズ・更新日時のどちらかが変わり得るイベント
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class CachedEntry:
+    """
+    os.DirEntry と同じように使える、キャッシュされたエントリです。
+    （name / path 属性と is_dir() / is_file() / is_symlink() / stat()）
+    """
+
+    __slots__ = ("name", "path", "_is_dir", "_is_symlink", "_stat")
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        is_dir: bool,
+        is_symlink: bool,
+        stat: Optional[os.stat_result] = None,
+    ):
+        self.name = name
+        self.path = path
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+        self._stat = stat
+
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    def is_file(self) -> bool:
+        return not self._is_dir
+
+    def is_symlink(self) -> bool:
+        return self._is_symlink
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            # リンク切れなどで stat できなかったエントリ
+            raise FileNotFoundError(errno.ENOENT, "No stat for", self.path)
+        return self._stat
+
+    def __repr__(self) -> str:
+        return f"<CachedEntry '{self.name}'>"
+
+
+class _InotifyWatcher:
+    """
+    inotify の薄いラッパーです。監視中のディレクトリに変化があると、
+    バックグラウンドスレッドから on_change(dir_path) を呼びます。
+    イベントが溢れた場合は on_overflow() を呼びます。
+
+    監視記述子 (wd) はパスではなく inode ごとに決まるので、シンボリック
+    リンク経由など別のパスで同じディレクトリを登録すると同じ wd が返ります。
+    そのため wd ごとにパスとその登録数を覚え、add() と同じ回数 remove()
+    されたパスが無くなった時点で監視を外します。
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[str], None],
+        on_overflow: Callable[[], None],
+    ):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._on_change = on_change
+        self._on_overflow = on_overflow
+        self._lock = threading.Lock()
+        # wd -> {dir_path: 登録数}
+        self._paths: Dict[int, Dict[str, int]] = {}
+        # close() でスレッドを起こすためのパイプ
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(
+            target=self._run, name="dir-cache-inotify", daemon=True
+        )
+        self._thread.start()
+
+    def add(self, dir_path: str) -> Optional[int]:
+        """監視を登録し wd を返します。登録できなければ None です。"""
+        # remove() の rm_watch と入れ違いになって、外された wd を覚えて
+        # しまわないよう、システムコールもロックの中で呼ぶ
+        with self._lock:
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dir_path), WATCH_MASK
+            )
+            if wd < 0:
+                err = ctypes.get_errno()
+                logger.debug(
+                    f"inotify_add_watch failed for {dir_path}: "
+                    f"{os.strerror(err)}"
+                )
+                return None
+            paths = self._paths.setdefault(wd, {})
+            paths[dir_path] = paths.get(dir_path, 0) + 1
+        return wd
+
+    def remove(self, wd: int, dir_path: str) -> None:
+        """add(dir_path) で得た wd の登録を1つ外します"""
+        with self._lock:
+            paths = self._paths.get(wd)
+            if paths is None or dir_path not in paths:
+                return
+            paths[dir_path] -= 1
+            if paths[dir_path] > 0:
+                return
+            del paths[dir_path]
+            if paths:
+                # 別のパスからまだ使われている
+                return
+            del self._paths[wd]
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def close(self) -> None:
+        os.write(self._wake_w, b"x")
+        self._thread.join()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        os.close(self._fd)
+
+    def _run(self) -> None:
+        while True:
+            readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            if self._wake_r in readable:
+                return
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            self._dispatch(data)
+
+    def _dispatch(self, data: bytes) -> None:
+        changed: Set[str] = set()
+        overflow = False
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, pos)
+            pos += _EVENT_HEADER.size + name_len
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            with self._lock:
+                paths = self._paths.get(wd)
+                if paths is not None:
+                    changed.update(paths)
+                if mask & IN_IGNORED:
+                    # 監視が外れた（ディレクトリの削除や rm_watch）
+                    self._paths.pop(wd, None)
+
+        if overflow:
+            self._on_overflow()
+        for dir_path in changed:
+            self._on_change(dir_path)
+
+
+class _Listing:
+    """キャッシュ内の1ディレクトリ分の一覧"""
+
+    __slots__ = ("entries", "nbytes", "has_stat", "wd", "poll_key")
+
+    def __init__(
+        self,
+        entries: Tuple[CachedEntry, ...],
+        nbytes: int,
+        has_stat: bool,
+        wd: Optional[int],
+        poll_key: Optional[Tuple[int, int]],
+    ):
+        self.entries = entries
+        self.nbytes = nbytes
+        self.has_stat = has_stat
+        # inotify の監視記述子（None ならポーリングで確認する）
+        self.wd = wd
+        # ポーリング用の、読んだときのディレクトリの (mtime_ns, ino)
+        self.poll_key = poll_key
+
+
+class DirCache:
+    """
+    ディレクトリのエントリ一覧の LRU キャッシュです。
+    max_bytes は概算の使用量の上限です。use_inotify を False にすると
+    常にポーリング（ディレクトリの mtime の確認）で無効化を判定します。
+    """
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024 * 1024, use_inotify: bool = True
+    ):
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, _Listing]" = OrderedDict()
+        self._total = 0
+        # 読み込み中のディレクトリ -> [読み込み中のスレッド数, 変更イベントの数]
+        # 変更の数は増えるだけなので、読み込みの前後で比べれば、別のスレッドが
+        # 同時に読み込んでいても自分の読み込み中の変更を取りこぼさない
+        self._loading: Dict[str, List[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+        self._watcher: Optional[_InotifyWatcher] = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._watcher = _InotifyWatcher(self._on_change, self.clear)
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify is not available, polling: {e}")
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._watcher is not None else "poll"
+
+    # --- 一覧の取得 ---
+    def list_dir(
+        self, dir_path: str, stat: bool = False
+    ) -> Tuple[CachedEntry, ...]:
+        """
+        dir_path のエントリ一覧を返します（順序は os.scandir と同じ）。
+        stat を True にすると各エントリの stat 結果も用意します。
+        読めないディレクトリの場合は OSError を送出します。
+        """
+        dir_path = os.path.abspath(dir_path)
+        with self._lock:
+            listing = self._entries.get(dir_path)
+            if listing is not None and self._is_valid(dir_path, listing, stat):
+                self._entries.move_to_end(dir_path)
+                self.hits += 1
+                return listing.entries
+            self.misses += 1
+            self._drop(dir_path)
+            loading = self._loading.setdefault(dir_path, [0, 0])
+            loading[0] += 1
+            changes_before = loading[1]
+
+        # 読み込み中の変更を取りこぼさないよう、監視を先に登録する
+        wd = None
+        try:
+            if self._watcher is not None:
+                wd = self._watcher.add(dir_path)
+            poll_key = None
+            if wd is None:
+                st = os.stat(dir_path)
+                poll_key = (st.st_mtime_ns, st.st_ino)
+            entries = self._read_dir(dir_path, stat)
+        except OSError:
+            with self._lock:
+                self._finish_loading(dir_path)
+            if wd is not None:
+                self._watcher.remove(wd, dir_path)
+            raise
+
+        size = sum(
+            ENTRY_COST + len(e.name) + len(e.path) + (STAT_COST if stat else 0)
+            for e in entries
+        )
+        with self._lock:
+            changed_while_loading = (
+                self._finish_loading(dir_path) != changes_before
+            )
+            if changed_while_loading or size > self.max_bytes:
+                # 読んでいる間に変わった、または大きすぎるものは覚えない
+                if wd is not None:
+                    self._watcher.remove(wd, dir_path)
+                return entries
+            # 同時に読んだ別のスレッドの結果があれば置き換える
+            self._drop(dir_path)
+            self._entries[dir_path] = _Listing(
+                entries, size, stat, wd, poll_key
+            )
+            self._total += size
+            self._evict()
+        return entries
+
+    def _finish_loading(self, dir_path: str) -> int:
+        """読み込みの終了を記録し、それまでの変更イベントの数を返します"""
+        loading = self._loading[dir_path]
+        loading[0] -= 1
+        if loading[0] == 0:
+            del self._loading[dir_path]
+        return loading[1]
+
+    def _is_valid(self, dir_path: str, listing: _Listing, stat: bool) -> bool:
+        if stat and not listing.has_stat:
+            return False
+        if listing.wd is not None:
+            # inotify で監視中なら、変更があれば既に捨てられている
+            return True
+        try:
+            st = os.stat(dir_path)
+        except OSError:
+            return False
+        return (st.st_mtime_ns, st.st_ino) == listing.poll_key
+
+    @staticmethod
+    def _read_dir(dir_path: str, stat: bool) -> Tuple[CachedEntry, ...]:
+        entries = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                st = None
+                if stat:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                entries.append(
+                    CachedEntry(
+                        entry.name,
+                        entry.path,
+                        is_dir,
+                        entry.is_symlink(),
+                        st,
+                    )
+                )
+        return tuple(entries)
+
+    # --- glob ---
+    def glob(
+        self,
+        pattern: str,
+        root: str = ".",
+        include_hidden: bool = False,
+        files_only: bool = False,
+    ) -> List[str]:
+        """
+        キャッシュした一覧を使って glob.glob(os.path.join(root, pattern),
+        recursive=True) 相当の検索をします（"**" は0階層以上のディレクトリ）。
+        include_hidden が False なら、ワイルドカードは "." で始まる名前に
+        マッチしません。files_only ならディレクトリを結果から除きます。
+        """
+        parts = [p for p in pattern.replace(os.sep, "/").split("/") if p]
+        results: List[str] = []
+        if parts:
+            self._glob(root, parts, include_hidden, files_only, results)
+        return results
+
+    def _glob(
+        self,
+        dir_path: str,
+        parts: List[str],
+        include_hidden: bool,
+        files_only: bool,
+        out: List[str],
+    ) -> None:
+        part, rest = parts[0], parts[1:]
+        if part == "**":
+            # 0階層分: "a/**" は a 自身にもマッチする
+            if not rest and not files_only:
+                out.append(os.path.join(dir_path, ""))
+            self._glob_recursive(
+                dir_path, rest, include_hidden, files_only, out
+            )
+            return
+
+        try:
+            entries = self.list_dir(dir_path)
+        except OSError:
+            return
+
+        if not any(c in part for c in "*?["):
+            matched = [e for e in entries if e.name == part]
+        else:
+            skip_hidden = not include_hidden and not part.startswith(".")
+            matched = [
+                e
+                for e in entries
+                if not (skip_hidden and e.name.startswith("."))
+                and fnmatch.fnmatch(e.name, part)
+            ]
+        for e in matched:
+            path = os.path.join(dir_path, e.name)
+            if rest:
+                if e.is_dir():
+                    self._glob(path, rest, include_hidden, files_only, out)
+            elif not (files_only and e.is_dir()):
+                out.append(path)
+
+    def _glob_recursive(
+        self,
+        dir_path: str,
+        rest: List[str],
+        include_hidden: bool,
+        files_only: bool,
+        out: List[str],
+    ) -> None:
+        """dir_path とその下の全ディレクトリで rest を試します（"**" の部分）"""
+        if rest:
+            self._glob(dir_path, rest, include_hidden, files_only, out)
+        try:
+            entries = self.list_dir(dir_path)
+        except OSError:
+            return
+        for e in entries:
+            if not include_hidden and e.name.startswith("."):
+                continue
+            path = os.path.join(dir_path, e.name)
+            if not rest and not (files_only and e.is_dir()):
+                out.append(path)
+            # シンボリックリンクはループの恐れがあるのでたどらない
+            if e.is_dir() and not e.is_symlink():
+                self._glob_recursive(
+                    path, rest, include_hidden, files_only, out
+                )
+
+    # --- 無効化 ---
+    def _on_change(self, dir_path: str) -> None:
+        """inotify スレッドから呼ばれます"""
+        with self._lock:
+            if dir_path in self._loading:
+                self._loading[dir_path][1] += 1
+            if dir_path in self._entries:
+                self.invalidations += 1
+            self._drop(dir_path)
+
+    def invalidate(self, dir_path: str) -> None:
+        """dir_path の一覧を捨てます"""
+        with self._lock:
+            self._drop(os.path.abspath(dir_path))
+
+    def _drop(self, dir_path: str) -> None:
+        listing = self._entries.pop(dir_path, None)
+        if listing is None:
+            return
+        self._total -= listing.nbytes
+        if listing.wd is not None and self._watcher is not None:
+            self._watcher.remove(listing.wd, dir_path)
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._entries:
+            dir_path = next(iter(self._entries))
+            self._drop(dir_path)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for dir_path in list(self._entries):
+                self._drop(dir_path)
+
+    def close(self) -> None:
+        """キャッシュを捨て、inotify の監視を終了します"""
+        self.clear()
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "dirs": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
@@ -8,7 +8,6 @@
 import glob
 import logging
 import os
-from fnmatch import fnmatch
 
 from config import Config
 from get_gitignore import get_gitignore
@@ -27,15 +26,20 @@ class FileGlobTool:
 
     Attributes:
         config (Config): プロジェクト設定を保持するオブジェクト。
+        dir_cache (DirCache | None): ディレクトリ一覧のキャッシュ。
     """
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, dir_cache=None):
         """FileGlobTool を初期化します。
 
         Args:
             config (Config): プロジェクト設定を保持するオブジェクト。
+            dir_cache (DirCache | None): dir_cache.DirCache を渡すと、
+                ディレクトリの読み込みにそのキャッシュを使います
+                （他のツールと共有できます）。
         """
         self.config = config
+        self.dir_cache = dir_cache
 
     def validate(self, root_path: str, pattern: str) -> None:
         """指定されたパスとパターンが安全であることを検証します。
@@ -81,17 +85,28 @@ class FileGlobTool:
         """
         self.validate(root_path, pattern)
 
-        ignore_pattern = get_gitignore(root_path)
-        logger.debug(f"ignore_pattern is {sorted(ignore_pattern)}")
+        gitignore = get_gitignore(root_path, self.dir_cache)
+
+        if self.dir_cache is not None:
+            # キャッシュした一覧で検索する（ディレクトリは最初から除く）
+            found = self.dir_cache.glob(
+                os.path.join("**", pattern), root_path, files_only=True
+            )
+        else:
+            found = [
+                file
+                for file in glob.glob(
+                    os.path.join(root_path, "**", pattern), recursive=True
+                )
+                if not os.path.isdir(file)
+            ]
 
         files = []
-        for file in glob.glob(
-            os.path.join(root_path, "**", pattern), recursive=True
-        ):
+        for file in found:
             file = os.path.relpath(file, root_path)  # 相対パス
-            if not file or os.path.isdir(file):
+            if not file:
                 continue
-            if any(fnmatch(file, p) for p in ignore_pattern):
+            if gitignore.is_ignored(os.path.join(root_path, file)):
                 logger.debug(f"ignore {file}")
                 continue
             files.append(file)
@@ -1,39 +1,280 @@
 import glob
 import logging
 import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
 
 logger = logging.getLogger(__name__)
 
+# Windows ではパスの大文字小文字を区別しない
+_RULE_FLAGS = re.IGNORECASE if os.name == "nt" else 0
 
-def get_gitignore(root_path: str = "."):
-    ignore_glob = set()
-    for file in glob.glob(
-        os.path.join(root_path, "**/.gitignore"), recursive=True
+
+@dataclass
+class GitIgnoreRule:
+    """.gitignore の1行分。regex は "/" 区切りの絶対パスと比較します"""
+
+    regex: "re.Pattern"
+    negate: bool
+    dir_only: bool
+
+
+class GitIgnoreRules:
+    """
+    あるディレクトリで効く .gitignore のルール列です（上の階層から順）。
+    git と同じく、最後にマッチしたルールで除外するかどうかが決まります。
+    ディレクトリが除外された場合、その中身は調べずに除外する前提です
+    （git でも除外されたディレクトリの中身は ! で戻せません）。
+    """
+
+    def __init__(self, rules: Optional[List[GitIgnoreRule]] = None):
+        self.rules = rules or []
+        self.has_negation = any(r.negate for r in self.rules)
+        self._any_dir = None
+        self._any_file = None
+        if not self.has_negation:
+            # 否定が無ければ、どれか1つにマッチするかを連結した正規表現1回で
+            # 判定できる
+            self._any_dir = _join_rules(self.rules)
+            self._any_file = _join_rules(
+                [r for r in self.rules if not r.dir_only]
+            )
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def extend(self, rules: List[GitIgnoreRule]) -> "GitIgnoreRules":
+        return GitIgnoreRules(self.rules + rules)
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """path (絶対パス) が除外されるかを返します"""
+        path = _rule_path(path)
+        if not self.has_negation:
+            regex = self._any_dir if is_dir else self._any_file
+            return bool(regex and regex.match(path))
+        for rule in reversed(self.rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(path):
+                return not rule.negate
+        return False
+
+
+def _join_rules(rules: List[GitIgnoreRule]) -> Optional["re.Pattern"]:
+    if not rules:
+        return None
+    return re.compile(
+        "|".join(f"(?:{r.regex.pattern})" for r in rules), _RULE_FLAGS
+    )
+
+
+def _rule_path(path: str) -> str:
+    """ルールと比較する形 ("/" 区切りの絶対パス) にします"""
+    path = os.path.normcase(os.path.abspath(path))
+    return path.replace(os.sep, "/") if os.sep != "/" else path
+
+
+def read_gitignore_rules(file: str) -> List[GitIgnoreRule]:
+    """
+    1つの .gitignore を git と同じ意味で読みます。
+    否定 (!)、先頭や途中の / による位置の固定、** に対応し、
+    * や ? は / をまたぎません。
+    """
+    base = _rule_path(os.path.dirname(os.path.abspath(file)))
+    prefix = re.escape(base.rstrip("/") + "/")
+    rules = []
+    with open(file, "r", encoding="utf-8", errors="ignore") as fd:
+        for line in fd:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith(("\\#", "\\!")):
+                line = line[1:]
+
+            # 末尾が / のものはディレクトリにだけマッチする
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+
+            # 途中に / を含むものは .gitignore のあるディレクトリからの
+            # 相対パス、含まないものはどの階層の名前にもマッチする
+            anchored = "/" in line
+            body = _translate_gitignore(line.lstrip("/"))
+            if not anchored:
+                body = "(?:.*/)?" + body
+            rules.append(
+                GitIgnoreRule(
+                    re.compile(prefix + body + r"\Z", _RULE_FLAGS),
+                    negate,
+                    dir_only,
+                )
+            )
+    return rules
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """/ で区切られた gitignore のパターンを正規表現にします"""
+    segments = pattern.split("/")
+    parts = []
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            # "a/**" は a の中の全て、"**/" は0個以上の階層
+            parts.append(".*" if last else "(?:[^/]*/)*")
+            continue
+        parts.append(_translate_segment(segment) + ("" if last else "/"))
+    return "".join(parts)
+
+
+def _translate_segment(segment: str) -> str:
+    """パスの1階層分の glob を、/ をまたがない正規表現にします"""
+    out = []
+    i = 0
+    n = len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "\\" and i < n:
+            out.append(re.escape(segment[i]))
+            i += 1
+        elif c == "[":
+            j = i
+            if j < n and segment[j] in "!^":
+                j += 1
+            if j < n and segment[j] == "]":
+                j += 1
+            j = segment.find("]", j)
+            if j < 0:
+                out.append(re.escape(c))
+                continue
+            stuff = segment[i:j].replace("\\", "\\\\").replace("[", "\\[")
+            if stuff[0] in "!^":
+                stuff = "^" + stuff[1:]
+            out.append(f"(?!/)[{stuff}]")
+            i = j + 1
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+
+class GitIgnoreTree:
+    """
+    root_dir 以下のパスが .gitignore で除外されるかを判定します。
+    ディレクトリごとに効くルール (GitIgnoreRules) は、親ディレクトリの
+    ルールにそのディレクトリの .gitignore を足して作り、覚えておきます。
+    各 .gitignore は1回だけ読みます。
+    top_dir（リポジトリのトップなど）を指定すると、root_dir から top_dir
+    までの親ディレクトリの .gitignore も読みます。
+    gitignore_files を渡すと、.gitignore を探す代わりにその一覧だけを読みます。
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        top_dir: Optional[str] = None,
+        gitignore_files: Optional[Iterable[str]] = None,
     ):
-        logger.debug(f"'{file}' found.")
-        d = os.path.dirname(file)
-        with open(file, "r", encoding="utf-8", errors="ignore") as fd:
-            for line in fd:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
+        self.root_dir = os.path.abspath(root_dir)
+        self.top_dir = os.path.abspath(top_dir or root_dir)
+        self._files: Optional[Set[str]] = None
+        if gitignore_files is not None:
+            self._files = {os.path.abspath(f) for f in gitignore_files}
+        # ディレクトリ -> その中のエントリに効くルール
+        self._rules: Dict[str, GitIgnoreRules] = {}
+        # ディレクトリ -> そのディレクトリ自身（か親）が除外されているか
+        self._ignored_dirs: Dict[str, bool] = {}
+
+    def _inside(self, dir_path: str) -> bool:
+        try:
+            return os.path.commonpath([self.top_dir, dir_path]) == self.top_dir
+        except ValueError:
+            return False
+
+    def _read(self, dir_path: str) -> List[GitIgnoreRule]:
+        path = os.path.join(dir_path, ".gitignore")
+        if self._files is not None and path not in self._files:
+            return []
+        try:
+            rules = read_gitignore_rules(path)
+        except OSError:
+            return []
+        logger.debug(f"'{path}' loaded.")
+        return rules
+
+    def rules_for(self, dir_path: str) -> GitIgnoreRules:
+        """dir_path の中のエントリに効くルールを返します（メモ化）"""
+        dir_path = os.path.abspath(dir_path)
+        rules = self._rules.get(dir_path)
+        if rules is not None:
+            return rules
 
-                # ディレクトリ指定 (/) で終わる場合は末尾を /* に変換
-                if line.endswith("/"):
-                    line += "*"
+        if dir_path == self.top_dir:
+            rules = GitIgnoreRules()
+        elif self._inside(dir_path):
+            rules = self.rules_for(os.path.dirname(dir_path))
+        else:
+            # top_dir の外のパスには何も効かない
+            rules = GitIgnoreRules()
+            self._rules[dir_path] = rules
+            return rules
 
-                # パスを結合してから正規化
-                norm_path = os.path.normpath(os.path.join(d, line))
-                logger.debug(f"norm; {norm_path}")
-                ignore_glob.add(norm_path)
+        own = self._read(dir_path)
+        if own:
+            rules = rules.extend(own)
+        self._rules[dir_path] = rules
+        return rules
 
-                norm_path = os.path.normpath(os.path.join(d, "*", line))
-                logger.debug(f"norm; {norm_path}")
-                ignore_glob.add(norm_path)
+    def _is_dir_ignored(self, dir_path: str) -> bool:
+        ignored = self._ignored_dirs.get(dir_path)
+        if ignored is not None:
+            return ignored
+        if dir_path == self.top_dir or not self._inside(dir_path):
+            ignored = False
+        else:
+            # 除外されたディレクトリの中身は ! で戻せないので、親から判定する
+            parent = os.path.dirname(dir_path)
+            ignored = self._is_dir_ignored(parent) or self.rules_for(
+                parent
+            ).is_ignored(dir_path, is_dir=True)
+        self._ignored_dirs[dir_path] = ignored
+        return ignored
 
-    return list(ignore_glob)
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """path 自身か、その親ディレクトリのいずれかが除外されるかを返します"""
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        if self._is_dir_ignored(parent):
+            return True
+        return self.rules_for(parent).is_ignored(path, is_dir)
+
+
+def get_gitignore(root_path: str = ".", dir_cache=None) -> GitIgnoreTree:
+    """
+    root_path 以下の全ての .gitignore を読んだ GitIgnoreTree を返す。
+    dir_cache (dir_cache.DirCache) を渡すと、.gitignore の探索にその
+    キャッシュを使う。
+    """
+    if dir_cache is not None:
+        found = dir_cache.glob("**/.gitignore", root_path)
+    else:
+        found = glob.glob(
+            os.path.join(root_path, "**/.gitignore"), recursive=True
+        )
+    for file in found:
+        logger.debug(f"'{file}' found.")
+    return GitIgnoreTree(root_path, gitignore_files=found)
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
-    print(get_gitignore())
+    print(get_gitignore().rules_for(".").rules)
@@ -1,10 +1,84 @@
+import codecs
 import fnmatch
+import heapq
+import mmap
+import multiprocessing
 import os
+import queue
 import re
 import subprocess
 import sys
+import tempfile
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from aho_corasick import AhoCorasick
+from get_gitignore import GitIgnoreRules, read_gitignore_rules
+from pattern_analyzer import (
+    analyze,
+    find_risky_construct,
+    is_width_sensitive,
+)
+from result_cache import CacheEntry, ResultCache
+from trigram_index import TrigramIndex
+
+# 索引で絞り込んだファイルを外部コマンドに渡す際の、1回あたりの最大ファイル数
+# （コマンドライン長の上限対策）
+FILE_ARGS_CHUNK = 500
+
+# 必須リテラルで先読みフィルタする際、これ以下のファイルは一括で読み込む
+# （より大きいファイルはチャンク単位で判定してから行単位で検索する）
+MAX_PREFILTER_READ_SIZE = 64 * 1024 * 1024
+
+# リテラルの出現数 × この値 が行数を超えるファイルは、候補行へ飛ばずに
+# 全行を順に検索する
+DENSE_HIT_RATIO = 8
+
+# バイナリ判定で読む先頭ブロックのサイズ (git と同じ 8000 バイト)
+BINARY_SNIFF_SIZE = 8000
+
+# バイナリ判定結果のキャッシュに保持する最大件数
+BINARY_CACHE_SIZE = 100000
+
+# deadline 付き検索で、ワーカーが結果をまとめて送る件数
+DEADLINE_FLUSH_SIZE = 1000
+
+# 出力モードごとの grep / git grep のフラグ
+# content: 行ごとの結果, files_with_matches: ファイル名だけ, count: 件数だけ
+_MODE_FLAGS = {"content": "-n", "files_with_matches": "-l", "count": "-c"}
+
+# 外部コマンドの戦略の表示名
+_COMMAND_NAMES = {"git": "git grep", "grep": "system grep"}
+
+# mmap 検索でバイト列の正規表現を使わないパターン
+# (\A \Z はバッファ全体の先頭・末尾になり、\s は str と空白の範囲が違う。
+# \x80 以上のエスケープは str では文字、バイト列では1バイトを表す)
+_BYTES_UNSAFE = re.compile(r"\\[AZsS]|\\x[89a-fA-F]|\\[23][0-7]{2}")
+
+# mmap 検索で、これにヒットするファイルは str の行単位検索に任せる
+_CR = re.compile(rb"\r")
+_NON_ASCII_OR_CR = re.compile(rb"[\r\x80-\xff]")
+
+# 改行やタブ以外の制御文字
+_CONTROL_BYTES = (
+    bytes(c for c in range(32) if c not in (7, 8, 9, 10, 11, 12, 13, 27))
+    + b"\x7f"
+)
 
 
 # --- 1. 除外パターン管理クラス (共通部品のイメージ) ---
@@ -55,9 +129,23 @@ class FileExclusions:
             ".tar",
             ".gz",
         }
+        # 拡張子で判定できないファイルは、先頭ブロックの中身で判定する
+        self.sniff_binary = True
+        # (st_dev, st_ino, mtime_ns, size) -> バイナリかどうか
+        self._binary_cache: "OrderedDict[tuple, bool]" = OrderedDict()
+        # 走査中に見つけた .gitignore で、ディレクトリごと刈り込む
+        self.respect_gitignore = True
 
-    def is_ignored(self, file_path: str, base_dir: str) -> bool:
-        """ファイルが除外対象かどうか判定します（Python Fallback用）"""
+    def is_ignored(
+        self,
+        file_path: str,
+        base_dir: str,
+        st: Optional[os.stat_result] = None,
+    ) -> bool:
+        """
+        ファイルが除外対象かどうか判定します（Python Fallback用）
+        st を渡すと、バイナリ判定のための stat を省略します。
+        """
         filename = os.path.basename(file_path)
 
         # 拡張子チェック
@@ -70,12 +158,96 @@ class FileExclusions:
             if fnmatch.fnmatch(filename, pattern):
                 return True
 
+        # 中身によるバイナリチェック (grep -I 相当)
+        if self.sniff_binary and self.is_binary(file_path, st):
+            return True
+
         return False
 
+    def is_binary(
+        self, file_path: str, st: Optional[os.stat_result] = None
+    ) -> bool:
+        """
+        先頭ブロックを読んでバイナリかどうか判定します。
+        結果は (デバイス, inode, mtime, サイズ) をキーに覚えておくので、
+        変更されていないファイルを再度開くことはありません。
+        """
+        try:
+            if st is None:
+                st = os.stat(file_path)
+        except OSError:
+            return False
+
+        # inode を持たないファイルシステムではパスで代用する
+        ino = st.st_ino or os.path.abspath(file_path)
+        key = (st.st_dev, ino, st.st_mtime_ns, st.st_size)
+        verdict = self._binary_cache.get(key)
+        if verdict is not None:
+            self._binary_cache.move_to_end(key)
+            return verdict
+
+        try:
+            with open(file_path, "rb") as f:
+                block = f.read(BINARY_SNIFF_SIZE)
+        except OSError:
+            # 読めないファイルは判定せず、検索側のエラー処理に任せる
+            return False
+
+        verdict = _looks_binary(block)
+        self._binary_cache[key] = verdict
+        if len(self._binary_cache) > BINARY_CACHE_SIZE:
+            self._binary_cache.popitem(last=False)
+        return verdict
+
     def should_skip_dir(self, dir_name: str) -> bool:
         """ディレクトリ探索をスキップすべきか判定します"""
         return dir_name in self.ignore_dirs
 
+    def walk(self, base_dir: str) -> Iterator[Tuple[str, List[str]]]:
+        """
+        os.walk の代わりに使う、除外設定を適用した走査です。(root, files) を返します。
+        ignore_dirs に加えて、途中で見つけた .gitignore のルールで
+        ディレクトリを「入る前に」刈り込み、ファイルも除外します。
+        .gitignore は見つけたディレクトリ以下にだけ効きます。
+        """
+        # ディレクトリ -> 親から引き継いだ .gitignore のルール
+        inherited: Dict[str, GitIgnoreRules] = {}
+
+        for root, dirs, files in os.walk(base_dir):
+            rules = inherited.pop(root, None) or GitIgnoreRules()
+
+            if self.respect_gitignore and ".gitignore" in files:
+                try:
+                    own = read_gitignore_rules(
+                        os.path.join(root, ".gitignore")
+                    )
+                except OSError:
+                    own = []
+                if own:
+                    rules = rules.extend(own)
+
+            # dirs[:] = ... とすることで、os.walk の探索対象からその場で削除できる
+            kept = []
+            for d in dirs:
+                if self.should_skip_dir(d):
+                    continue
+                dir_path = os.path.join(root, d)
+                if rules and rules.is_ignored(dir_path, is_dir=True):
+                    continue
+                kept.append(d)
+                inherited[dir_path] = rules
+            dirs[:] = kept
+
+            if rules:
+                files = [
+                    f
+                    for f in files
+                    if not rules.is_ignored(
+                        os.path.join(root, f), is_dir=False
+                    )
+                ]
+            yield root, files
+
     def get_grep_exclude_dir_args(self) -> List[str]:
         """システム grep コマンドに渡す --exclude-dir 引数を生成します"""
         args = []
@@ -84,6 +256,36 @@ class FileExclusions:
         return args
 
 
+def _looks_binary(block: bytes) -> bool:
+    """
+    先頭ブロックの中身からバイナリかどうかを推定します。
+    NUL を含めばバイナリ。UTF-8 として読めないものは、cp932 などの
+    テキストもあり得るので、制御文字が多い場合だけバイナリとみなします。
+    """
+    if b"\0" in block:
+        return True
+    try:
+        # ブロック末尾でマルチバイト文字が切れている可能性があるので
+        # インクリメンタルデコーダで「最後まで読んでいない」扱いにする
+        codecs.getincrementaldecoder("utf-8")().decode(block, final=False)
+        return False
+    except UnicodeDecodeError:
+        pass
+    control = len(block) - len(block.translate(None, _CONTROL_BYTES))
+    return control * 10 > len(block)
+
+
+# 正規表現として特別な意味を持つ文字（これを含まないパターンはリテラル扱い）
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+# 後方参照（パターンを連結すると番号がずれるので、連結の対象外にする）
+_BACKREF = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def _is_literal_pattern(pattern: str) -> bool:
+    return bool(pattern) and not any(c in _REGEX_META for c in pattern)
+
+
 # --- 2. 結果格納用クラス ---
 @dataclass
 class GrepMatch:
@@ -92,49 +294,1205 @@ class GrepMatch:
     line_content: str
 
 
+class GrepResults:
+    """
+    大量の検索結果を省メモリに保持する列指向のコンテナです。
+
+    GrepMatch をそのまま大量に持つと、1件ごとのオブジェクトと重複した
+    file_path 文字列でメモリが膨らむので、
+      * file_path は重複を除いて1回だけ持ち、各結果はその番号を持つ
+      * line_number は array で持つ
+      * line_content は UTF-8 で1つのバッファに連結し、オフセットで持つ
+    という形で保持します。取り出すとき（添字・反復）にだけ GrepMatch を
+    組み立てるので、リストと同じように使えます。
+
+    timed_out が True の場合は、制限時間で打ち切られた途中までの結果です。
+    """
+
+    def __init__(self, matches: Iterable[GrepMatch] = ()):
+        self.timed_out = False
+        self._paths: List[str] = []
+        self._path_ids: Dict[str, int] = {}
+        self._file_ids = array("I")
+        self._line_numbers = array("I")
+        # i 番目の line_content は _content[_offsets[i]:_offsets[i + 1]]
+        self._offsets = array("Q", [0])
+        self._content = bytearray()
+        self.extend(matches)
+
+    def add(self, file_path: str, line_number: int, line_content: str) -> None:
+        """GrepMatch を作らずに1件追加します"""
+        file_id = self._path_ids.get(file_path)
+        if file_id is None:
+            file_id = len(self._paths)
+            self._path_ids[file_path] = file_id
+            self._paths.append(file_path)
+        self._file_ids.append(file_id)
+        self._line_numbers.append(line_number)
+        self._content += line_content.encode("utf-8", errors="replace")
+        self._offsets.append(len(self._content))
+
+    def append(self, match: GrepMatch) -> None:
+        self.add(match.file_path, match.line_number, match.line_content)
+
+    def extend(self, matches: Iterable[GrepMatch]) -> None:
+        if not isinstance(matches, GrepResults):
+            for m in matches:
+                self.add(m.file_path, m.line_number, m.line_content)
+            return
+
+        # GrepResults 同士はオブジェクトを経由せずに列ごと連結する
+        remap = []
+        for path in matches._paths:
+            file_id = self._path_ids.get(path)
+            if file_id is None:
+                file_id = len(self._paths)
+                self._path_ids[path] = file_id
+                self._paths.append(path)
+            remap.append(file_id)
+        self._file_ids.extend(remap[i] for i in matches._file_ids)
+        self._line_numbers.extend(matches._line_numbers)
+        base = len(self._content)
+        self._offsets.extend(base + o for o in matches._offsets[1:])
+        self._content += matches._content
+
+    def _get(self, i: int) -> GrepMatch:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return GrepMatch(
+            file_path=self._paths[self._file_ids[i]],
+            line_number=self._line_numbers[i],
+            line_content=self._content[start:end].decode("utf-8"),
+        )
+
+    def __len__(self) -> int:
+        return len(self._line_numbers)
+
+    def __iter__(self) -> Iterator[GrepMatch]:
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[GrepMatch, List[GrepMatch]]:
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("GrepResults index out of range")
+        return self._get(index)
+
+    def __repr__(self) -> str:
+        return (
+            f"<GrepResults: {len(self)} matches in {len(self._paths)} files>"
+        )
+
+    def nbytes(self) -> int:
+        """おおよその使用メモリ量（キャッシュの容量管理用）"""
+        return (
+            len(self._content)
+            + self._file_ids.itemsize * len(self._file_ids)
+            + self._line_numbers.itemsize * len(self._line_numbers)
+            + self._offsets.itemsize * len(self._offsets)
+            + sum(len(p) + 100 for p in self._paths)
+        )
+
+    def files(self) -> List[str]:
+        """マッチしたファイルの一覧（最初に現れた順）"""
+        return list(self._paths)
+
+    def sort(self, file_order: Optional[Dict[str, int]] = None) -> None:
+        """
+        (file_path, line_number) の順に並べ替えます。
+        file_order（パス -> 順位）を渡すと、ファイルはその順に並べます。
+        """
+        if file_order is None:
+            rank = self._paths
+        else:
+            rank = [file_order.get(p, len(file_order)) for p in self._paths]
+        order = sorted(
+            range(len(self)),
+            key=lambda i: (rank[self._file_ids[i]], self._line_numbers[i]),
+        )
+        content = bytearray()
+        offsets = array("Q", [0])
+        for i in order:
+            content += self._content[self._offsets[i] : self._offsets[i + 1]]
+            offsets.append(len(content))
+        self._file_ids = array("I", (self._file_ids[i] for i in order))
+        self._line_numbers = array("I", (self._line_numbers[i] for i in order))
+        self._offsets = offsets
+        self._content = content
+
+
+@dataclass
+class GrepMultiMatch(GrepMatch):
+    """execute_many() の結果。どのパターンにマッチしたかを持ちます。"""
+
+    pattern: str
+
+
+# --- Python Fallback の検索処理 (プロセスプールからも呼ぶのでモジュール関数) ---
+def _search_file(regex, file_path: str, rel_path: str) -> Iterator[GrepMatch]:
+    """
+    1ファイルを行単位で検索し、マッチを順に返すジェネレータです。
+    読み込みエラーは無視します（途中で打ち切ればファイルはその時点で閉じます）。
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            for i, line in enumerate(f):
+                if regex.search(line):
+                    yield GrepMatch(
+                        file_path=rel_path,
+                        line_number=i + 1,
+                        line_content=line.strip(),
+                    )
+    except Exception:
+        # 読み込みエラーは無視
+        return
+
+
+def _search_file_prefiltered(
+    regex, analysis, file_path: str, rel_path: str
+) -> Iterator[GrepMatch]:
+    """
+    必須リテラル (PatternAnalysis) を使って検索します。
+    ファイル全体を小文字化し、bytes.find でリテラルが見つからなければ即終了、
+    見つかった場合もリテラルを含む行だけをデコードして正規表現を走らせます。
+    """
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except Exception:
+        # 読み込みエラーは無視
+        return
+
+    lowered = data.lower()
+    if not analysis.may_match_bytes(lowered):
+        return
+
+    # このファイルで出現回数が最も少ない OR 集合のリテラルを手がかりに、
+    # 候補行へ飛ぶ (count は C の速度で走るので、行ごとの判定より安い)
+    counts = [sum(lowered.count(lit) for lit in c) for c in analysis.clauses]
+    best = min(range(len(counts)), key=counts.__getitem__)
+    clause = analysis.clauses[best]
+
+    # 候補行が多すぎる場合は、行ごとに飛ぶより普通に全行を見るほうが速い
+    # また、単独の "\r" もテキストモードでは改行になるので、"\n" だけで行を
+    # 区切るこの関数では扱わない
+    if counts[best] * DENSE_HIT_RATIO > lowered.count(b"\n") + 1 or (
+        data.count(b"\r") != data.count(b"\r\n")
+    ):
+        yield from _search_file(regex, file_path, rel_path)
+        return
+    size = len(data)
+    pos = 0
+    line_number = 1
+    counted_to = 0  # line_number はこの位置までの改行数 + 1
+    # リテラルごとの次の出現位置（毎回末尾まで find し直さないよう覚えておく）
+    # （None は未検索、-1 はもう出現しない）
+    next_hits: Dict[bytes, Optional[int]] = {lit: None for lit in clause}
+    while pos < size:
+        for lit, h in next_hits.items():
+            if h is None or 0 <= h < pos:
+                next_hits[lit] = lowered.find(lit, pos)
+        hits = [h for h in next_hits.values() if h >= 0]
+        if not hits:
+            break
+        hit = min(hits)
+
+        start = lowered.rfind(b"\n", 0, hit) + 1
+        end = lowered.find(b"\n", hit)
+        end = size if end < 0 else end + 1  # 改行を含めて切り出す
+
+        # テキストモードで読んだときと同じ形 (改行は \n) の行にして判定する
+        line = data[start:end].decode("utf-8", errors="ignore")
+        if line.endswith("\r\n"):
+            line = line[:-2] + "\n"
+        if regex.search(line):
+            line_number += data.count(b"\n", counted_to, start)
+            counted_to = start
+            yield GrepMatch(
+                file_path=rel_path,
+                line_number=line_number,
+                line_content=line.strip(),
+            )
+        pos = end
+
+
+def _compile_bytes_regex(pattern: str):
+    """
+    mmap 検索用にバイト列の正規表現をコンパイルします。
+    str の検索と結果が変わってしまうパターン (ASCII 以外を含むもの、
+    \\A \\Z \\s \\S を含むもの) や、バイト列では表現できないパターン
+    (名前付き Unicode エスケープなど) の場合は None を返します。
+    ただし str の IGNORECASE が行う特殊な対応付け ("i" と "İ" "ı"、
+    "k" とケルビン記号、"s" と "ſ") は行いません。
+    """
+    if not pattern.isascii() or _BYTES_UNSAFE.search(pattern):
+        return None
+    try:
+        return re.compile(
+            pattern.encode("utf-8"), re.IGNORECASE | re.MULTILINE
+        )
+    except (re.error, UnicodeEncodeError):
+        return None
+
+
+def _search_file_mmap(
+    bregex, regex, fallback, file_path: str, rel_path: str
+) -> Iterator[GrepMatch]:
+    """
+    ファイルを mmap し、バッファ全体に対してバイト列の正規表現を走らせます。
+    ヒットした箇所についてだけ行番号を数え、その行をデコードします。
+    fallback (バイト列の正規表現) にヒットするファイル、つまり "\\r" の
+    改行や str と結果が変わり得る文字を含むファイルは、regex (str) で
+    行単位に検索します。
+    パターンが is_width_sensitive な場合（x.y や \\w など）、ASCII 以外の
+    文字を含むファイルは最初の1つを見つけるまで読んでから str で読み直す
+    ので、mmap 検索はかえって遅くなります（.* や [^x]+ は影響しません）。
+    """
+    try:
+        with open(file_path, "rb") as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空ファイルは mmap できない
+                return
+            with buf:
+                use_str = fallback.search(buf) is not None
+                if not use_str:
+                    yield from _search_buffer(bregex, buf, rel_path)
+    except Exception:
+        # 読み込みエラーは無視
+        return
+    if use_str:
+        yield from _search_file(regex, file_path, rel_path)
+
+
+def _search_buffer(bregex, buf, rel_path: str) -> Iterator[GrepMatch]:
+    """_search_file_mmap の本体です (buf は "\\r" を含まないこと)"""
+    size = len(buf)
+    pos = 0
+    line_number = 1
+    counted_to = 0  # line_number はこの位置までの改行数 + 1
+    while pos < size:
+        m = bregex.search(buf, pos)
+        if m is None:
+            break
+
+        # マッチ開始位置を含む行の範囲 (テキストモードと同じく改行も含める)
+        start = buf.rfind(b"\n", 0, m.start()) + 1
+        end = buf.find(b"\n", m.start())
+        end = size if end < 0 else end + 1
+
+        # [^x] などは改行をまたいでマッチし得るので、行単位で再確認する
+        line = buf[start:end]
+        if bregex.search(line):
+            line_number += buf[counted_to:start].count(b"\n")
+            counted_to = start
+            yield GrepMatch(
+                file_path=rel_path,
+                line_number=line_number,
+                line_content=line.decode("utf-8", errors="ignore").strip(),
+            )
+        pos = end
+
+
+def _search_file_batch(
+    pattern: str,
+    target_dir: str,
+    file_paths: List[str],
+    use_mmap: bool = False,
+    max_per_file: Optional[int] = None,
+) -> GrepResults:
+    """ワーカープロセスで実行される、ファイル群の検索処理です。"""
+    return GrepResults(
+        _iter_file_batch(
+            pattern, target_dir, file_paths, use_mmap, max_per_file
+        )
+    )
+
+
+def _iter_file_batch(
+    pattern: str,
+    target_dir: str,
+    file_paths,
+    use_mmap: bool = False,
+    max_per_file: Optional[int] = None,
+) -> Iterator[GrepMatch]:
+    """
+    ファイル群を順に検索し、マッチを返すジェネレータです。
+    パターンから必須リテラルが取り出せる場合は、小文字化した bytes.find で
+    ファイルや行を先に絞り込み、含まないものには正規表現を走らせません。
+    """
+    search = _file_searcher(pattern, target_dir, use_mmap)
+    for file_path in file_paths:
+        matches = search(file_path)
+        if max_per_file is not None:
+            # 上限に達したらそのファイルの読み込みを打ち切る
+            matches = islice(matches, max_per_file)
+        yield from matches
+
+
+def _file_searcher(
+    pattern: str, target_dir: str, use_mmap: bool = False
+) -> Callable[[str], Iterator[GrepMatch]]:
+    """
+    1ファイルを検索する関数を返します。
+    パターンのコンパイルと解析はここで1回だけ行います。
+    """
+    regex = re.compile(pattern, re.IGNORECASE)
+    bregex = _compile_bytes_regex(pattern) if use_mmap else None
+    fallback = _NON_ASCII_OR_CR if is_width_sensitive(pattern) else _CR
+    analysis = analyze(pattern)
+
+    def search(file_path: str) -> Iterator[GrepMatch]:
+        rel_path = os.path.relpath(file_path, target_dir)
+        # 必須リテラルがあれば、1回読むだけで候補行に飛べる先読みフィルタの
+        # ほうが、判定と mmap 検索で2回読むより速い
+        if analysis and _file_size(file_path) <= MAX_PREFILTER_READ_SIZE:
+            return _search_file_prefiltered(
+                regex, analysis, file_path, rel_path
+            )
+        if analysis and not analysis.may_match_file(file_path):
+            return iter(())
+        if bregex is not None:
+            return _search_file_mmap(
+                bregex, regex, fallback, file_path, rel_path
+            )
+        return _search_file(regex, file_path, rel_path)
+
+    return search
+
+
+def _search_worker(
+    pattern: str,
+    target_dir: str,
+    file_paths: List[str],
+    use_mmap: bool,
+    out_queue,
+    max_per_file: Optional[int] = None,
+) -> None:
+    """
+    deadline 付き検索のワーカープロセスです。
+    ファイルを1つ検索し終えるたび（または一定件数ごと）に結果を out_queue へ
+    送るので、途中で kill されてもそこまでの結果は親に届きます。
+    最後に None を送ります。
+    """
+    try:
+        search = _file_searcher(pattern, target_dir, use_mmap)
+        for file_path in file_paths:
+            buf = GrepResults()
+            for m in islice(search(file_path), max_per_file):
+                buf.add(m.file_path, m.line_number, m.line_content)
+                if len(buf) >= DEADLINE_FLUSH_SIZE:
+                    out_queue.put(buf)
+                    buf = GrepResults()
+            if len(buf):
+                out_queue.put(buf)
+    finally:
+        out_queue.put(None)
+
+
+def _file_size(file_path: str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def _balance_by_size(file_paths: List[str], nbins: int) -> List[List[str]]:
+    """
+    ファイルサイズの合計がなるべく均等になるように nbins 個に振り分けます。
+    大きいファイルから順に「現在いちばん軽いビン」へ入れる貪欲法 (LPT) です。
+    """
+    sized = [(_file_size(file_path), file_path) for file_path in file_paths]
+    sized.sort(reverse=True)
+
+    nbins = max(1, min(nbins, len(sized)))
+    bins: List[List[str]] = [[] for _ in range(nbins)]
+    heap = [(0, i) for i in range(nbins)]  # (合計サイズ, ビン番号)
+    for size, file_path in sized:
+        total, i = heapq.heappop(heap)
+        bins[i].append(file_path)
+        heapq.heappush(heap, (total + size, i))
+    return [b for b in bins if b]
+
+
 # --- 3. Grep ツール本体 ---
 class GrepTool:
-    def __init__(self, target_dir: str):
+    def __init__(
+        self,
+        target_dir: str,
+        index_path: Optional[str] = None,
+        workers: int = 1,
+        use_mmap: bool = False,
+        cache_bytes: int = 0,
+        timeout: Optional[float] = None,
+    ):
+        """
+        index_path を指定すると、トライグラム索引をそこに保存し、
+        検索前に候補ファイルを絞り込みます（None なら索引を使いません）。
+        workers に 2 以上を指定すると、Python Fallback をプロセスプールで
+        並列実行します（0 なら CPU 数）。
+        use_mmap を True にすると、Python Fallback はファイルを mmap して
+        バイト列の正規表現で一括検索します（ヒットの少ないファイルで高速）。
+        cache_bytes に正の値を指定すると、検索結果をその容量までキャッシュし、
+        同じ検索の繰り返しでは変更されたファイルだけを再検索します。
+        timeout（秒）を指定すると、Python Fallback を別プロセスで実行し、
+        時間切れの場合はそこまでの結果を timed_out=True で返します。
+        指定しない場合、入れ子の量指定子のような危険なパターンは
+        Python Fallback では実行せずに ValueError にします。
+        """
         self.target_dir = os.path.abspath(target_dir)
+        self.cache: Optional[ResultCache] = (
+            ResultCache(cache_bytes) if cache_bytes > 0 else None
+        )
+        self.use_mmap = use_mmap
+        self.timeout = timeout
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
         self.exclusions = FileExclusions()
+        self.index: Optional[TrigramIndex] = None
+        if index_path is not None:
+            index_path = os.path.abspath(index_path)
+            # 索引ファイル自体は検索対象から外す
+            self.exclusions.ignore_files.add(os.path.basename(index_path))
+            self.exclusions.ignore_files.add(
+                os.path.basename(index_path) + ".tmp"
+            )
+            self.index = TrigramIndex(
+                self.target_dir, index_path, self.exclusions
+            )
 
     def execute(
         self, pattern: str, include: Optional[str] = None
-    ) -> List[GrepMatch]:
+    ) -> GrepResults:
         """
         3つの戦略を順に試して検索を行います。
         1. git grep (Gitリポジトリの場合)
         2. system grep (grepコマンドがある場合)
         3. python fallback (最終手段)
+        索引が有効な場合は、各戦略が検索するファイルのうち、マッチし得ないと
+        分かったものを除いてから渡します（結果は索引が無い場合と同じです）。
+        結果は GrepMatch のリストと同じように使える GrepResults で返します。
         """
         print(f"Searching for pattern: '{pattern}' in {self.target_dir} ...")
 
+        if self.cache is not None:
+            return self._execute_cached(pattern, include)
+
+        return self._run_strategies(
+            pattern, include, self._index_rejected(pattern)
+        )
+
+    def _strategies(self) -> List[str]:
+        """使える戦略を試す順に返します ("git" / "grep" / "python")"""
+        strategies = []
+        if self._is_git_repo() and self._is_command_available("git"):
+            strategies.append("git")
+        if self._is_command_available("grep"):
+            strategies.append("grep")
+        strategies.append("python")
+        return strategies
+
+    def _run_strategy(
+        self,
+        strategy: str,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+    ) -> GrepResults:
+        """strategy で検索します。files を渡すとそれだけを検索します"""
         # 戦略1: git grep
         # .gitignore を勝手に考慮してくれるので最強かつ最速です。
+        if strategy == "git":
+            print("[Strategy 1] Using 'git grep'")
+            return self._strategy_git_grep(pattern, include, files)
+
+        # 戦略2: system grep
+        # OS標準のgrepを使います。高速ですが、.gitignore は考慮しないので
+        # 手動で除外オプション(--exclude-dirなど)を渡す必要があります。
+        if strategy == "grep":
+            print("[Strategy 2] Using 'system grep'")
+            return self._strategy_system_grep(pattern, include, files)
+
+        # 戦略3: Python Fallback
+        # 外部コマンドに頼らず、Pythonだけで検索します。
+        # 速度は劣りますが、環境依存がありません。
+        return self._python_fallback(pattern, include, files)
+
+    def _run_strategies(
+        self,
+        pattern: str,
+        include: Optional[str],
+        rejected: Optional[Set[str]] = None,
+    ) -> GrepResults:
+        """
+        3つの戦略を順に試します（外部コマンドが失敗したら次の戦略へ）。
+        rejected は索引でマッチし得ないと分かったファイルです（None なら
+        各戦略にツリー全体を検索させます）。
+        """
+        for strategy in self._strategies():
+            try:
+                files = self._strategy_files(strategy, include, rejected)
+                return self._run_strategy(strategy, pattern, include, files)
+            except Exception as e:
+                if strategy == "python":
+                    raise
+                print(
+                    f"Warning: {_COMMAND_NAMES[strategy]} failed ({e}), "
+                    "falling back..."
+                )
+
+    def _python_fallback(
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+        max_per_file: Optional[int] = None,
+        lazy: bool = False,
+    ) -> Iterable[GrepMatch]:
+        """
+        Python Fallback の共通の入口です（検索・件数・ストリーム・複数パターンの
+        全てがここを通ります）。
+        re には時間制限が無いので、危険なパターンは timeout を指定した
+        場合だけ deadline 付きで実行し、それ以外は ValueError にします
+        （grep / git grep はバックトラックしないので外部コマンドなら問題ない）。
+        通常は GrepResults を返します。lazy なら、逐次実行のときは
+        マッチを読みながら返すジェネレータを返します。
+        """
+        # 不正なパターンはワーカーに渡す前にここでエラーにする
+        re.compile(pattern, re.IGNORECASE)
+
+        if self.timeout is not None:
+            print(
+                "[Strategy 3] Using 'Python fallback' "
+                f"({self.timeout}s deadline)"
+            )
+            return self._strategy_python_deadline(
+                pattern, include, files, max_per_file
+            )
+        risk = find_risky_construct(pattern)
+        if risk is not None:
+            raise ValueError(
+                f"Pattern '{pattern}' is rejected for the Python fallback "
+                f"({risk}); set timeout to run it with a deadline"
+            )
+        if self.workers > 1:
+            print(
+                "[Strategy 3] Using 'Python fallback' "
+                f"({self.workers} workers)"
+            )
+            return self._strategy_python_parallel(
+                pattern, include, files, max_per_file
+            )
+        print("[Strategy 3] Using 'Python fallback'")
+        matches = _iter_file_batch(
+            pattern,
+            self.target_dir,
+            self._iter_files(include, files),
+            self.use_mmap,
+            max_per_file,
+        )
+        return matches if lazy else GrepResults(matches)
+
+    def _execute_cached(
+        self, pattern: str, include: Optional[str]
+    ) -> GrepResults:
+        """
+        結果キャッシュを使った検索です。戦略ごとにキャッシュを持つので、
+        結果はキャッシュを使わない execute() と同じになります。
+        """
+        for strategy in self._strategies():
+            try:
+                return self._execute_cached_with(strategy, pattern, include)
+            except Exception as e:
+                if strategy == "python":
+                    raise
+                print(
+                    f"Warning: {_COMMAND_NAMES[strategy]} failed ({e}), "
+                    "falling back..."
+                )
+
+    def _execute_cached_with(
+        self, strategy: str, pattern: str, include: Optional[str]
+    ) -> GrepResults:
+        """
+        strategy で検索するファイルのうち、前回から (mtime, size) が
+        変わったファイルと新しいファイルだけを再検索し、残りはキャッシュの
+        結果とマージします。ファイルの一覧はその戦略自身が検索するもの
+        （.gitignore で除外したファイルなどを含む）なので、キャッシュが
+        当たっても外れても検索範囲と結果の順番は変わりません。
+        """
+        key = (pattern, include, strategy)
+        entry = self.cache.get(key) or CacheEntry()
+
+        # 現在の対象ファイルとその指紋（結果はこの順で並べる）
+        current: Dict[str, Tuple[int, int]] = {}
+        for rel_path in self._list_files(strategy, include):
+            try:
+                st = os.stat(os.path.join(self.target_dir, rel_path))
+            except OSError:
+                continue
+            current[rel_path] = (st.st_mtime_ns, st.st_size)
+
+        changed = [
+            p for p, fp in current.items() if entry.fingerprints.get(p) != fp
+        ]
+        changed_set = set(changed)
+        timed_out = False
+        new_entry = CacheEntry(
+            fingerprints=current,
+            matches={
+                p: m
+                for p, m in entry.matches.items()
+                if p in current and p not in changed_set
+            },
+        )
+
+        if changed:
+            print(
+                f"[Cache] Rescanning {len(changed)} of {len(current)} file(s)"
+            )
+            self.cache.rescanned_files += len(changed)
+
+            # 索引があれば、マッチし得ないファイルは検索せずに済ませる
+            targets = changed
+            rejected = self._index_rejected(pattern)
+            if rejected is not None:
+                targets = [
+                    p for p in changed if os.path.normpath(p) not in rejected
+                ]
+
+            if targets:
+                found = self._run_strategy(strategy, pattern, include, targets)
+                timed_out = found.timed_out
+                for m in found:
+                    new_entry.matches.setdefault(
+                        m.file_path, GrepResults()
+                    ).add(m.file_path, m.line_number, m.line_content)
+        else:
+            print("[Cache] All results from cache")
+
+        if timed_out:
+            # 途中までの結果はキャッシュしない
+            self.cache.discard(key)
+        else:
+            self.cache.put(key, new_entry)
+
+        results = GrepResults()
+        results.timed_out = timed_out
+        for rel_path in current:
+            file_results = new_entry.matches.get(rel_path)
+            if file_results is not None:
+                results.extend(file_results)
+        return results
+
+    def execute_files_with_matches(
+        self, pattern: str, include: Optional[str] = None
+    ) -> List[str]:
+        """
+        マッチを含むファイルの一覧だけを返します (grep -l 相当)。
+        各ファイルは最初のマッチが見つかった時点で読み込みを打ち切ります。
+        """
+        print(f"Listing files for: '{pattern}' in {self.target_dir} ...")
+        return list(self._execute_counts(pattern, include, first_only=True))
+
+    def execute_count(
+        self, pattern: str, include: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        マッチした行数をファイルごとに返します (grep -c 相当)。
+        マッチの無いファイルは含みません。
+        """
+        print(f"Counting pattern: '{pattern}' in {self.target_dir} ...")
+        return self._execute_counts(pattern, include, first_only=False)
+
+    def _execute_counts(
+        self, pattern: str, include: Optional[str], first_only: bool
+    ) -> Dict[str, int]:
+        """execute() と同じ戦略の順で、ファイルごとの件数だけを求めます"""
+        rejected = self._index_rejected(pattern)
+        mode = "files_with_matches" if first_only else "count"
+
+        # 戦略1: git grep -l / -c
         if self._is_git_repo() and self._is_command_available("git"):
             print("[Strategy 1] Using 'git grep'")
             try:
-                return self._strategy_git_grep(pattern, include)
+                files = self._strategy_files("git", include, rejected)
+                return self._parse_count_output(
+                    self._run_grep_output(
+                        self._build_git_grep_cmd(
+                            pattern, include, files, mode
+                        ),
+                        files,
+                    ),
+                    first_only,
+                )
             except Exception as e:
                 print(f"Warning: git grep failed ({e}), falling back...")
 
-        # 戦略2: system grep
-        # OS標準のgrepを使います。高速ですが、.gitignore は考慮しないので
-        # 手動で除外オプション(--exclude-dirなど)を渡す必要があります。
+        # 戦略2: grep -l / -c
         if self._is_command_available("grep"):
             print("[Strategy 2] Using 'system grep'")
             try:
-                return self._strategy_system_grep(pattern, include)
+                files = self._strategy_files("grep", include, rejected)
+                return self._parse_count_output(
+                    self._run_grep_output(
+                        self._build_system_grep_cmd(
+                            pattern, include, files, mode=mode
+                        ),
+                        files,
+                    ),
+                    first_only,
+                )
             except Exception as e:
                 print(f"Warning: system grep failed ({e}), falling back...")
 
         # 戦略3: Python Fallback
-        # 外部コマンドに頼らず、Pythonだけで検索します。
-        # 速度は劣りますが、環境依存がありません。
-        print("[Strategy 3] Using 'Python fallback'")
-        return self._strategy_python_fallback(pattern, include)
+        counts: Dict[str, int] = {}
+        for m in self._python_fallback(
+            pattern,
+            include,
+            self._strategy_files("python", include, rejected),
+            1 if first_only else None,
+        ):
+            counts[m.file_path] = counts.get(m.file_path, 0) + 1
+        return counts
+
+    def execute_stream(
+        self,
+        pattern: str,
+        include: Optional[str] = None,
+        max_results: Optional[int] = None,
+        max_per_file: Optional[int] = None,
+    ) -> Iterator[GrepMatch]:
+        """
+        execute() のストリーミング版です。
+        外部コマンドの出力を読みながら GrepMatch を1件ずつ返します。
+        max_results（全体）/ max_per_file（1ファイルあたり）に達した時点で
+        子プロセスを kill して打ち切るので、広いパターンでも最初の結果が
+        すぐに返り、出力全体をメモリに溜め込みません。
+        （Python Fallback は、逐次実行のときだけ読みながら返します）
+        """
+        print(f"Streaming pattern: '{pattern}' in {self.target_dir} ...")
+        if max_results is not None and max_results <= 0:
+            return
+
+        rejected = self._index_rejected(pattern)
+
+        streams: List[Tuple[str, Callable[[], Iterator[GrepMatch]]]] = []
+        if self._is_git_repo() and self._is_command_available("git"):
+            streams.append(
+                (
+                    "git grep",
+                    lambda: self._stream_strategy(
+                        "git", pattern, include, rejected
+                    ),
+                )
+            )
+        if self._is_command_available("grep"):
+            streams.append(
+                (
+                    "system grep",
+                    lambda: self._stream_strategy(
+                        "grep", pattern, include, rejected, max_per_file
+                    ),
+                )
+            )
+        streams.append(
+            (
+                "Python fallback",
+                lambda: iter(
+                    self._python_fallback(
+                        pattern,
+                        include,
+                        self._strategy_files("python", include, rejected),
+                        max_per_file,
+                        lazy=True,
+                    )
+                ),
+            )
+        )
+
+        count = 0
+        per_file: Dict[str, int] = {}
+        for name, make_stream in streams:
+            print(f"[Stream] Using '{name}'")
+            stream = make_stream()
+            yielded = False
+            try:
+                for match in stream:
+                    if max_per_file is not None:
+                        n = per_file.get(match.file_path, 0)
+                        if n >= max_per_file:
+                            continue
+                        per_file[match.file_path] = n + 1
+
+                    yielded = True
+                    yield match
+                    count += 1
+                    if max_results is not None and count >= max_results:
+                        return
+                return
+            except Exception as e:
+                # 途中まで返してしまった場合は、重複を避けるため切り替えない
+                if yielded or name == streams[-1][0]:
+                    raise
+                print(f"Warning: {name} failed ({e}), falling back...")
+            finally:
+                # 打ち切り時はここで子プロセスが kill される
+                stream.close()
+
+    def execute_many(
+        self, patterns: List[str], include: Optional[str] = None
+    ) -> List[GrepMultiMatch]:
+        """
+        複数のパターンを、ツリーを1回走査するだけで検索します。
+        リテラルのパターンは Aho-Corasick 法でまとめて探し、それ以外は
+        全パターンを連結した正規表現で行を絞ってから個別に判定します。
+        1行が複数のパターンにマッチした場合は、パターンごとに結果を返します。
+        （外部コマンドは使わず、Python だけで検索します。入れ子の量指定子の
+        ような危険なパターンは、execute() の Python Fallback と同じく
+        timeout が無ければ ValueError にし、あれば deadline 付きで別に検索します）
+        """
+        print(
+            f"Searching for {len(patterns)} patterns in {self.target_dir} ..."
+        )
+
+        # 同じパターンが重複して渡されても1回だけ検索する
+        unique = list(dict.fromkeys(patterns))
+        literals = [p for p in unique if _is_literal_pattern(p)]
+        regexes = [p for p in unique if not _is_literal_pattern(p)]
+
+        # 危険なパターンは1回の走査に混ぜず、Python Fallback の共通の入口で
+        # 検索する（timeout が無ければここで ValueError になる）
+        risky = [p for p in regexes if find_risky_construct(p) is not None]
+        risky_results = [(p, self._python_fallback(p, include)) for p in risky]
+        regexes = [p for p in regexes if p not in risky]
+
+        # リテラル: C で動く連結正規表現で行を絞り、Aho-Corasick で全件拾う
+        literal_filter = None
+        automaton = None
+        if literals:
+            longest_first = sorted(literals, key=len, reverse=True)
+            literal_filter = re.compile(
+                "|".join(re.escape(p) for p in longest_first), re.IGNORECASE
+            )
+            automaton = AhoCorasick([p.lower() for p in literals])
+
+        # 正規表現: 連結した1つの正規表現で行を絞ってから個別に判定する
+        compiled = [(p, re.compile(p, re.IGNORECASE)) for p in regexes]
+        combined = None
+        if compiled and not any(_BACKREF.search(p) for p in regexes):
+            try:
+                combined = re.compile(
+                    "|".join(f"(?:{p})" for p in regexes), re.IGNORECASE
+                )
+            except re.error:
+                combined = None
+
+        # 結果は元のパターンの順に並べる
+        order = {p: i for i, p in enumerate(unique)}
+
+        results: List[GrepMultiMatch] = []
+        file_order: Dict[str, int] = {}
+        for file_path in self._iter_files(include):
+            rel_path = os.path.relpath(file_path, self.target_dir)
+            file_order[rel_path] = len(file_order)
+            if not literals and not regexes:
+                continue
+            try:
+                with open(
+                    file_path, "r", encoding="utf-8", errors="ignore"
+                ) as f:
+                    for i, line in enumerate(f):
+                        hits: List[str] = []
+                        if literal_filter and literal_filter.search(line):
+                            hits += [
+                                literals[k]
+                                for k in automaton.matched_indexes(
+                                    line.lower()
+                                )
+                            ]
+                        if compiled and (
+                            combined is None or combined.search(line)
+                        ):
+                            hits += [p for p, r in compiled if r.search(line)]
+                        for p in sorted(hits, key=order.__getitem__):
+                            results.append(
+                                GrepMultiMatch(
+                                    file_path=rel_path,
+                                    line_number=i + 1,
+                                    line_content=line.strip(),
+                                    pattern=p,
+                                )
+                            )
+            except Exception:
+                # 読み込みエラーは無視
+                continue
+
+        if risky_results:
+            for p, found in risky_results:
+                results += [
+                    GrepMultiMatch(
+                        file_path=m.file_path,
+                        line_number=m.line_number,
+                        line_content=m.line_content,
+                        pattern=p,
+                    )
+                    for m in found
+                ]
+            # 走査順 → 行番号 → パターンの順に並べ直す
+            results.sort(
+                key=lambda m: (
+                    file_order.get(m.file_path, len(file_order)),
+                    m.line_number,
+                    order[m.pattern],
+                )
+            )
+        return results
 
     # --- Helper Methods ---
+    def _index_rejected(self, pattern: str) -> Optional[Set[str]]:
+        """
+        索引を差分更新し、pattern にマッチし得ないと分かったファイル
+        （相対パス）の集合を返します。
+        索引が無効、または絞り込めないパターンの場合は None を返します。
+        """
+        if self.index is None:
+            return None
+
+        self.index.update()
+        return self.index.rejected(pattern)
+
+    def _strategy_files(
+        self,
+        strategy: str,
+        include: Optional[str],
+        rejected: Optional[Set[str]],
+    ) -> Optional[List[str]]:
+        """
+        索引で絞り込む場合に、strategy ("git" / "grep" / "python") で
+        検索するファイルの一覧を返します（絞り込まない場合は None）。
+        戦略自身が検索するファイルから、索引でマッチし得ないと分かったもの
+        だけを除くので、索引の有無で検索範囲は変わりません
+        （索引は FileExclusions で除外したファイルを持たないため、索引の
+        対象だけに絞ると、git grep や grep -r が検索するファイルが漏れる）。
+        """
+        if rejected is None:
+            return None
+        files = [
+            p
+            for p in self._list_files(strategy, include)
+            if os.path.normpath(p) not in rejected
+        ]
+        print(f"[Index] {len(files)} candidate file(s)")
+        return files
+
+    def _list_files(self, strategy: str, include: Optional[str]) -> List[str]:
+        """
+        strategy が検索するファイルを、その戦略が結果に出力するパスの形と
+        順番で返します（git grep は "a/b.txt"、grep -r は "./a/b.txt"）。
+        """
+        if strategy == "git":
+            return self._git_files(include)
+        if strategy == "grep":
+            return list(self._grep_files(include))
+        return [
+            os.path.relpath(file_path, self.target_dir)
+            for file_path in self._iter_files(include)
+        ]
+
+    def _git_files(self, include: Optional[str]) -> List[str]:
+        """
+        git grep --untracked が検索するファイル（管理下のファイルと、
+        無視されていない未追跡のファイル）をパス順に返します。
+        """
+        cmd = [
+            "git",
+            "ls-files",
+            "-z",
+            "--cached",
+            "--others",
+            "--exclude-standard",
+        ]
+        if include:
+            # git grep と同じ pathspec として解釈させる
+            cmd += ["--", include]
+        result = subprocess.run(
+            cmd, cwd=self.target_dir, capture_output=True, check=True
+        )
+        # 競合中のファイルは段ごとに出るので、重複は除く
+        return sorted(
+            {os.fsdecode(p) for p in result.stdout.split(b"\0") if p}
+        )
+
+    def _grep_files(self, include: Optional[str]) -> Iterator[str]:
+        """
+        grep -r が検索するファイルを、grep と同じ順（ディレクトリは見つけた
+        ところで潜る）で返します。grep -r と同じく、--exclude-dir の
+        ディレクトリ、シンボリックリンク、通常のファイル以外は飛ばし、
+        include はファイル名に対して判定します。
+        """
+
+        def scan(dir_path: str, rel_dir: str) -> Iterator[str]:
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                return
+            for entry in entries:
+                if entry.is_symlink():
+                    continue
+                rel_path = f"{rel_dir}/{entry.name}"
+                if entry.is_dir():
+                    if not self.exclusions.should_skip_dir(entry.name):
+                        yield from scan(entry.path, rel_path)
+                elif entry.is_file() and (
+                    not include or fnmatch.fnmatch(entry.name, include)
+                ):
+                    yield rel_path
+
+        return scan(self.target_dir, ".")
+
+    def _iter_files(
+        self, include: Optional[str], files: Optional[List[str]] = None
+    ) -> Iterator[str]:
+        """
+        検索対象ファイルの絶対パスを順に返します。
+        files（相対パスのリスト）が与えられた場合は、ツリーを走査せずにそれを使います。
+        """
+        if files is not None:
+            for rel_path in files:
+                yield os.path.join(self.target_dir, rel_path)
+            return
+
+        # 1. ディレクトリの除外設定 (.gitignore を含む) を適用しながら再帰探索
+        for root, names in self.exclusions.walk(self.target_dir):
+            for name in names:
+                file_path = os.path.join(root, name)
+
+                # 2. include パターンがある場合のフィルタ
+                if include and not fnmatch.fnmatch(name, include):
+                    continue
+
+                # 3. ファイル除外設定（バイナリ等）の適用
+                if self.exclusions.is_ignored(file_path, self.target_dir):
+                    continue
+
+                yield file_path
+
+    def _run_grep_command(
+        self, cmd: List[str], files: Optional[List[str]]
+    ) -> GrepResults:
+        """grep 系コマンドを実行して結果をパースします。"""
+        results = GrepResults()
+        for output in self._run_grep_output(cmd, files):
+            results.extend(self._parse_grep_output(output))
+        return results
+
+    def _run_grep_output(
+        self, cmd: List[str], files: Optional[List[str]]
+    ) -> Iterator[str]:
+        """
+        grep 系コマンドを実行し、標準出力をバッチごとに返します。
+        files が与えられた場合は、コマンドライン長を超えないよう分割して渡します。
+        """
+        if files is None:
+            batches: List[List[str]] = [[]]
+        else:
+            batches = [
+                files[i : i + FILE_ARGS_CHUNK]
+                for i in range(0, len(files), FILE_ARGS_CHUNK)
+            ]
+
+        for batch in batches:
+            result = subprocess.run(
+                cmd + batch,
+                cwd=self.target_dir,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",  # Windowsでは cp932 になることもあるので注意
+                errors="replace",
+            )
+
+            if result.returncode not in (
+                0,
+                1,
+            ):  # 0=見つかった, 1=見つからない, 2+=エラー
+                raise RuntimeError(
+                    f"Exit code {result.returncode}: {result.stderr}"
+                )
+
+            yield result.stdout
+
+    def _stream_grep_command(
+        self, cmd: List[str], files: Optional[List[str]]
+    ) -> Iterator[GrepMatch]:
+        """
+        grep 系コマンドを Popen で起動し、出力を1行ずつパースして返します。
+        ジェネレータが途中で閉じられた場合は子プロセスを kill します。
+        """
+        if files is None:
+            batches: List[List[str]] = [[]]
+        else:
+            batches = [
+                files[i : i + FILE_ARGS_CHUNK]
+                for i in range(0, len(files), FILE_ARGS_CHUNK)
+            ]
+
+        for batch in batches:
+            # stderr をパイプにすると、大量のエラー出力で詰まる恐れがあるので
+            # 一時ファイルに逃がす
+            with tempfile.TemporaryFile() as err:
+                proc = subprocess.Popen(
+                    cmd + batch,
+                    cwd=self.target_dir,
+                    stdout=subprocess.PIPE,
+                    stderr=err,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                )
+                try:
+                    for line in proc.stdout:
+                        match = self._parse_grep_line(line.rstrip("\n"))
+                        if match is not None:
+                            yield match
+                    proc.wait()
+                finally:
+                    if proc.poll() is None:
+                        proc.kill()
+                        proc.wait()
+                    proc.stdout.close()
+
+                if proc.returncode not in (0, 1):
+                    err.seek(0)
+                    stderr = err.read().decode("utf-8", errors="replace")
+                    raise RuntimeError(
+                        f"Exit code {proc.returncode}: {stderr}"
+                    )
+
+    def _stream_strategy(
+        self,
+        strategy: str,
+        pattern: str,
+        include: Optional[str],
+        rejected: Optional[Set[str]],
+        max_per_file: Optional[int] = None,
+    ) -> Iterator[GrepMatch]:
+        """git grep / system grep の出力を読みながら返します"""
+        files = self._strategy_files(strategy, include, rejected)
+        if strategy == "git":
+            cmd = self._build_git_grep_cmd(pattern, include, files)
+        else:
+            cmd = self._build_system_grep_cmd(
+                pattern, include, files, max_per_file
+            )
+        yield from self._stream_grep_command(cmd, files)
+
     def _is_git_repo(self) -> bool:
         return os.path.isdir(os.path.join(self.target_dir, ".git"))
 
@@ -152,90 +1510,154 @@ class GrepTool:
         except subprocess.CalledProcessError:
             return False
 
-    def _parse_grep_output(self, output: str) -> List[GrepMatch]:
+    def _parse_grep_output(self, output: str) -> GrepResults:
         """
         grep形式の出力 (FilePath:LineNum:Content) をパースします。
         例: src/main.py:10:print("hello")
         """
-        results = []
+        results = GrepResults()
         for line in output.splitlines():
-            if not line.strip():
-                continue
+            match = self._parse_grep_line(line)
+            if match is not None:
+                results.append(match)
+        return results
 
-            # 最初の2つのコロンを探す
-            parts = line.split(":", 2)
-            if len(parts) < 3:
-                continue
+    def _parse_count_output(
+        self, outputs: Iterable[str], first_only: bool
+    ) -> Dict[str, int]:
+        """
+        grep -l (FilePath) / grep -c (FilePath:Count) の出力をパースします。
+        grep -c は件数 0 のファイルも出力するので、それは除きます。
+        """
+        counts: Dict[str, int] = {}
+        for output in outputs:
+            for line in output.splitlines():
+                if not line:
+                    continue
+                if first_only:
+                    counts[line] = 1
+                    continue
+                file_path, sep, count_str = line.rpartition(":")
+                if not sep:
+                    continue
+                try:
+                    count = int(count_str)
+                except ValueError:
+                    continue
+                if count > 0:
+                    counts[file_path] = count
+        return counts
 
-            file_path, line_num_str, content = parts
-            try:
-                results.append(
-                    GrepMatch(
-                        file_path=file_path,
-                        line_number=int(line_num_str),
-                        line_content=content,
-                    )
-                )
-            except ValueError:
-                continue
-        return results
+    def _parse_grep_line(self, line: str) -> Optional[GrepMatch]:
+        """grep形式の出力1行をパースします。形式が違う行は None を返します。"""
+        if not line.strip():
+            return None
+
+        # 最初の2つのコロンを探す
+        parts = line.split(":", 2)
+        if len(parts) < 3:
+            return None
+
+        file_path, line_num_str, content = parts
+        try:
+            return GrepMatch(
+                file_path=file_path,
+                line_number=int(line_num_str),
+                line_content=content,
+            )
+        except ValueError:
+            return None
 
     # --- Strategy Implementations ---
 
     def _strategy_git_grep(
-        self, pattern: str, include: Optional[str]
-    ) -> List[GrepMatch]:
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+    ) -> GrepResults:
+        # subprocess で実行
+        return self._run_grep_command(
+            self._build_git_grep_cmd(pattern, include, files), files
+        )
+
+    def _build_git_grep_cmd(
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+        mode: str = "content",
+    ) -> List[str]:
         # git grep コマンドの組み立て
         # --untracked: Git管理下でないファイルも検索対象にする
-        # -n: 行番号を表示
+        # -n: 行番号を表示 (mode に応じて -l: ファイル名のみ, -c: 件数のみ)
         # -E: 拡張正規表現を使用
         # --ignore-case: 大文字小文字を区別しない
         # -I: バイナリファイルを無視 (git grep はデフォルトで無視するが念のため)
+        # core.quotePath=false: ASCII 以外のパスを "\343\201\202" のように
+        # クォートせず、そのまま出力させる
         cmd = [
             "git",
+            "-c",
+            "core.quotePath=false",
             "grep",
             "--untracked",
-            "-n",
+            _MODE_FLAGS[mode],
             "-E",
             "--ignore-case",
             "-I",
             pattern,
         ]
 
-        if include:
+        if files is not None:
+            # 索引で絞り込んだファイルを直接指定する（include は適用済み）
+            # ファイル名の [ や * を glob として解釈させない
+            cmd.insert(1, "--literal-pathspecs")
+            cmd.append("--")
+        elif include:
             # git grep で特定のファイルのみ対象にする場合: -- "*.py" のように指定
             cmd += ["--", include]
 
-        # subprocess で実行
-        result = subprocess.run(
-            cmd,
-            cwd=self.target_dir,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",  # Windowsでは cp932 になることもあるので注意
-            errors="replace",
-        )
-
-        if result.returncode not in (
-            0,
-            1,
-        ):  # 0=見つかった, 1=見つからない, 2+=エラー
-            raise RuntimeError(
-                f"Exit code {result.returncode}: {result.stderr}"
-            )
-
-        return self._parse_grep_output(result.stdout)
+        return cmd
 
     def _strategy_system_grep(
-        self, pattern: str, include: Optional[str]
-    ) -> List[GrepMatch]:
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+    ) -> GrepResults:
+        return self._run_grep_command(
+            self._build_system_grep_cmd(pattern, include, files), files
+        )
+
+    def _build_system_grep_cmd(
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+        max_per_file: Optional[int] = None,
+        mode: str = "content",
+    ) -> List[str]:
         # system grep コマンドの組み立て
         # -r: 再帰的にディレクトリを探索
-        # -n: 行番号を表示
+        # -n: 行番号を表示 (mode に応じて -l: ファイル名のみ, -c: 件数のみ)
         # -H: ファイル名を表示 (ファイルが1つの場合でも強制表示)
         # -E: 拡張正規表現
         # -I: バイナリファイルを無視
-        cmd = ["grep", "-r", "-n", "-H", "-E", "-I"]
+        # -m: 1ファイルあたりのマッチ数の上限
+        limit = [f"-m{max_per_file}"] if max_per_file is not None else []
+        flag = _MODE_FLAGS[mode]
+
+        if files is not None:
+            # 索引で絞り込んだファイルを直接指定する（再帰・除外は不要）
+            # ファイル一覧は実行時に後ろへ付け足す
+            return (
+                ["grep", flag, "-H", "-E", "-I"]
+                + limit
+                + ["-e", pattern, "--"]
+            )
+
+        cmd = ["grep", "-r", flag, "-H", "-E", "-I"] + limit
 
         # 除外ディレクトリの指定 (--exclude-dir)
         cmd += self.exclusions.get_grep_exclude_dir_args()
@@ -246,76 +1668,132 @@ class GrepTool:
 
         cmd += [pattern, "."]  # "." はカレントディレクトリ
 
-        result = subprocess.run(
-            cmd,
-            cwd=self.target_dir,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-        )
+        return cmd
 
-        if result.returncode not in (0, 1):
-            raise RuntimeError(
-                f"Exit code {result.returncode}: {result.stderr}"
-            )
+    def _strategy_python_deadline(
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+        max_per_file: Optional[int] = None,
+    ) -> GrepResults:
+        """
+        Python Fallback を制限時間付きで実行します。
+        ワーカープロセス（workers 個）で検索し、timeout 秒を過ぎたら kill して
+        それまでに届いた結果を timed_out=True で返します。
+        結果は逐次実行と同じ順（走査順 → 行番号）に並べます。
+        """
 
-        return self._parse_grep_output(result.stdout)
+        results = GrepResults()
+        file_paths = list(self._iter_files(include, files))
+        if not file_paths:
+            return results
 
-    def _strategy_python_fallback(
-        self, pattern: str, include: Optional[str]
-    ) -> List[GrepMatch]:
-        results = []
-        regex = re.compile(pattern, re.IGNORECASE)
+        # 時間切れまでに多くのファイルを終えられるよう、各ワーカーは
+        # 小さいファイルから検索する（_balance_by_size は大きい順に並べる）
+        batches = [b[::-1] for b in _balance_by_size(file_paths, self.workers)]
+        out_queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(
+                target=_search_worker,
+                args=(
+                    pattern,
+                    self.target_dir,
+                    b,
+                    self.use_mmap,
+                    out_queue,
+                    max_per_file,
+                ),
+                daemon=True,
+            )
+            for b in batches
+        ]
+        deadline = time.monotonic() + self.timeout
+        for proc in procs:
+            proc.start()
 
-        # os.walk で再帰探索
-        for root, dirs, files in os.walk(self.target_dir):
-            # 1. ディレクトリの除外設定を適用
-            # dirs[:] = ... とすることで、os.walk の探索対象からその場で削除できる
-            dirs[:] = [
-                d for d in dirs if not self.exclusions.should_skip_dir(d)
-            ]
+        try:
+            running = len(procs)
+            while running:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    item = out_queue.get(timeout=remaining)
+                except queue.Empty:
+                    results.timed_out = True
+                    break
+                if item is None:
+                    running -= 1
+                else:
+                    results.extend(item)
+        finally:
+            for proc in procs:
+                if proc.is_alive():
+                    proc.kill()
+                proc.join()
+            out_queue.close()
 
-            for file in files:
-                file_path = os.path.join(root, file)
+        if results.timed_out:
+            print(
+                f"Warning: search timed out after {self.timeout}s, "
+                f"returning {len(results)} partial match(es)"
+            )
+        results.sort(self._file_order(file_paths))
+        return results
 
-                # 2. include パターンがある場合のフィルタ
-                if include and not fnmatch.fnmatch(file, include):
-                    continue
+    def _strategy_python_parallel(
+        self,
+        pattern: str,
+        include: Optional[str],
+        files: Optional[List[str]] = None,
+        max_per_file: Optional[int] = None,
+    ) -> GrepResults:
+        """
+        Python Fallback の並列版です。
+        ファイル一覧をサイズで均等に分け、プロセスプールで検索した後、
+        逐次実行と同じ順（走査順 → 行番号）に並べて返します。
+        """
+        file_paths = list(self._iter_files(include, files))
+        if not file_paths:
+            return GrepResults()
 
-                # 3. ファイル除外設定（バイナリ等）の適用
-                if self.exclusions.is_ignored(file_path, self.target_dir):
-                    continue
+        # ワーカー数より多めに分割して、処理時間のばらつきを吸収する
+        batches = _balance_by_size(file_paths, self.workers * 4)
 
-                # 4. ファイルを開いて検索
-                try:
-                    with open(
-                        file_path, "r", encoding="utf-8", errors="ignore"
-                    ) as f:
-                        for i, line in enumerate(f):
-                            if regex.search(line):
-                                # 相対パスに変換して格納
-                                rel_path = os.path.relpath(
-                                    file_path, self.target_dir
-                                )
-                                results.append(
-                                    GrepMatch(
-                                        file_path=rel_path,
-                                        line_number=i + 1,
-                                        line_content=line.strip(),
-                                    )
-                                )
-                except Exception:
-                    # 読み込みエラーは無視
-                    continue
+        results = GrepResults()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(
+                    _search_file_batch,
+                    pattern,
+                    self.target_dir,
+                    batch,
+                    self.use_mmap,
+                    max_per_file,
+                )
+                for batch in batches
+            ]
+            for future in futures:
+                results.extend(future.result())
 
+        results.sort(self._file_order(file_paths))
         return results
 
+    def _file_order(self, file_paths: List[str]) -> Dict[str, int]:
+        """結果のパス -> 走査順の対応です（並列検索の結果を並べ直すのに使う）"""
+        return {
+            os.path.relpath(file_path, self.target_dir): i
+            for i, file_path in enumerate(file_paths)
+        }
+
 
 # --- 動作確認用 ---
 if __name__ == "__main__":
     # カレントディレクトリで検索テスト
     tool = GrepTool(os.getcwd())
+    # 索引を使う場合:
+    # tool = GrepTool(os.getcwd(), index_path=".grep_index")
 
     # 検索したいパターン (正規表現)
     search_pattern = "class .*Tool"  # "class" で始まって "Tool" で終わる文字列
@@ -326,3 +1804,18 @@ if __name__ == "__main__":
     print(f"\nFound {len(matches)} matches:")
     for m in matches:
         print(f"{m.file_path}:{m.line_number}: {m.line_content}")
+
+    # ストリーミングで最初の5件だけ取得
+    print("\nFirst 5 matches (streaming):")
+    for m in tool.execute_stream(search_pattern, max_results=5):
+        print(f"{m.file_path}:{m.line_number}: {m.line_content}")
+
+    # マッチしたファイルと件数だけを取得
+    print("\nMatch counts per file:")
+    for path, n in tool.execute_count(search_pattern, "*.py").items():
+        print(f"{path}: {n}")
+
+    # 複数パターンを1回の走査で検索
+    print("\nMultiple patterns:")
+    for m in tool.execute_many(["def execute", "class .*Tool"], "*.py"):
+        print(f"[{m.pattern}] {m.file_path}:{m.line_number}: {m.line_content}")
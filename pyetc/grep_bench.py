@@ -0,0 +1,476 @@
+"""GrepTool のベンチマーク。
+
+合成したディレクトリツリーに対して GrepTool の各戦略を実行し、性能を測ります。
+
+parallel: Python Fallback をワーカー数ごとに実行し、
+          所要時間とスピードアップ（スケーリング曲線）を表示します。
+
+    python grep_bench.py parallel --files 2000 --workers 1 2 4 8
+
+suite:    git grep / system grep / Python Fallback を、コールドキャッシュと
+          ウォームキャッシュの両方で実行し、MB/s・p50/p95 レイテンシ・
+          ピーク RSS を JSON で出力します。戦略の選択や性能劣化の検出に使います。
+
+    python grep_bench.py suite --files 1000 10000 --binary-ratio 0.1 \\
+        --output bench.json
+
+--non-ascii-ratio で ASCII 以外の文字を含むファイルを混ぜると、mmap 検索が
+str の行単位検索に切り替わる場合（"x.y" や "\\w" のようなパターン）の
+コストも測れます。
+
+    python grep_bench.py suite --non-ascii-ratio 0.5 --pattern "Bench\\d+Tool" \\
+        --strategies python python-mmap
+"""
+
+import argparse
+import bisect
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from grep import GrepTool
+
+_WORDS = [
+    "alpha",
+    "beta",
+    "gamma",
+    "delta",
+    "import",
+    "return",
+    "class",
+    "def",
+    "value",
+    "result",
+]
+
+# suite で測る戦略と、GrepTool のどのメソッドを呼ぶか
+STRATEGIES = {
+    "git": "_strategy_git_grep",
+    "grep": "_strategy_system_grep",
+    "python": "_python_fallback",
+    "python-mmap": "_python_fallback",
+    "python-parallel": "_python_fallback",
+}
+
+# ASCII 以外の文字を含むファイルの末尾に足す行
+_NON_ASCII_LINE = "# 日本語のコメント\n"
+
+# 合成ファイルの元になるテキストのサイズ（これより大きいファイルは作らない）
+_CORPUS_SIZE = 4 * 1024 * 1024
+
+
+def _make_corpus(rng: random.Random) -> str:
+    """ファイルの中身を切り出すための、大きなテキストを作ります"""
+    lines = []
+    size = 0
+    j = 0
+    while size < _CORPUS_SIZE:
+        words = rng.choices(_WORDS, k=8)
+        if rng.random() < 0.01:
+            words.append(f"class Bench{j}Tool")
+        line = " ".join(words) + "\n"
+        lines.append(line)
+        size += len(line)
+        j += 1
+    return "".join(lines)
+
+
+def _file_size(rng: random.Random, size_dist: str, mean_size: int) -> int:
+    if size_dist == "fixed":
+        size = mean_size
+    elif size_dist == "uniform":
+        size = rng.randint(1, 2 * mean_size)
+    else:
+        # 対数正規分布 (sigma=1.2) で平均が mean_size になるようにする
+        mu = max(0.0, math.log(mean_size) - 0.72)
+        size = int(rng.lognormvariate(mu, 1.2))
+    return max(1, min(size, _CORPUS_SIZE))
+
+
+def make_tree(
+    root: str,
+    nfiles: int,
+    seed: int = 0,
+    size_dist: str = "lognormal",
+    mean_size: int = 4096,
+    binary_ratio: float = 0.0,
+    non_ascii_ratio: float = 0.0,
+) -> Dict[str, int]:
+    """
+    root 以下に nfiles 個のファイルを作ります。
+    size_dist は "lognormal" / "uniform" / "fixed"。
+    binary_ratio の割合で、拡張子なしのバイナリファイル（NUL を含む）を混ぜます。
+    テキストファイルのうち non_ascii_ratio の割合は、末尾に ASCII 以外の
+    文字を含む行を足します（mmap 検索で最後まで読んでから読み直す最悪の場合）。
+    作成したファイル数と総バイト数を返します。
+    """
+    rng = random.Random(seed)
+    corpus = _make_corpus(rng)
+    # 行の先頭位置（ファイルは行の途中から始まらないようにする）
+    line_starts = [0] + [i + 1 for i, c in enumerate(corpus) if c == "\n"][:-1]
+
+    stats = {
+        "files": 0,
+        "text_files": 0,
+        "binary_files": 0,
+        "non_ascii_files": 0,
+        "bytes": 0,
+    }
+    for i in range(nfiles):
+        # 1ディレクトリあたり 100 ファイル程度になるように散らす
+        d = os.path.join(
+            root, f"d{i // 10000:03d}", f"s{(i // 100) % 100:02d}"
+        )
+        os.makedirs(d, exist_ok=True)
+        size = _file_size(rng, size_dist, mean_size)
+
+        if rng.random() < binary_ratio:
+            data = bytearray(rng.randbytes(size))
+            data[rng.randrange(size)] = 0  # 少なくとも1つは NUL を含める
+            path = os.path.join(d, f"blob{i}")
+            with open(path, "wb") as f:
+                f.write(data)
+            stats["binary_files"] += 1
+        else:
+            start = line_starts[
+                bisect.bisect_right(line_starts, rng.randrange(len(corpus)))
+                - 1
+            ]
+            end = corpus.find("\n", start + size)
+            text = corpus[start : end + 1 if end >= 0 else len(corpus)]
+            if rng.random() < non_ascii_ratio:
+                text += _NON_ASCII_LINE
+                stats["non_ascii_files"] += 1
+            path = os.path.join(d, f"f{i}.py")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            size = len(text.encode("utf-8"))
+            stats["text_files"] += 1
+
+        stats["files"] += 1
+        stats["bytes"] += size
+    return stats
+
+
+def evict_cache(root: str) -> bool:
+    """
+    root 以下のファイルをページキャッシュから追い出します（コールド計測用）。
+    posix_fadvise が使えない環境では何もせず False を返します。
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            try:
+                fd = os.open(os.path.join(dirpath, name), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+    return True
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    ordered = sorted(values)
+    # 順位は切り上げる（round は偶数への丸めなので、5件の p50 が2番目になる）
+    k = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[min(k, len(ordered) - 1)]
+
+
+def _peak_rss_kb() -> Optional[int]:
+    """
+    自プロセスと子プロセスのピーク RSS (KB)。取得できなければ None。
+    Linux では自プロセス分を /proc の VmHWM から取ります（getrusage の値は
+    exec 前の親プロセスの分を引き継いでしまうため）。
+    子プロセス分 (git / grep / ワーカー) は getrusage しかないので上限値です。
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+
+    scale = 1024 if sys.platform == "darwin" else 1  # macOS はバイト単位
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    own = int(line.split()[1])
+                    break
+    except OSError:
+        pass
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return max(own, children)
+
+
+def run_one(root: str, strategy: str, pattern: str) -> Dict:
+    """1つの戦略を1回だけ実行します（RSS を測るため別プロセスで呼ばれます）"""
+    tool = GrepTool(
+        root,
+        workers=0 if strategy == "python-parallel" else 1,
+        use_mmap=strategy == "python-mmap",
+    )
+    method = getattr(tool, STRATEGIES[strategy])
+    start = time.perf_counter()
+    matches = method(pattern, None)
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed": elapsed,
+        "matches": len(matches),
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _run_in_subprocess(root: str, strategy: str, pattern: str) -> Dict:
+    cmd = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "_run",
+        "--root",
+        root,
+        "--strategy",
+        strategy,
+        "--pattern",
+        pattern,
+    ]
+    result = subprocess.run(
+        cmd,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _strategy_available(strategy: str) -> bool:
+    if strategy in ("git", "grep"):
+        return shutil.which(strategy) is not None
+    return True
+
+
+def bench_suite(
+    root: str,
+    tree: Dict[str, int],
+    pattern: str,
+    strategies: List[str],
+    repeat: int,
+) -> List[Dict]:
+    """各戦略をコールド/ウォームキャッシュで repeat 回ずつ実行して集計します"""
+    results = []
+    for strategy in strategies:
+        if not _strategy_available(strategy):
+            results.append({"strategy": strategy, "skipped": True})
+            continue
+
+        for cache in ("cold", "warm"):
+            if cache == "warm":
+                # 1回空打ちしてキャッシュを温める
+                _run_in_subprocess(root, strategy, pattern)
+
+            latencies = []
+            peak_rss = None
+            matches = 0
+            evicted = True
+            for _ in range(repeat):
+                if cache == "cold":
+                    evicted = evict_cache(root)
+                run = _run_in_subprocess(root, strategy, pattern)
+                latencies.append(run["elapsed"])
+                matches = run["matches"]
+                if run["peak_rss_kb"] is not None:
+                    peak_rss = max(peak_rss or 0, run["peak_rss_kb"])
+
+            p50 = percentile(latencies, 50)
+            results.append(
+                {
+                    "strategy": strategy,
+                    "cache": cache,
+                    # コールドにできなかった場合は明示しておく
+                    "cache_evicted": evicted if cache == "cold" else None,
+                    "runs": repeat,
+                    "matches": matches,
+                    "p50_s": p50,
+                    "p95_s": percentile(latencies, 95),
+                    "mb_per_s": tree["bytes"] / 1e6 / p50 if p50 else None,
+                    "peak_rss_kb": peak_rss,
+                }
+            )
+            print(
+                f"{tree['files']:>8} {strategy:>16} {cache:>5} "
+                f"p50={p50:.3f}s",
+                file=sys.stderr,
+            )
+    return results
+
+
+def bench_parallel(
+    root: str,
+    pattern: str,
+    workers_list: List[int],
+    repeat: int,
+    use_mmap: bool = False,
+) -> None:
+    """ワーカー数ごとに Python Fallback の所要時間を測ります。"""
+    baseline = None
+    print(f"{'workers':>8} {'best[s]':>10} {'speedup':>8} {'matches':>8}")
+    for workers in workers_list:
+        tool = GrepTool(root, workers=workers, use_mmap=use_mmap)
+        best = float("inf")
+        nmatches = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            # workers が 2 以上なら並列版が使われる
+            matches = tool._python_fallback(pattern, None)
+            best = min(best, time.perf_counter() - start)
+            nmatches = len(matches)
+        if baseline is None:
+            baseline = best
+        print(
+            f"{workers:>8} {best:>10.3f} {baseline / best:>8.2f} "
+            f"{nmatches:>8}"
+        )
+
+
+def _init_git(root: str) -> None:
+    """git grep を測れるよう、ツリーを Git リポジトリにしてインデックスに載せる"""
+    if shutil.which("git") is None:
+        return
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_par = sub.add_parser("parallel", help="ワーカー数ごとのスケーリング")
+    p_par.add_argument("--files", type=int, default=2000)
+    p_par.add_argument("--pattern", default="class .*Tool")
+    p_par.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p_par.add_argument("--repeat", type=int, default=3)
+    p_par.add_argument(
+        "--mmap", action="store_true", help="mmap + bytes regex で検索する"
+    )
+
+    p_suite = sub.add_parser("suite", help="戦略ごとの比較 (JSON 出力)")
+    p_suite.add_argument(
+        "--files",
+        type=int,
+        nargs="+",
+        default=[1000],
+        help="ツリーのファイル数（複数指定可。例: 1000 10000 500000）",
+    )
+    p_suite.add_argument(
+        "--size-dist",
+        choices=["lognormal", "uniform", "fixed"],
+        default="lognormal",
+    )
+    p_suite.add_argument("--mean-size", type=int, default=4096)
+    p_suite.add_argument("--binary-ratio", type=float, default=0.0)
+    p_suite.add_argument(
+        "--non-ascii-ratio",
+        type=float,
+        default=0.0,
+        help="ASCII 以外の文字を含むテキストファイルの割合",
+    )
+    p_suite.add_argument("--pattern", default="class .*Tool")
+    p_suite.add_argument(
+        "--strategies",
+        nargs="+",
+        choices=list(STRATEGIES),
+        default=list(STRATEGIES),
+    )
+    p_suite.add_argument("--repeat", type=int, default=5)
+    p_suite.add_argument("--seed", type=int, default=0)
+    p_suite.add_argument("--output", help="JSON の出力先（省略時は標準出力）")
+
+    # suite から内部的に呼ばれる、1回分の計測
+    p_run = sub.add_parser("_run")
+    p_run.add_argument("--root", required=True)
+    p_run.add_argument("--strategy", choices=list(STRATEGIES), required=True)
+    p_run.add_argument("--pattern", required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "_run":
+        print(json.dumps(run_one(args.root, args.strategy, args.pattern)))
+        return
+
+    if args.command == "parallel":
+        root = tempfile.mkdtemp(prefix="grep_bench_")
+        try:
+            tree = make_tree(root, args.files)
+            print(
+                f"Tree: {tree['files']} files, {tree['bytes'] / 1e6:.1f} MB "
+                f"in {root}"
+            )
+            bench_parallel(
+                root, args.pattern, args.workers, args.repeat, args.mmap
+            )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        return
+
+    report = {
+        "config": {
+            "pattern": args.pattern,
+            "size_dist": args.size_dist,
+            "mean_size": args.mean_size,
+            "binary_ratio": args.binary_ratio,
+            "non_ascii_ratio": args.non_ascii_ratio,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "platform": sys.platform,
+            "python": sys.version.split()[0],
+        },
+        "trees": [],
+    }
+    for nfiles in args.files:
+        root = tempfile.mkdtemp(prefix="grep_bench_")
+        try:
+            tree = make_tree(
+                root,
+                nfiles,
+                seed=args.seed,
+                size_dist=args.size_dist,
+                mean_size=args.mean_size,
+                binary_ratio=args.binary_ratio,
+                non_ascii_ratio=args.non_ascii_ratio,
+            )
+            if "git" in args.strategies:
+                _init_git(root)
+            report["trees"].append(
+                {
+                    "tree": tree,
+                    "results": bench_suite(
+                        root, tree, args.pattern, args.strategies, args.repeat
+                    ),
+                }
+            )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""索引の永続化。
+
+TrigramIndex と SymbolIndex は、どちらも「ファイルごとの (mtime, size, 中身)」
+の辞書を、フォーマットのバージョンと対象ディレクトリと一緒に pickle で
+保存します。その読み書きをここにまとめます。
+"""
+
+import logging
+import os
+import pickle
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def load_index(index_path: str, version: int, root_dir: str) -> Optional[dict]:
+    """
+    index_path から索引の files を読みます。
+    ファイルが無い・壊れている・version や root_dir が違う場合は None です。
+    """
+    if not os.path.isfile(index_path):
+        return None
+    try:
+        with open(index_path, "rb") as f:
+            data = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load index {index_path}: {e}")
+        return None
+
+    if (
+        not isinstance(data, dict)
+        or data.get("version") != version
+        or data.get("root_dir") != root_dir
+    ):
+        logger.info(f"Index {index_path} is stale, rebuilding.")
+        return None
+    return data["files"]
+
+
+def save_index(
+    index_path: str, version: int, root_dir: str, files: dict
+) -> None:
+    """files を version・root_dir と一緒に index_path へ保存します。"""
+    data = {"version": version, "root_dir": root_dir, "files": files}
+    # 書き込み途中で壊れないよう、一時ファイル経由で置き換える
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, index_path)
@@ -0,0 +1,415 @@
+"""ReadFileTool 用の行オフセット索引。
+
+ファイルを一度だけ走査して「何行目がファイルの何バイト目から始まるか」を
+一定間隔（チェックポイント）で記録しておき、offset 行目からの読み込みでは
+直前のチェックポイントへ seek して、そこから数行読み飛ばすだけで済ませます。
+行数の合計も索引に持つので、ページごとにファイル全体を読み直しません。
+
+索引はファイルの (mtime, size) と一緒に LRU キャッシュに置き、必要なら
+ファイルの隣にサイドカーファイル (<file>.lineidx) として保存します。
+ログのように末尾へ追記されただけのファイルは、追記された部分だけを
+走査して索引を伸ばします。
+
+末尾からの読み込み (tail) や、バイト位置からの追記分の読み込み (follow)
+に使う、バイト列のままの行の切り出しもここにまとめています。
+"""
+
+import io
+import logging
+import os
+import pickle
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import BinaryIO, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 索引フォーマットのバージョン（構造を変えたら上げる）
+INDEX_VERSION = 3
+
+# チェックポイントの間隔（バイト）。1ページの読み込みで読み飛ばす量の上限になる
+CHECKPOINT_INTERVAL = 64 * 1024
+
+# 索引を作るときの読み込み単位
+READ_CHUNK_SIZE = 1024 * 1024
+
+# 末尾から読むとき・追記分を読むときの読み込み単位
+TAIL_BLOCK_SIZE = 64 * 1024
+
+# 追記されただけかを確かめるために覚えておく、末尾のバイト数
+TAIL_SAMPLE_SIZE = 64
+
+# サイドカーファイルの拡張子
+SIDECAR_SUFFIX = ".lineidx"
+
+# テキストモードで行の区切りになるバイト列
+_LINE_BREAK = re.compile(rb"\r\n|\r|\n")
+
+
+def count_line_breaks(buf, start: int, end: int, has_cr: bool) -> int:
+    """buf[start:end] に含まれる改行 (\\n, \\r\\n, 単独の \\r) の数"""
+    count = buf.count(b"\n", start, end)
+    if has_cr:
+        count += buf.count(b"\r", start, end)
+        count -= buf.count(b"\r\n", start, end)
+    return count
+
+
+class LineIndex:
+    """
+    1つのファイルの行オフセット索引です。
+    offsets[k] から始まる行が lines[k] 行目 (0-based) であることを表します。
+    行の区切りはテキストモード (universal newlines) と同じく
+    \\n, \\r\\n, 単独の \\r です。
+    """
+
+    def __init__(
+        self,
+        size: int,
+        mtime_ns: int,
+        ino: int,
+        line_count: int,
+        offsets: array,
+        lines: array,
+        tail_sample: bytes = b"",
+    ):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.ino = ino
+        self.line_count = line_count
+        self.offsets = offsets
+        self.lines = lines
+        # ファイル末尾 (size の直前) の数バイト。追記の判定に使う
+        self.tail_sample = tail_sample
+
+    @classmethod
+    def build(cls, file_path: str, st: os.stat_result) -> "LineIndex":
+        """
+        ファイルを1回走査して索引を作ります。
+        改行は生のバイト列のまま bytes.count で数え、デコードはしません。
+        読み込みバッファは使い回すので、速度はほぼディスクの読み込みで
+        決まります。
+        """
+        return cls._scan(file_path, st, array("Q", [0]), array("Q", [0]))
+
+    def extend(
+        self, file_path: str, st: os.stat_result
+    ) -> Optional["LineIndex"]:
+        """
+        ファイルが末尾に追記されただけなら、最後のチェックポイントから先だけを
+        走査した新しい索引を返します。そうでなければ None を返します。
+        （同じ inode で、大きくなっていて、元の末尾のバイト列が変わっていない
+        ことで判定します）
+        """
+        if st.st_ino != self.ino or st.st_size <= self.size:
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                f.seek(self.size - len(self.tail_sample))
+                if f.read(len(self.tail_sample)) != self.tail_sample:
+                    return None
+        except OSError:
+            return None
+        return self._scan(
+            file_path, st, array("Q", self.offsets), array("Q", self.lines)
+        )
+
+    @classmethod
+    def _scan(
+        cls,
+        file_path: str,
+        st: os.stat_result,
+        offsets: array,
+        lines: array,
+    ) -> "LineIndex":
+        """最後のチェックポイントからファイル末尾までを走査します"""
+        pos = scan_start = offsets[-1]
+        breaks = lines[-1]  # pos までの改行の数
+        next_checkpoint = pos + CHECKPOINT_INTERVAL
+        prev_cr = False  # 直前のチャンクが \r で終わっていたか
+        last = 0
+        tail_sample = b""
+
+        buf = bytearray(min(READ_CHUNK_SIZE, max(st.st_size - pos, 1)))
+        with open(file_path, "rb") as f:
+            f.seek(pos)
+            remaining = st.st_size - pos
+            while remaining > 0:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                n = min(n, remaining)
+                remaining -= n
+                has_cr = buf.find(b"\r", 0, n) >= 0
+
+                # チャンク境界で分かれた \r\n を2回数えないようにする
+                if prev_cr and buf[0] == 0x0A:
+                    breaks -= 1
+
+                # チェックポイントは間隔ごとの位置の直後にある行頭に置く
+                end = pos + n
+                counted_to = 0
+                while next_checkpoint < end:
+                    m = _LINE_BREAK.search(
+                        buf, max(next_checkpoint - pos, 0), n
+                    )
+                    # チャンク末尾の \r は次が \n かどうか分からないので見送る
+                    if m is None or (m.end() == n and buf[n - 1] == 0x0D):
+                        break
+                    breaks += count_line_breaks(
+                        buf, counted_to, m.end(), has_cr
+                    )
+                    counted_to = m.end()
+                    offsets.append(pos + counted_to)
+                    lines.append(breaks)
+                    next_checkpoint = pos + counted_to + CHECKPOINT_INTERVAL
+
+                breaks += count_line_breaks(buf, counted_to, n, has_cr)
+                pos = end
+                last = buf[n - 1]
+                prev_cr = last == 0x0D
+                tail_sample = bytes(buf[max(n - TAIL_SAMPLE_SIZE, 0) : n])
+
+        # 最後の行が改行で終わっていなくても1行として数える
+        if pos > scan_start and last not in (0x0A, 0x0D):
+            breaks += 1
+        return cls(
+            st.st_size,
+            st.st_mtime_ns,
+            st.st_ino,
+            breaks,
+            offsets,
+            lines,
+            tail_sample,
+        )
+
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.mtime_ns, self.size) == (st.st_mtime_ns, st.st_size)
+
+    def read_lines(self, file_path: str, start: int, count: int) -> List[str]:
+        """
+        start 行目 (0-based) から最大 count 行を、テキストモードで読んだときと
+        同じ文字列 (UTF-8、不正なバイトは置換、改行は \\n) で返します。
+        """
+        if start >= self.line_count or count <= 0:
+            return []
+
+        k = bisect_right(self.lines, start) - 1
+        result = []
+        with open(file_path, "rb") as raw:
+            raw.seek(self.offsets[k])
+            # チェックポイントは行頭なので、そこからテキストとして読めば
+            # 改行の扱いも含めて先頭から読んだときと同じになる
+            # （デコードするのは読み飛ばす数行と、返す範囲だけ）
+            with io.TextIOWrapper(
+                raw, encoding="utf-8", errors="replace"
+            ) as f:
+                for _ in range(start - self.lines[k]):
+                    if not f.readline():
+                        return []
+                for _ in range(count):
+                    line = f.readline()
+                    if not line:
+                        break
+                    result.append(line)
+        return result
+
+    def line_at(self, file_path: str, byte_offset: int) -> int:
+        """byte_offset から始まる行が何行目 (0-based) かを返します"""
+        k = bisect_right(self.offsets, byte_offset) - 1
+        with open(file_path, "rb") as f:
+            f.seek(self.offsets[k])
+            data = f.read(byte_offset - self.offsets[k])
+        return self.lines[k] + count_line_breaks(
+            data, 0, len(data), b"\r" in data
+        )
+
+    # --- サイドカー ---
+    def save(self, sidecar_path: str) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "interval": CHECKPOINT_INTERVAL,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "ino": self.ino,
+            "line_count": self.line_count,
+            "offsets": self.offsets.tobytes(),
+            "lines": self.lines.tobytes(),
+            "tail_sample": self.tail_sample,
+        }
+        # 書き込み途中で壊れないよう、一時ファイル経由で置き換える
+        # （同じファイルを別スレッドが同時に保存しても衝突しない名前にする）
+        tmp_path = f"{sidecar_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, sidecar_path)
+
+    @classmethod
+    def load(cls, sidecar_path: str) -> Optional["LineIndex"]:
+        """
+        サイドカーを読みます。無い・形式が古い・壊れている場合は None です。
+        ファイルと一致するか（または伸ばせるか）は呼び出し側で確かめます。
+        """
+        try:
+            with open(sidecar_path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to load line index {sidecar_path}: {e}")
+            return None
+
+        if (
+            data.get("version") != INDEX_VERSION
+            or data.get("interval") != CHECKPOINT_INTERVAL
+        ):
+            return None
+
+        offsets = array("Q")
+        offsets.frombytes(data["offsets"])
+        lines = array("Q")
+        lines.frombytes(data["lines"])
+        return cls(
+            data["size"],
+            data["mtime_ns"],
+            data["ino"],
+            data["line_count"],
+            offsets,
+            lines,
+            data["tail_sample"],
+        )
+
+
+class LineIndexCache:
+    """
+    ファイルパスごとの LineIndex の LRU キャッシュです。
+    (mtime, size) が変わったファイルの索引は、追記されただけなら伸ばし、
+    そうでなければ作り直します。
+    persist を True にすると、索引をサイドカーファイルにも保存し、
+    プロセスをまたいで再利用します。
+    """
+
+    def __init__(
+        self, max_entries: int = 64, persist: bool = False, index_class=None
+    ):
+        self.max_entries = max_entries
+        self.persist = persist
+        # build / extend / load を持つ索引のクラス（圧縮ファイル用の索引も
+        # 同じキャッシュで扱えるようにする）
+        self.index_class = index_class or LineIndex
+        self._entries: "OrderedDict[str, LineIndex]" = OrderedDict()
+        # 複数スレッドから読まれる (ReadFileTool.read_many) ので、
+        # キャッシュの出し入れだけロックする（索引の作成はロックの外）
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.extended = 0
+
+    def get(self, file_path: str, st: os.stat_result):
+        with self._lock:
+            index = self._entries.get(file_path)
+            if index is not None and index.matches(st):
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                return index
+            self.misses += 1
+
+        sidecar_path = file_path + SIDECAR_SUFFIX
+        if index is None and self.persist:
+            index = self.index_class.load(sidecar_path)
+
+        if index is None or not index.matches(st):
+            extended = index.extend(file_path, st) if index else None
+            if extended is not None:
+                self.extended += 1
+                index = extended
+            else:
+                index = self.index_class.build(file_path, st)
+            if self.persist:
+                try:
+                    index.save(sidecar_path)
+                except OSError as e:
+                    logger.warning(
+                        f"Failed to save line index {sidecar_path}: {e}"
+                    )
+
+        with self._lock:
+            self._entries[file_path] = index
+            self._entries.move_to_end(file_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+# --- 末尾・追記分の読み込み ---
+def find_tail_start(f: BinaryIO, end: int, count: int) -> int:
+    """
+    ファイルの end バイト目までのうち、最後の count 行が始まるバイト位置を
+    返します。末尾からブロック単位で（倍々に広げながら）読み戻ります。
+    """
+    if count <= 0 or end <= 0:
+        return end
+
+    data = b""
+    pos = end
+    block = TAIL_BLOCK_SIZE
+    while True:
+        start = max(pos - block, 0)
+        f.seek(start)
+        data = f.read(pos - start) + data
+        pos = start
+
+        # 改行の直後が行頭（ただし end にある最後の改行の直後は除く）
+        starts = [
+            m.end() for m in _LINE_BREAK.finditer(data) if m.end() < len(data)
+        ]
+        if len(starts) >= count:
+            return pos + starts[-count]
+        if pos == 0:
+            return 0
+        block *= 2
+
+
+def find_lines_end(
+    f: BinaryIO, start: int, end: int, count: int
+) -> Tuple[int, int]:
+    """
+    start から end までにある、改行で終わっている行を最大 count 行数えて、
+    (最後の行の終わりのバイト位置, 行数) を返します。
+    end にある書きかけの行（改行がまだ無い行）は含めません。
+    """
+    pos = start
+    line_end = start
+    found = 0
+    while found < count and pos < end:
+        f.seek(pos)
+        data = f.read(min(TAIL_BLOCK_SIZE, end - pos))
+        if not data:
+            break
+        next_pos = pos + len(data)
+        for m in _LINE_BREAK.finditer(data):
+            if m.end() == len(data) and data[-1:] == b"\r":
+                # 次が \n かもしれない \r は、続きを読んでから判断する
+                next_pos = pos + m.start()
+                break
+            found += 1
+            line_end = pos + m.end()
+            if found == count:
+                break
+        if next_pos == pos:
+            # end の直前が \r だけ: まだ行が終わったとは言えない
+            break
+        pos = next_pos
+    return line_end, found
+
+
+def decode_lines(f: BinaryIO, start: int, end: int) -> List[str]:
+    """start から end までのバイト列を、テキストモードと同じ規則で行に分けます"""
+    f.seek(start)
+    data = f.read(end - start)
+    return io.TextIOWrapper(
+        io.BytesIO(data), encoding="utf-8", errors="replace"
+    ).readlines()
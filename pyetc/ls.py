@@ -1,66 +1,63 @@
+import contextlib
 import fnmatch
+import heapq
 import os
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+from get_gitignore import GitIgnoreTree
 
-# --- 簡易的な .gitignore パーサー ---
-class GitIgnoreMatcher:
-    def __init__(self, root_dir: str):
-        self.root_dir = os.path.abspath(root_dir)
-        self.patterns = []
-        self._load_gitignore()
+# 集計サイズ (aggregate_sizes) を求めるときのスレッド数
+# （ディレクトリの読み込みは I/O 待ちが主なので CPU 数より多めにする）
+SIZE_SCAN_WORKERS = 16
 
-    def _load_gitignore(self):
-        gitignore_path = os.path.join(self.root_dir, ".gitignore")
-        if not os.path.exists(gitignore_path):
-            return
+# 集計サイズのキャッシュに保持するディレクトリの最大件数
+# (1件あたり数百バイト程度。超えたら使われていないものから捨てる)
+SIZE_CACHE_SIZE = 100000
 
-        try:
-            with open(gitignore_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-                    self.patterns.append(line)
-        except Exception:
-            pass
 
-    def should_ignore(self, file_path: str) -> bool:
+# --- .gitignore の判定 ---
+
+
+class GitIgnoreMatcher:
+    """
+    root_dir 以下のパスが .gitignore で除外されるかを判定します。
+    root_dir が Git リポジトリの中にある場合は、リポジトリのトップまでの
+    親ディレクトリの .gitignore も読みます。サブディレクトリの .gitignore は
+    そのディレクトリ以下にだけ効きます。
+    判定は get_gitignore.GitIgnoreTree に任せるので、否定 (!) を含めて
+    grep の Python Fallback と同じ規則で除外します。.gitignore の読み込みと
+    パターンのコンパイルはディレクトリごとに1回だけ行い、結果を覚えておきます。
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+        self.top_dir = self._find_top_dir(self.root_dir)
+        self._tree = GitIgnoreTree(self.root_dir, top_dir=self.top_dir)
+
+    @staticmethod
+    def _find_top_dir(root_dir: str) -> str:
+        """Git リポジトリのトップを探します（見つからなければ root_dir）"""
+        d = root_dir
+        while True:
+            if os.path.exists(os.path.join(d, ".git")):
+                return d
+            parent = os.path.dirname(d)
+            if parent == d:
+                return root_dir
+            d = parent
+
+    def should_ignore(self, file_path: str, is_dir: bool = False) -> bool:
         """
-        パスが .gitignore のパターンにマッチするか判定する簡易実装。
-        完全な gitignore 仕様（!での否定など）は複雑なので、
-        ここでは一般的な glob パターンのみをサポートします。
+        パスが .gitignore で除外されるかを判定します。
+        is_dir はディレクトリにだけ効くパターン ("build/") の判定に使います。
         """
-        # 相対パスを取得
-        try:
-            rel_path = os.path.relpath(file_path, self.root_dir)
-        except ValueError:
-            return False  # パスが異なるドライブにある場合などは無視しない
-
-        path_parts = rel_path.split(os.sep)
-        name = os.path.basename(file_path)
-
-        for pattern in self.patterns:
-            # ディレクトリ指定の場合（末尾が /）
-            if pattern.endswith("/"):
-                dir_pattern = pattern.rstrip("/")
-                if dir_pattern in path_parts:
-                    return True
-
-            # 一般的な glob マッチ
-            # パターンに / が含まれる場合はパス全体でマッチ、そうでなければファイル名でマッチ
-            if "/" in pattern:
-                if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(
-                    rel_path, pattern.lstrip("/")
-                ):
-                    return True
-            else:
-                if fnmatch.fnmatch(name, pattern):
-                    return True
-        return False
+        return self._tree.is_ignored(file_path, is_dir)
 
 
 # --- LS ツール本体 ---
@@ -72,14 +69,60 @@ class FileEntry:
     is_directory: bool
     size: int
     modified_time: datetime
+    # 集計サイズのモードで、ディレクトリ以下のファイル数（それ以外は None）
+    file_count: Optional[int] = None
+
+
+# ソートキー (name はディレクトリ優先の名前順、size / mtime は大きい・新しい順)
+SORT_KEYS = ("name", "size", "mtime")
+
+
+def _tree_order(entry: FileEntry) -> Tuple[Tuple[int, str], ...]:
+    """
+    名前順のキーです。パスの各階層を (ディレクトリなら 0, 名前) で比べるので、
+    再帰表示でも各ディレクトリの直後にその中身が（ディレクトリ優先で）並びます。
+    """
+    parts = entry.name.split("/")
+    key = tuple((0, p.lower()) for p in parts[:-1])
+    return key + ((0 if entry.is_directory else 1, parts[-1].lower()),)
+
+
+def _sort_key(sort_by: str) -> Callable[[FileEntry], tuple]:
+    if sort_by == "size":
+        return lambda e: (-e.size, e.name.lower())
+    if sort_by == "mtime":
+        return lambda e: (-e.modified_time.timestamp(), e.name.lower())
+    return _tree_order
+
+
+def _format_size(size: int) -> str:
+    """バイト数を 1.2 MB のような読みやすい形にします"""
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if value < 1024 or unit == "TB":
+            break
+        value /= 1024
+    return f"{size} B" if unit == "B" else f"{value:.1f} {unit}"
 
 
 class LsTool:
-    def __init__(self, target_dir: str):
+    def __init__(self, target_dir: str, dir_cache=None):
+        """
+        dir_cache に dir_cache.DirCache を渡すと、ディレクトリの読み込みに
+        そのキャッシュを使います（他のツールと共有できます）。
+        集計サイズ (aggregate_sizes) のためにディレクトリごとの集計を
+        覚えておきますが、その件数は SIZE_CACHE_SIZE までです。
+        """
         self.target_dir = os.path.abspath(target_dir)
-        # 簡易的な gitignore マッチャーを初期化
-        # 本来はカレントディレクトリだけでなく、親ディレクトリの .gitignore も探すべきですが、
-        # ここでは target_dir 直下の .gitignore のみを対象とします。
+        self.dir_cache = dir_cache
+        # 集計サイズ用: ディレクトリ -> (mtime_ns, 直下のファイルの合計サイズ,
+        # 直下のファイル数, サブディレクトリ名の一覧)。SIZE_CACHE_SIZE 件の LRU
+        # （走査のスレッドから使うのでロックで守る）
+        self._size_cache: (
+            "OrderedDict[str, Tuple[int, int, int, Tuple[str, ...]]]"
+        ) = OrderedDict()
+        self._size_cache_lock = threading.Lock()
+        # 親ディレクトリやサブディレクトリの .gitignore も必要に応じて読みます。
         self.gitignore = GitIgnoreMatcher(self.target_dir)
 
     def execute(
@@ -87,7 +130,105 @@ class LsTool:
         dir_path: str,
         ignore_patterns: Optional[List[str]] = None,
         respect_gitignore: bool = True,
+        recursive: bool = False,
+        max_depth: Optional[int] = None,
+        sort_by: str = "name",
+        offset: int = 0,
+        limit: Optional[int] = None,
+        aggregate_sizes: bool = False,
     ) -> Dict:
+        """
+        ディレクトリの内容を一覧にします。
+        recursive を True にするとサブディレクトリもたどり、各エントリを
+        dir_path からの相対パスで表示します。max_depth は何階層目まで
+        表示するかの上限です（1 なら直下のみ、None なら無制限）。
+        sort_by は "name" / "size" / "mtime" のいずれかです。
+        offset / limit を指定すると、並べた結果のその範囲だけを返します。
+        aggregate_sizes を True にすると、ディレクトリのサイズとして
+        その下の全ファイルの合計サイズとファイル数を求めます (du 相当)。
+        """
+        try:
+            page, total, ignored_count, resolved_path = self._list(
+                dir_path,
+                ignore_patterns,
+                respect_gitignore,
+                recursive,
+                max_depth,
+                sort_by,
+                offset,
+                limit,
+                aggregate_sizes,
+            )
+        except ValueError as e:
+            return {"error": str(e)}
+
+        result_text = "\n".join(
+            self._render(resolved_path, page, total, ignored_count, offset)
+        )
+        return {
+            "content": result_text,
+            "count": len(page),
+            "total": total,
+            "ignored": ignored_count,
+        }
+
+    def execute_stream(
+        self,
+        dir_path: str,
+        ignore_patterns: Optional[List[str]] = None,
+        respect_gitignore: bool = True,
+        recursive: bool = False,
+        max_depth: Optional[int] = None,
+        sort_by: str = "name",
+        offset: int = 0,
+        limit: Optional[int] = None,
+        aggregate_sizes: bool = False,
+    ) -> Iterator[str]:
+        """
+        execute() の content を1行ずつ返すジェネレータです。
+        一覧全体を1つの文字列にしないので、大きな一覧でもそのまま書き出せます。
+        エラーの場合は "Error: ..." の1行だけを返します。
+        """
+        try:
+            page, total, ignored_count, resolved_path = self._list(
+                dir_path,
+                ignore_patterns,
+                respect_gitignore,
+                recursive,
+                max_depth,
+                sort_by,
+                offset,
+                limit,
+                aggregate_sizes,
+            )
+        except ValueError as e:
+            yield f"Error: {e}"
+            return
+        yield from self._render(
+            resolved_path, page, total, ignored_count, offset
+        )
+
+    def _list(
+        self,
+        dir_path: str,
+        ignore_patterns: Optional[List[str]],
+        respect_gitignore: bool,
+        recursive: bool,
+        max_depth: Optional[int],
+        sort_by: str,
+        offset: int,
+        limit: Optional[int],
+        aggregate_sizes: bool = False,
+    ) -> Tuple[List[FileEntry], int, int, str]:
+        """
+        一覧を作り、(表示する範囲のエントリ, 全件数, 除外数, 解決済みパス) を
+        返します。問題がある場合はメッセージ付きの ValueError を送出します。
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(
+                f"Invalid sort_by: {sort_by} (expected one of {SORT_KEYS})"
+            )
+        offset = max(0, offset)
 
         # 1. パスの解決とセキュリティチェック
         resolved_path = os.path.abspath(
@@ -95,89 +236,278 @@ class LsTool:
         )
 
         try:
-            if (
-                os.path.commonpath([self.target_dir, resolved_path])
-                != self.target_dir
-            ):
-                return {
-                    "error": f"Access denied: {dir_path} is outside the target directory."
-                }
+            common = os.path.commonpath([self.target_dir, resolved_path])
         except ValueError:
-            return {"error": f"Access denied: {dir_path} is invalid."}
+            raise ValueError(f"Access denied: {dir_path} is invalid.")
+        if common != self.target_dir:
+            raise ValueError(
+                f"Access denied: {dir_path} is outside the target directory."
+            )
 
         if not os.path.exists(resolved_path):
-            return {"error": f"Directory not found: {resolved_path}"}
+            raise ValueError(f"Directory not found: {resolved_path}")
 
         if not os.path.isdir(resolved_path):
-            return {"error": f"Path is not a directory: {resolved_path}"}
+            raise ValueError(f"Path is not a directory: {resolved_path}")
 
         # 2. ディレクトリ読み込み
-        try:
-            all_files = os.listdir(resolved_path)
-        except Exception as e:
-            return {"error": f"Failed to list directory: {e}"}
+        # os.scandir はエントリの種別を readdir の結果から得られるので、
+        # listdir + stat + isdir のようにエントリごとに何度も問い合わせない
+        if not recursive:
+            depth_limit = 1
+        elif max_depth is None:
+            depth_limit = -1
+        else:
+            depth_limit = max(1, max_depth)
+
+        # 集計サイズは一覧を作る前にツリー全体を1回だけ並列に走査して求める
+        totals = (
+            self._aggregate_sizes(resolved_path) if aggregate_sizes else None
+        )
 
-        entries: List[FileEntry] = []
-        ignored_count = 0
+        # 件数はエントリを流しながら数える
+        counter = {"total": 0, "ignored": 0}
 
-        for name in all_files:
-            full_path = os.path.join(resolved_path, name)
+        def counted(entries: Iterator[FileEntry]) -> Iterator[FileEntry]:
+            for e in entries:
+                counter["total"] += 1
+                yield e
 
-            # 3. フィルタリング処理
-            should_skip = False
+        try:
+            # ルート自体が読めない場合はここでエラーにする
+            it = self._open_dir(resolved_path)
+        except OSError as e:
+            raise ValueError(f"Failed to list directory: {e}")
+        entries = counted(
+            self._walk(
+                it,
+                "",
+                ignore_patterns,
+                respect_gitignore,
+                depth_limit,
+                counter,
+                totals,
+            )
+        )
 
-            # (A) ユーザー指定の ignore パターン
-            if ignore_patterns:
-                for pat in ignore_patterns:
-                    if fnmatch.fnmatch(name, pat):
+        # 3. ソートと範囲の切り出し
+        # limit がある場合は上位 offset + limit 件だけをヒープで選ぶので、
+        # 巨大なディレクトリでも全件を並べ替えたり保持したりしない
+        key = _sort_key(sort_by)
+        if limit is None:
+            page = sorted(entries, key=key)[offset:]
+        else:
+            page = heapq.nsmallest(offset + max(0, limit), entries, key=key)
+            page = page[offset:]
+        return page, counter["total"], counter["ignored"], resolved_path
+
+    def _walk(
+        self,
+        it,
+        rel_dir: str,
+        ignore_patterns: Optional[List[str]],
+        respect_gitignore: bool,
+        depth_limit: int,
+        counter: Dict[str, int],
+        totals: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> Iterator[FileEntry]:
+        """
+        _open_dir() で開いた it からエントリを1件ずつ返します（順不同）。
+        depth_limit が残っていればサブディレクトリもたどります（負なら無制限）。
+        除外したエントリの数は counter["ignored"] に足します。
+        totals（ディレクトリ -> (合計サイズ, ファイル数)）があれば、
+        ディレクトリのサイズとファイル数をそこから埋めます。
+        """
+        with it as dir_entries:
+            for entry in dir_entries:
+                name = entry.name
+
+                # フィルタリング処理
+                should_skip = False
+
+                # (A) ユーザー指定の ignore パターン
+                if ignore_patterns:
+                    for pat in ignore_patterns:
+                        if fnmatch.fnmatch(name, pat):
+                            should_skip = True
+                            break
+
+                # (B) .gitignore
+                if not should_skip and respect_gitignore:
+                    try:
+                        entry_is_dir = entry.is_dir()
+                    except OSError:
+                        entry_is_dir = False
+                    if self.gitignore.should_ignore(entry.path, entry_is_dir):
                         should_skip = True
-                        break
-
-            # (B) .gitignore
-            if not should_skip and respect_gitignore:
-                if self.gitignore.should_ignore(full_path):
-                    should_skip = True
-
-            if should_skip:
-                ignored_count += 1
-                continue
-
-            # 4. エントリ情報の取得
-            try:
-                stats = os.stat(full_path)
-                is_dir = os.path.isdir(full_path)
-                entries.append(
-                    FileEntry(
-                        name=name,
-                        is_directory=is_dir,
-                        size=0 if is_dir else stats.st_size,
-                        modified_time=datetime.fromtimestamp(stats.st_mtime),
-                    )
+
+                if should_skip:
+                    counter["ignored"] += 1
+                    continue
+
+                # エントリ情報の取得
+                # is_dir() はキャッシュされた種別を使い、stat() も1回だけ呼ぶ
+                try:
+                    is_dir = entry.is_dir()
+                    stats = entry.stat()
+                except OSError:
+                    # アクセス権限などで stat に失敗した場合は無視
+                    continue
+
+                display_name = f"{rel_dir}{name}"
+                size, file_count = 0 if is_dir else stats.st_size, None
+                if is_dir and totals is not None:
+                    size, file_count = totals.get(entry.path, (0, 0))
+                yield FileEntry(
+                    name=display_name,
+                    is_directory=is_dir,
+                    size=size,
+                    modified_time=datetime.fromtimestamp(stats.st_mtime),
+                    file_count=file_count,
+                )
+
+                # シンボリックリンクはループの恐れがあるのでたどらない
+                if depth_limit == 1 or not is_dir or entry.is_symlink():
+                    continue
+                try:
+                    sub_it = self._open_dir(entry.path)
+                except OSError:
+                    # 読めないサブディレクトリは中身を省略する
+                    continue
+                yield from self._walk(
+                    sub_it,
+                    f"{display_name}/",
+                    ignore_patterns,
+                    respect_gitignore,
+                    depth_limit - 1,
+                    counter,
+                    totals,
                 )
-            except Exception:
-                # アクセス権限などで stat に失敗した場合は無視
-                continue
 
-        # 5. ソート (ディレクトリ優先、名前順)
-        entries.sort(key=lambda x: (not x.is_directory, x.name.lower()))
+    def _aggregate_sizes(self, root: str) -> Dict[str, Tuple[int, int]]:
+        """
+        root 以下の各ディレクトリについて、その下の全ファイルの
+        (合計サイズ, ファイル数) を求めます。
+        ディレクトリの読み込みはスレッドプールで並列に行い、各ディレクトリの
+        直下の集計はディレクトリの mtime が変わるまで再利用します。
+        （mtime はエントリの追加・削除で変わるので、既存ファイルの
+        サイズの変化はディレクトリを読み直すまで反映されません。
+        覚えておくのは最近使った SIZE_CACHE_SIZE 件のディレクトリまでです）
+        シンボリックリンクはたどらず、数えません。ハードリンクはリンクごとに
+        数えます (du -l 相当)。.gitignore 等による除外は適用しません。
+        """
+        own: Dict[str, Tuple[int, int, Tuple[str, ...]]] = {}
+        with ThreadPoolExecutor(max_workers=SIZE_SCAN_WORKERS) as pool:
+            pending = {pool.submit(self._scan_own_size, root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dir_path, size, files, subdirs = future.result()
+                    own[dir_path] = (size, files, subdirs)
+                    for name in subdirs:
+                        pending.add(
+                            pool.submit(
+                                self._scan_own_size,
+                                os.path.join(dir_path, name),
+                            )
+                        )
+
+        # 深いディレクトリから順に、子の合計を親に足し込む
+        totals: Dict[str, Tuple[int, int]] = {}
+        depth_first = sorted(own, key=lambda p: p.count(os.sep), reverse=True)
+        for dir_path in depth_first:
+            size, files, subdirs = own[dir_path]
+            for name in subdirs:
+                child = totals.get(os.path.join(dir_path, name))
+                if child is not None:
+                    size += child[0]
+                    files += child[1]
+            totals[dir_path] = (size, files)
+        return totals
+
+    def _scan_own_size(
+        self, dir_path: str
+    ) -> Tuple[str, int, int, Tuple[str, ...]]:
+        """
+        ディレクトリ直下のファイルの (合計サイズ, ファイル数) と
+        サブディレクトリ名を返します（読めない場合は空扱い）。
+        """
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return dir_path, 0, 0, ()
+        with self._size_cache_lock:
+            cached = self._size_cache.get(dir_path)
+            if cached is not None and cached[0] == mtime_ns:
+                self._size_cache.move_to_end(dir_path)
+                return (dir_path,) + cached[1:]
+
+        size = 0
+        files = 0
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            size += entry.stat(follow_symlinks=False).st_size
+                            files += 1
+                    except OSError:
+                        continue
+        except OSError:
+            return dir_path, 0, 0, ()
+
+        subdirs = tuple(subdirs)
+        with self._size_cache_lock:
+            self._size_cache[dir_path] = (mtime_ns, size, files, subdirs)
+            self._size_cache.move_to_end(dir_path)
+            if len(self._size_cache) > SIZE_CACHE_SIZE:
+                self._size_cache.popitem(last=False)
+        return dir_path, size, files, subdirs
+
+    def _open_dir(self, dir_path: str):
+        """
+        with で使える、ディレクトリのエントリ一覧を返します。
+        キャッシュがあればキャッシュした一覧、無ければ os.scandir です。
+        """
+        if self.dir_cache is not None:
+            return contextlib.nullcontext(
+                self.dir_cache.list_dir(dir_path, stat=True)
+            )
+        return os.scandir(dir_path)
 
-        # 6. 結果の整形
-        lines = []
-        for e in entries:
+    def _render(
+        self,
+        resolved_path: str,
+        page: List[FileEntry],
+        total: int,
+        ignored_count: int,
+        offset: int,
+    ) -> Iterator[str]:
+        """結果の整形（1行ずつ返します）"""
+        yield f"Directory listing for {resolved_path}:"
+        for e in page:
             prefix = "[DIR] " if e.is_directory else ""
-            lines.append(f"{prefix}{e.name}")
+            if e.file_count is not None:
+                yield (
+                    f"{prefix}{e.name}  "
+                    f"({_format_size(e.size)}, {e.file_count} files)"
+                )
+            else:
+                yield f"{prefix}{e.name}"
 
-        result_text = f"Directory listing for {resolved_path}:\n" + "\n".join(
-            lines
-        )
+        if len(page) < total:
+            if page:
+                shown = f"{offset + 1}-{offset + len(page)}"
+            else:
+                shown = "none"
+            yield ""
+            yield f"(showing {shown} of {total} entries)"
         if ignored_count > 0:
-            result_text += f"\n\n({ignored_count} ignored)"
-
-        return {
-            "content": result_text,
-            "count": len(entries),
-            "ignored": ignored_count,
-        }
+            yield ""
+            yield f"({ignored_count} ignored)"
 
 
 # --- 動作確認用 ---
@@ -193,6 +523,28 @@ if __name__ == "__main__":
     else:
         print(result["content"])
 
+    print("\n--- Listing recursively (2 levels) ---")
+    result_tree = tool.execute(".", recursive=True, max_depth=2)
+    if "error" in result_tree:
+        print("Error:", result_tree["error"])
+    else:
+        print(result_tree["content"])
+
+    print("\n--- 10 most recently modified entries ---")
+    for line in tool.execute_stream(
+        ".", recursive=True, sort_by="mtime", limit=10
+    ):
+        print(line)
+
+    print("\n--- Largest directories ---")
+    result_du = tool.execute(
+        ".", sort_by="size", limit=5, aggregate_sizes=True
+    )
+    if "error" in result_du:
+        print("Error:", result_du["error"])
+    else:
+        print(result_du["content"])
+
     print("\n--- Listing 'py' directory ---")
     result_py = tool.execute("py")
     if "error" in result_py:
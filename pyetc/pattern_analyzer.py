@@ -0,0 +1,558 @@
+"""正規表現から「必ず含まれるリテラル」を取り出す解析器。
+
+ripgrep のリテラル抽出と同じ考え方で、マッチする文字列が必ず含む
+リテラル断片を「OR 集合の AND」の形で取り出します。
+
+    "class .*Tool"      -> [[b"class "], [b"tool"]]
+    "(foo|bar)_baz"     -> [[b"foo", b"bar"], [b"_baz"]]
+
+リテラルは IGNORECASE 検索と整合するよう小文字化したバイト列で保持し、
+ファイルや行の先読みフィルタ（bytes.find）やトライグラム索引で使います。
+ただし re.IGNORECASE が行う特殊な対応付け（"ſ" と "s"、ケルビン記号と
+"k" など）は考慮しません。
+
+また、破滅的なバックトラックを起こしやすい構造（曖昧な入れ子の量指定子）の検出
+(find_risky_construct) と、バイト列の正規表現で検索すると ASCII 以外の文字の
+ところで結果が変わる構造の検出 (is_width_sensitive) もここで行います。
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Set, Tuple
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10 以前
+    import sre_constants
+    import sre_parse
+
+# 先読みフィルタでファイルを読むときのチャンクサイズ
+FILTER_CHUNK_SIZE = 1024 * 1024
+
+# 1つの OR 集合がこれより大きくなる場合は絞り込みに使わない
+MAX_ALTERNATIVES = 64
+
+# 幅を持たないので、リテラルの連続を途切れさせない命令
+_ZERO_WIDTH = (sre_constants.AT,)
+
+# バックトラックする繰り返し（POSSESSIVE_REPEAT は戻らないので含めない）
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+# Python 3.11 で追加された命令（無い版では None）
+_POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+# \b \B はバイト列では ASCII の英数字だけを単語の文字とみなす
+_WORD_BOUNDARIES = (sre_constants.AT_BOUNDARY, sre_constants.AT_NON_BOUNDARY)
+
+Clause = Tuple[bytes, ...]
+
+
+@dataclass
+class PatternAnalysis:
+    """
+    解析結果です。clauses の全ての OR 集合について、そのどれか1つの
+    リテラルを含むことがマッチの必要条件になります。
+    clauses が空なら絞り込みはできません。
+    """
+
+    pattern: str
+    clauses: List[Clause] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.clauses)
+
+    def may_match_bytes(self, lowered: bytes) -> bool:
+        """小文字化済みのバイト列がマッチし得るかを判定します"""
+        return all(
+            any(lowered.find(lit) >= 0 for lit in clause)
+            for clause in self.clauses
+        )
+
+    def may_match_file(self, file_path: str) -> bool:
+        """
+        ファイルがマッチし得るかを、チャンク単位の bytes.find で判定します。
+        チャンク境界をまたぐリテラルのため、末尾を少し重ねて読みます。
+        読めない場合は判定できないので True を返します。
+        """
+        if not self.clauses:
+            return True
+
+        needed: Set[bytes] = {lit for clause in self.clauses for lit in clause}
+        overlap = max(len(lit) for lit in needed) - 1
+        found: Set[bytes] = set()
+        tail = b""
+        try:
+            with open(file_path, "rb") as f:
+                while True:
+                    chunk = f.read(FILTER_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    data = tail + chunk.lower()
+                    for lit in needed - found:
+                        if data.find(lit) >= 0:
+                            found.add(lit)
+                    if self._satisfied(found):
+                        return True
+                    tail = data[-overlap:] if overlap else b""
+        except OSError:
+            return True
+        return self._satisfied(found)
+
+    def _satisfied(self, found: Set[bytes]) -> bool:
+        return all(
+            any(lit in found for lit in clause) for clause in self.clauses
+        )
+
+
+def analyze(pattern: str) -> PatternAnalysis:
+    """正規表現を解析し、必須リテラルの条件を返します"""
+    # GNU grep 固有のエスケープ（\< \> など）は Python の re ではただの
+    # リテラルになってしまうので、誤った絞り込みを避けるため解析しない
+    if any(f"\\{c}" in pattern for c in "<>`'"):
+        return PatternAnalysis(pattern)
+    # POSIX のブラケット式 ([[:space:]] など) も re とは区切り方が違い、
+    # "]" 以降が誤ってリテラル扱いになるので解析しない
+    if _has_posix_bracket(pattern):
+        return PatternAnalysis(pattern)
+
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return PatternAnalysis(pattern)
+
+    clauses = []
+    for clause in _sequence_clauses(parsed):
+        fragments = set()
+        for literal in clause:
+            pieces = searchable_fragments(literal)
+            if not pieces:
+                # どれか1つでも使えない選択肢があると OR 集合全体が使えない
+                fragments = set()
+                break
+            # 分割された断片はどれも含まれるはずなので、最長のものを代表にする
+            fragments.add(max(pieces, key=len))
+        if fragments and len(fragments) <= MAX_ALTERNATIVES:
+            clauses.append(tuple(sorted(fragments)))
+
+    # 判定が速く終わるよう、選択性の高そうな（長い）ものから並べる
+    clauses.sort(key=lambda c: -min(len(lit) for lit in c))
+    return PatternAnalysis(pattern, clauses)
+
+
+def _has_posix_bracket(pattern: str) -> bool:
+    """
+    ERE と re で解釈の違うブラケット式を含むかを判定します。
+    文字クラス ([:alpha:])・等価クラス ([=a=])・照合要素 ([.a.]) と、
+    ブラケット内のバックスラッシュ（ERE ではただの文字）が対象です。
+    """
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c != "[":
+            i += 1
+            continue
+
+        # ブラケット式の中身。先頭の "^" と "]" は閉じ括弧ではない
+        i += 1
+        if i < n and pattern[i] == "^":
+            i += 1
+        if i < n and pattern[i] == "]":
+            i += 1
+        while i < n and pattern[i] != "]":
+            if pattern[i] == "\\":
+                return True
+            if pattern[i] == "[" and pattern[i + 1 : i + 2] in (":", "=", "."):
+                return True
+            i += 1
+        i += 1
+    return False
+
+
+def searchable_fragments(literal: str) -> List[bytes]:
+    """
+    リテラルを、大文字小文字を無視した bytes.find で探せる断片に分けます。
+    ASCII 以外で大文字小文字を持つ文字（バイト列の lower() では揃えられない）
+    のところで分割し、その文字自体は使いません。
+    """
+    fragments = []
+    segment: List[str] = []
+    for c in literal:
+        if c.isascii() or c.lower() == c.upper():
+            segment.append(c)
+            continue
+        if segment:
+            fragments.append("".join(segment).lower().encode("utf-8"))
+            segment = []
+    if segment:
+        fragments.append("".join(segment).lower().encode("utf-8"))
+    return fragments
+
+
+def _sequence_clauses(items) -> List[List[str]]:
+    """命令列から「OR 集合の AND」を取り出します（リテラルは str のまま）"""
+    clauses: List[List[str]] = []
+    buf: List[str] = []
+
+    def flush():
+        if buf:
+            clauses.append(["".join(buf)])
+            buf.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            buf.append(chr(av))
+            continue
+        if op in _ZERO_WIDTH:
+            continue
+
+        # リテラル以外が来たら、そこで連続リテラルを区切る
+        flush()
+
+        if op is sre_constants.SUBPATTERN:
+            # av = (group, add_flags, del_flags, subpattern)
+            clauses += _sequence_clauses(av[-1])
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            # 1回以上の繰り返しなら中身は必須
+            min_count, _, item = av
+            if min_count >= 1:
+                clauses += _sequence_clauses(item)
+        elif op is sre_constants.BRANCH:
+            # どの選択肢も何かを必須とするなら、それらの OR が必須になる
+            alternatives: List[str] = []
+            for branch in av[1]:
+                best = _best_clause(_sequence_clauses(branch))
+                if best is None:
+                    alternatives = []
+                    break
+                alternatives += best
+            if alternatives:
+                clauses.append(alternatives)
+        # IN / ANY / 後方参照などは「必須」とは言えないので何もしない
+
+    flush()
+    return clauses
+
+
+def _best_clause(clauses: List[List[str]]):
+    """いちばん絞り込みに効きそうな（最短リテラルが最も長い）条件を選びます"""
+    if not clauses:
+        return None
+    return max(clauses, key=lambda c: min(len(lit) for lit in c))
+
+
+def find_risky_construct(pattern: str) -> Optional[str]:
+    """
+    破滅的なバックトラックを起こしやすい構造を探し、その説明を返します。
+    無制限の繰り返しの中にある無制限の繰り返しのうち、同じ文字列を
+    繰り返しの回の分け方を変えて何通りにもマッチできるもの
+    （(a+)+ や (\\s*x*)* や (\\w+\\s?)+ など）を検出します。
+    (\\w+\\.)+ や (\\d+,)* のように、内側の繰り返しが使えない文字で回が
+    区切られるものは、分け方が1通りなので検出しません。
+    見つからなければ None です。
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    # パターンに現れる文字も代表に加える（[ぁ-ん] と "う" の重なりなど）
+    universe = _SAMPLE_CHARS + sorted(c for c in set(pattern) if c > "\xff")
+    return _find_ambiguous_repeat(parsed, universe)
+
+
+def _find_ambiguous_repeat(items, universe: List[str]) -> Optional[str]:
+    for op, av in items:
+        if op in _REPEATS:
+            _, max_count, item = av
+            if max_count == sre_constants.MAXREPEAT and _is_ambiguous_loop(
+                item, universe
+            ):
+                return "ambiguous nested quantifier"
+            found = _find_ambiguous_repeat(item, universe)
+        elif op is sre_constants.SUBPATTERN:
+            found = _find_ambiguous_repeat(av[-1], universe)
+        elif op is sre_constants.BRANCH:
+            found = None
+            for branch in av[1]:
+                found = found or _find_ambiguous_repeat(branch, universe)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            # av = (direction, subpattern)
+            found = _find_ambiguous_repeat(av[1], universe)
+        else:
+            # 所有的な繰り返しとアトミックグループはバックトラックしない
+            found = None
+        if found:
+            return found
+    return None
+
+
+def _is_ambiguous_loop(body, universe: List[str]) -> bool:
+    """
+    無制限の繰り返しの本体 body の中の無制限の繰り返し R について、
+    R の後ろ（本体の末尾まで行ったら次の回の先頭へ回り込む）で、
+    R が続けて読めた文字から始まり得る要素があるかを調べます。
+    あれば、その文字を R で読むか次の要素で読むかの分け方が何通りもあります。
+    """
+    elements = _flatten(body)
+    n = len(elements)
+    for i, (op, av) in enumerate(elements):
+        if not _is_unbounded(op, av):
+            if _has_unbounded_repeat([(op, av)]):
+                # 選択や先読みの中の繰り返しは区切りを調べられないので、
+                # 危険とみなす
+                return True
+            continue
+        inner, _ = _first_chars(av[2])
+        for step in range(1, n + 1):
+            j = (i + step) % n
+            if j == i:
+                # 他の要素が全て空にマッチできる ((a+)+ や (\s*x*)*)
+                return True
+            first, nullable = _first_chars([elements[j]])
+            if _overlaps(inner, first, universe):
+                return True
+            if not nullable:
+                break
+    return False
+
+
+def _flatten(items) -> list:
+    """グループ (...) を展開して、要素の並びにします"""
+    out = []
+    for op, av in items:
+        if op is sre_constants.SUBPATTERN:
+            out += _flatten(av[-1])
+        else:
+            out.append((op, av))
+    return out
+
+
+def _is_unbounded(op, av) -> bool:
+    return (
+        op in _REPEATS and av[1] == sre_constants.MAXREPEAT and av[0] != av[1]
+    )
+
+
+def _has_unbounded_repeat(items) -> bool:
+    for op, av in items:
+        if _is_unbounded(op, av):
+            return True
+        if op in _REPEATS:
+            found = _has_unbounded_repeat(av[2])
+        elif op is sre_constants.SUBPATTERN:
+            found = _has_unbounded_repeat(av[-1])
+        elif op is sre_constants.BRANCH:
+            found = any(_has_unbounded_repeat(b) for b in av[1])
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            found = _has_unbounded_repeat(av[1])
+        elif op is sre_constants.GROUPREF_EXISTS:
+            found = any(_has_unbounded_repeat(b) for b in av[1:] if b)
+        else:
+            found = False
+        if found:
+            return True
+    return False
+
+
+# 文字の集合が重なるかを調べるときに使う代表の文字
+# （Latin-1 の全ての文字と、ASCII 以外の単語の文字の代表）
+_SAMPLE_CHARS = [chr(i) for i in range(256)] + ["あ"]
+
+_CATEGORY_TESTS = {
+    sre_constants.CATEGORY_DIGIT: lambda c: c.isdecimal(),
+    sre_constants.CATEGORY_NOT_DIGIT: lambda c: not c.isdecimal(),
+    sre_constants.CATEGORY_SPACE: lambda c: c.isspace(),
+    sre_constants.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_constants.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_constants.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+
+# 文字の集合は「1文字を受け取って含まれるかを返す関数」で表す
+CharTest = Callable[[str], bool]
+
+
+def _any_char(c: str) -> bool:
+    return True
+
+
+def _first_chars(items) -> Tuple[Optional[CharTest], bool]:
+    """
+    items の並びのマッチの先頭になり得る文字の集合と、
+    items が空文字列にマッチし得るかを返します（集合が空なら None）。
+    """
+    tests = []
+    for op, av in items:
+        test, nullable = _first_chars_of(op, av)
+        if test is not None:
+            tests.append(test)
+        if not nullable:
+            return _union(tests), False
+    return _union(tests), True
+
+
+def _first_chars_of(op, av) -> Tuple[Optional[CharTest], bool]:
+    if op is sre_constants.LITERAL:
+        # GrepTool は IGNORECASE で検索する
+        lower = chr(av).lower()
+        return (lambda c: c.lower() == lower), False
+    if op is sre_constants.NOT_LITERAL:
+        lower = chr(av).lower()
+        return (lambda c: c.lower() != lower), False
+    if op is sre_constants.ANY:
+        return (lambda c: c != "\n"), False
+    if op is sre_constants.IN:
+        return _class_test(av), False
+    if op in (
+        sre_constants.AT,
+        sre_constants.ASSERT,
+        sre_constants.ASSERT_NOT,
+    ):
+        return None, True
+    if op is sre_constants.SUBPATTERN:
+        return _first_chars(av[-1])
+    if op is _ATOMIC_GROUP:
+        return _first_chars(av)
+    if op in _REPEATS or op is _POSSESSIVE_REPEAT:
+        min_count, _, item = av
+        test, nullable = _first_chars(item)
+        return test, nullable or min_count == 0
+    if op is sre_constants.BRANCH:
+        results = [_first_chars(branch) for branch in av[1]]
+        return _union([t for t, _ in results if t is not None]), any(
+            n for _, n in results
+        )
+    if op is sre_constants.GROUPREF_EXISTS:
+        # av = (group, yes, no)
+        results = [_first_chars(b) if b else (None, True) for b in av[1:]]
+        return _union([t for t, _ in results if t is not None]), any(
+            n for _, n in results
+        )
+    # 後方参照など、中身の分からないものは何にでもマッチし得るとみなす
+    return _any_char, True
+
+
+def _class_test(items) -> CharTest:
+    """[...] の中身を、含まれるかを返す関数にします"""
+    negate = False
+    tests: List[CharTest] = []
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            lower = chr(av).lower()
+            tests.append(lambda c, lower=lower: c.lower() == lower)
+        elif op is sre_constants.RANGE:
+            lo, hi = av
+            tests.append(
+                lambda c, lo=lo, hi=hi: any(
+                    len(x) == 1 and lo <= ord(x) <= hi
+                    for x in (c, c.lower(), c.upper())
+                )
+            )
+        elif op is sre_constants.CATEGORY:
+            tests.append(_CATEGORY_TESTS.get(av, _any_char))
+        else:
+            return _any_char
+    test = _union(tests) or (lambda c: False)
+    if negate:
+        return lambda c: not test(c)
+    return test
+
+
+def _union(tests: List[CharTest]) -> Optional[CharTest]:
+    if not tests:
+        return None
+    if len(tests) == 1:
+        return tests[0]
+    return lambda c: any(t(c) for t in tests)
+
+
+def _overlaps(
+    a: Optional[CharTest], b: Optional[CharTest], universe: List[str]
+) -> bool:
+    if a is None or b is None:
+        return False
+    return any(a(c) and b(c) for c in universe)
+
+
+def is_width_sensitive(pattern: str) -> bool:
+    r"""
+    ASCII 以外の文字を含む行で、バイト列の正規表現と str の正規表現とで
+    結果が変わり得る構造を含むかを判定します（解析できなければ True）。
+
+    1文字にマッチする . や [^x] は、バイト列では UTF-8 の1バイトにしか
+    マッチしません。ただし下限が 1 以下で上限の無い繰り返し (.* や [^x]+)
+    は、何バイトにマッチしても何文字かにマッチするのと同じなので、
+    結果は変わりません。\w \d などの文字クラスと \b \B は、バイト列では
+    ASCII にしか効きません。
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return True
+    return _width_sensitive(parsed)
+
+
+def _width_sensitive(items) -> bool:
+    for op, av in items:
+        if op in (sre_constants.ANY, sre_constants.NOT_LITERAL):
+            return True
+        if op is sre_constants.IN:
+            if _class_sensitive(av, allow_negate=False):
+                return True
+        elif op is sre_constants.AT:
+            if av in _WORD_BOUNDARIES:
+                return True
+        elif op in _REPEATS or op is _POSSESSIVE_REPEAT:
+            min_count, max_count, item = av
+            if (
+                min_count <= 1
+                and max_count == sre_constants.MAXREPEAT
+                and _is_any_char(item)
+            ):
+                continue
+            if _width_sensitive(item):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            if _width_sensitive(av[-1]):
+                return True
+        elif op is _ATOMIC_GROUP:
+            if _width_sensitive(av):
+                return True
+        elif op is sre_constants.BRANCH:
+            if any(_width_sensitive(branch) for branch in av[1]):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _width_sensitive(av[1]):
+                return True
+        elif op is sre_constants.GROUPREF_EXISTS:
+            # av = (group, yes, no)
+            if any(_width_sensitive(b) for b in av[1:] if b is not None):
+                return True
+    return False
+
+
+def _is_any_char(item) -> bool:
+    """繰り返しの中身が「文字クラスを使わない1文字」(. や [^x]) か"""
+    if len(item) != 1:
+        return False
+    op, av = item[0]
+    if op in (sre_constants.ANY, sre_constants.NOT_LITERAL):
+        return True
+    return op is sre_constants.IN and not _class_sensitive(
+        av, allow_negate=True
+    )
+
+
+def _class_sensitive(av, allow_negate: bool) -> bool:
+    """[...] の中身に、バイト列と str で結果の変わるものがあるか"""
+    for op, _ in av:
+        if op is sre_constants.CATEGORY:
+            return True
+        if op is sre_constants.NEGATE and not allow_negate:
+            return True
+    return False
@@ -1,6 +1,32 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+
+from compressed_index import CompressedLineIndex, compression_format
+from grep import FileExclusions
+from line_index import (
+    LineIndexCache,
+    decode_lines,
+    find_lines_end,
+    find_tail_start,
+)
+from symbol_index import Symbol, SymbolIndex
+
+# デフォルトの上限値（TypeScript側でも制限があるため）
+DEFAULT_LINE_LIMIT = 10000
+
+# read_many で全ファイル合わせて返すバイト数の上限
+DEFAULT_BYTE_BUDGET = 512 * 1024
+
+# 圧縮ファイルの索引を覚えておくファイル数（展開器の状態を持つので少なめ）
+COMPRESSED_INDEX_CACHE_SIZE = 8
+
+# シンボル名が曖昧なときに候補として挙げる最大件数
+MAX_SYMBOL_CANDIDATES = 20
+
+# read_many で同時に読むファイル数
+READ_MANY_WORKERS = 8
 
 
 # 擬似的な設定クラス
@@ -20,8 +46,46 @@ class FileContentResult:
 
 
 class ReadFileTool:
-    def __init__(self, config: Config):
+    """
+    index_cache_size 個までのファイルについて行オフセット索引
+    (LineIndex) を覚えておき、offset 付きの読み込みでは該当行へ直接 seek
+    します。persist_index を True にすると索引をサイドカーファイル
+    (<file>.lineidx) にも保存します。
+
+    ログ向けに、末尾の N 行を読む execute_tail と、前回読んだバイト位置
+    からの追記分だけを読む execute_follow もあります。
+    複数のファイルをまとめて読むときは read_many を使います。
+
+    .gz / .xz のファイルは展開して読みます（CompressedLineIndex の
+    チェックポイントから展開するので、途中の行を読むときも先頭から展開し
+    直しません）。
+
+    execute に symbol を渡すと、target_dir 以下の Python ファイルの
+    シンボル索引 (SymbolIndex) でクラス・関数の定義を探し、その行範囲だけを
+    読みます。symbol_index_path を指定すると索引をそこに保存し、次回からは
+    変更されたファイルだけを解析し直します。
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        index_cache_size: int = 64,
+        persist_index: bool = False,
+        symbol_index_path: Optional[str] = None,
+        symbol_workers: int = 0,
+    ):
         self.config = config
+        self.symbol_index_path = symbol_index_path
+        self.symbol_workers = symbol_workers
+        # 初めて symbol が指定されたときに作る
+        self.symbols: Optional[SymbolIndex] = None
+        self.line_indexes = LineIndexCache(
+            max_entries=index_cache_size, persist=persist_index
+        )
+        self.compressed_indexes = LineIndexCache(
+            max_entries=COMPRESSED_INDEX_CACHE_SIZE,
+            index_class=CompressedLineIndex,
+        )
 
     def validate(
         self, file_path: str, offset: int = 0, limit: Optional[int] = None
@@ -61,9 +125,20 @@ class ReadFileTool:
         return None
 
     def execute(
-        self, file_path: str, offset: int = 0, limit: Optional[int] = None
+        self,
+        file_path: str = "",
+        offset: int = 0,
+        limit: Optional[int] = None,
+        symbol: Optional[str] = None,
     ):
-        """ファイルを読み込みます"""
+        """
+        ファイルを読み込みます。
+        symbol を指定すると、その定義の行範囲を読みます（file_path を
+        指定した場合は、そのファイルの中の定義に絞ります）。
+        """
+        if symbol is not None:
+            return self._execute_symbol(symbol, file_path, limit)
+
         # バリデーション実行
         error = self.validate(file_path, offset, limit)
         if error:
@@ -72,62 +147,377 @@ class ReadFileTool:
         resolved_path = os.path.abspath(
             os.path.join(self.config.target_dir, file_path)
         )
+        effective_limit = limit if limit is not None else DEFAULT_LINE_LIMIT
+
+        try:
+            if not os.path.isfile(resolved_path):
+                return {"error": f"File not found: {resolved_path}"}
+
+            lines_buffer, total_lines = self._read_range(
+                resolved_path, offset, effective_limit
+            )
+
+            end_display = offset + len(lines_buffer)
+            return self._build_result(
+                lines_buffer,
+                offset,
+                total_lines,
+                f"To read more, use offset={end_display} in the next call.",
+            )
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _execute_symbol(
+        self, symbol: str, file_path: str, limit: Optional[int]
+    ):
+        """シンボル索引で定義を探して、その範囲を読みます"""
+        if not symbol:
+            return {"error": "symbol must not be empty"}
+        if file_path:
+            error = self.validate(file_path, 0, limit)
+            if error:
+                return {"error": error}
+        elif limit is not None and limit <= 0:
+            return {"error": "Limit must be a positive number"}
+
+        try:
+            if self.symbols is None:
+                self.symbols = SymbolIndex(
+                    self.config.target_dir,
+                    FileExclusions(),
+                    index_path=self.symbol_index_path,
+                    workers=self.symbol_workers,
+                )
+            self.symbols.update()
+
+            matches = self.symbols.lookup(symbol)
+            # 完全名で一致するものがあれば、短い名前だけの一致は除く
+            exact = [s for s in matches if s.name == symbol]
+            matches = exact or matches
+            if file_path:
+                rel_path = os.path.relpath(
+                    os.path.abspath(
+                        os.path.join(self.config.target_dir, file_path)
+                    ),
+                    self.config.target_dir,
+                )
+                matches = [s for s in matches if s.path == rel_path]
+
+            if not matches:
+                return {"error": f"Symbol not found: {symbol}"}
+            if len(matches) > 1:
+                listing = "\n".join(
+                    f"{s.path}:{s.start_line} {s.kind} {s.name}"
+                    for s in matches[:MAX_SYMBOL_CANDIDATES]
+                )
+                return {
+                    "error": f"Symbol '{symbol}' is ambiguous "
+                    f"({len(matches)} definitions). "
+                    "Specify file_path or a qualified name:\n" + listing
+                }
+
+            return self._read_symbol(matches[0], limit)
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _read_symbol(self, sym: Symbol, limit: Optional[int]):
+        """定義の行範囲を読みます（limit があればその行数まで）"""
+        full_span = sym.end_line - sym.start_line + 1
+        span = full_span if limit is None else min(full_span, limit)
+        resolved_path = os.path.join(self.config.target_dir, sym.path)
+        lines_buffer, total_lines = self._read_range(
+            resolved_path, sym.start_line - 1, span
+        )
+        start_display = sym.start_line if lines_buffer else 0
+        end_display = sym.start_line - 1 + len(lines_buffer)
+        content = "".join(lines_buffer)
+        # limit で定義の途中までしか読まなかった場合は execute と同じ案内を付ける
+        if span < full_span and len(lines_buffer) == span:
+            content = (
+                _truncation_header(
+                    start_display,
+                    end_display,
+                    total_lines,
+                    f"To read more, use offset={end_display} with "
+                    f"file_path='{sym.path}' in the next call.",
+                )
+                + content
+            )
+        return {
+            "content": content,
+            "lines_shown": (start_display, end_display),
+            "total_lines": total_lines,
+            "file_path": sym.path,
+            "symbol": sym.name,
+            "kind": sym.kind,
+        }
 
-        # デフォルトの上限値（TypeScript側でも制限があるため）
-        effective_limit = limit if limit is not None else 10000
+    def execute_tail(self, file_path: str, limit: Optional[int] = None):
+        """
+        ファイルの末尾 limit 行を読みます（tail -n 相当）。
+        末尾からブロック単位で読み戻るので、読む量は返す行の分だけです。
+        行番号は行オフセット索引から求めます（追記されたログでは、索引は
+        追記分だけを走査して伸ばされます）。
+        """
+        error = self.validate(file_path, 0, limit)
+        if error:
+            return {"error": error}
+
+        resolved_path = os.path.abspath(
+            os.path.join(self.config.target_dir, file_path)
+        )
+        effective_limit = limit if limit is not None else DEFAULT_LINE_LIMIT
 
         try:
             if not os.path.isfile(resolved_path):
                 return {"error": f"File not found: {resolved_path}"}
 
-            # アルゴリズムのポイント:
-            # readlines() で全行読み込むと巨大なファイルでメモリがパンクするので、
-            # イテレータを使って「必要な行だけ」メモリに入れるようにします。
+            st = os.stat(resolved_path)
+            index = self._index_for(resolved_path, st)
+            if compression_format(resolved_path):
+                # 圧縮ファイルは後ろから読めないので、索引の最後の方の
+                # チェックポイントから展開する
+                lines_buffer = index.read_lines(
+                    resolved_path,
+                    max(index.line_count - effective_limit, 0),
+                    effective_limit,
+                )
+            else:
+                # stat した時点のサイズまでを読む（読んでいる間の追記は次回）
+                with open(resolved_path, "rb") as f:
+                    start = find_tail_start(f, st.st_size, effective_limit)
+                    lines_buffer = decode_lines(f, start, st.st_size)
 
-            lines_buffer = []
-            total_lines = 0
+            total_lines = index.line_count
+            offset = total_lines - len(lines_buffer)
+            prev_offset = max(offset - effective_limit, 0)
+            return self._build_result(
+                lines_buffer,
+                offset,
+                total_lines,
+                f"To read earlier lines, use offset={prev_offset} "
+                f"and limit={offset - prev_offset} in the next call.",
+            )
 
-            # encoding は環境に合わせて適切に設定（utf-8が無難）
-            with open(
-                resolved_path, "r", encoding="utf-8", errors="replace"
-            ) as f:
-                # enumerate で (行番号, 行内容) のペアを取得
-                for i, line in enumerate(f):
-                    total_lines = i + 1
+        except Exception as e:
+            return {"error": str(e)}
 
-                    # 必要な範囲だけバッファに追加
-                    if offset <= i < (offset + effective_limit):
-                        lines_buffer.append(line)
+    def execute_follow(
+        self,
+        file_path: str,
+        since_offset: int = 0,
+        limit: Optional[int] = None,
+    ):
+        """
+        バイト位置 since_offset 以降に追記された行を読みます（tail -f 相当の
+        ポーリング用）。改行で終わっている行だけを返し、結果の next_offset を
+        次の呼び出しの since_offset に渡せば、続きから読めます。
+        ファイルが since_offset より小さくなっていたら（ローテートや切り詰め）
+        先頭から読み直し、reset を True にします。
+        """
+        error = self.validate(file_path, 0, limit)
+        if error:
+            return {"error": error}
+        if since_offset < 0:
+            return {"error": "since_offset must be a non-negative number"}
 
-            # 結果の組み立て
-            content = "".join(lines_buffer)
-            is_truncated = len(lines_buffer) < total_lines
+        resolved_path = os.path.abspath(
+            os.path.join(self.config.target_dir, file_path)
+        )
+        effective_limit = limit if limit is not None else DEFAULT_LINE_LIMIT
 
-            # 表示用に 1-based index に変換
-            start_display = offset + 1 if lines_buffer else 0
-            end_display = offset + len(lines_buffer)
+        try:
+            if not os.path.isfile(resolved_path):
+                return {"error": f"File not found: {resolved_path}"}
+            if compression_format(resolved_path):
+                return {
+                    "error": "Follow mode is not supported for "
+                    f"compressed files: {file_path}"
+                }
+
+            st = os.stat(resolved_path)
+            reset = since_offset > st.st_size
+            if reset:
+                since_offset = 0
 
-            # 切り捨て発生時のメッセージ付与
-            if is_truncated:
-                header = (
-                    f"\nIMPORTANT: The file content has been truncated.\n"
-                    f"Status: Showing lines {start_display}-{end_display} of "
-                    f"{total_lines} total lines.\n"
-                    f"Action: To read more, use offset={end_display} "
-                    "in the next call.\n"
-                    f"--- FILE CONTENT (truncated) ---"
+            index = self.line_indexes.get(resolved_path, st)
+            offset = index.line_at(resolved_path, since_offset)
+            with open(resolved_path, "rb") as f:
+                end, _ = find_lines_end(
+                    f, since_offset, st.st_size, effective_limit
                 )
-                content = header + content
+                lines_buffer = decode_lines(f, since_offset, end)
 
+            start_display = offset + 1 if lines_buffer else 0
             return {
-                "content": content,
-                "lines_shown": (start_display, end_display),
-                "total_lines": total_lines,
+                "content": "".join(lines_buffer),
+                "lines_shown": (start_display, offset + len(lines_buffer)),
+                "total_lines": index.line_count,
+                "next_offset": end,
+                "reset": reset,
             }
 
         except Exception as e:
             return {"error": str(e)}
 
+    def read_many(
+        self,
+        requests: List[Union[str, Dict]],
+        max_total_lines: int = DEFAULT_LINE_LIMIT,
+        max_total_bytes: int = DEFAULT_BYTE_BUDGET,
+    ) -> List[Dict]:
+        """
+        複数のファイルをまとめて読みます。requests の要素はファイルパスか、
+        execute と同じ引数の辞書 {"file_path", "offset", "limit"} です。
+
+        全てのパスを先に検証してから、ファイルをスレッドプールで並行して
+        読みます（ネットワークファイルシステムでの待ち時間を重ねるため）。
+        結果は requests の順に並び、行数・バイト数の上限は全ファイルで共有
+        します。上限に達した後のファイルは中身を返さずにエラーを返します。
+        max_total_bytes は返す内容（UTF-8 にした行）の大きさの上限で、
+        ディスクから読むバイト数の上限ではありません。各ファイルは読み込みを
+        並行して始めるので、上限を超える分も読まれることがあります
+        （1ファイルで読むのは最大 max_total_lines 行です）。
+        """
+        # 1. 全リクエストの検証（I/O の前に済ませる）
+        jobs = []
+        for req in requests:
+            if isinstance(req, str):
+                req = {"file_path": req}
+            file_path = req.get("file_path", "")
+            offset = req.get("offset", 0)
+            limit = req.get("limit")
+            error = self.validate(file_path, offset, limit)
+            resolved_path = os.path.abspath(
+                os.path.join(self.config.target_dir, file_path)
+            )
+            jobs.append((file_path, resolved_path, offset, limit, error))
+
+        # 2. 並行して読む。1ファイルで全体の上限を超える行は読まない
+        def read(job):
+            file_path, resolved_path, offset, limit, error = job
+            if error:
+                return error
+            effective_limit = min(
+                limit if limit is not None else DEFAULT_LINE_LIMIT,
+                max_total_lines,
+            )
+            try:
+                if not os.path.isfile(resolved_path):
+                    return f"File not found: {resolved_path}"
+                return self._read_range(resolved_path, offset, effective_limit)
+            except Exception as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=READ_MANY_WORKERS) as pool:
+            outcomes = list(pool.map(read, jobs))
+
+        # 3. リクエストの順に上限を割り当てる（並行読み込みの完了順に
+        #    よらず、同じ入力なら同じ結果になる）
+        results = []
+        lines_left = max_total_lines
+        bytes_left = max_total_bytes
+        exhausted = {
+            "error": "Read budget exhausted. "
+            "Read this file in a separate call."
+        }
+        for (file_path, _, offset, _, _), outcome in zip(jobs, outcomes):
+            if isinstance(outcome, str):
+                results.append({"file_path": file_path, "error": outcome})
+                continue
+            if lines_left <= 0 or bytes_left <= 0:
+                results.append({"file_path": file_path, **exhausted})
+                continue
+
+            lines_buffer, total_lines = outcome
+            kept = []
+            for line in lines_buffer[:lines_left]:
+                size = len(line.encode("utf-8"))
+                if size > bytes_left:
+                    break
+                kept.append(line)
+                bytes_left -= size
+            lines_left -= len(kept)
+            if lines_buffer and not kept:
+                # 1行目すら入らない: このファイルもこれ以降も返さない
+                bytes_left = 0
+                results.append({"file_path": file_path, **exhausted})
+                continue
+
+            end_display = offset + len(kept)
+            result = self._build_result(
+                kept,
+                offset,
+                total_lines,
+                f"To read more, use offset={end_display} in the next call.",
+            )
+            result["file_path"] = file_path
+            results.append(result)
+        return results
+
+    def _read_range(
+        self, resolved_path: str, offset: int, limit: int
+    ) -> Tuple[List[str], int]:
+        """offset 行目から limit 行と、ファイル全体の行数を返します"""
+        # 改行の数はバイト列のまま数えた行オフセット索引から取り、
+        # offset 行目へ直接 seek して必要な範囲だけデコードする
+        # （索引はファイルが変わらない限り使い回される）
+        st = os.stat(resolved_path)
+        index = self._index_for(resolved_path, st)
+        lines_buffer = index.read_lines(resolved_path, offset, limit)
+        return lines_buffer, index.line_count
+
+    def _index_for(self, resolved_path: str, st: os.stat_result):
+        """ファイルの行索引（圧縮ファイルなら展開用の索引）を返します"""
+        if compression_format(resolved_path):
+            return self.compressed_indexes.get(resolved_path, st)
+        return self.line_indexes.get(resolved_path, st)
+
+    def _build_result(
+        self,
+        lines_buffer: List[str],
+        offset: int,
+        total_lines: int,
+        action: str,
+    ):
+        """読んだ行から結果を組み立てます（一部だけなら案内を付けます）"""
+        content = "".join(lines_buffer)
+        is_truncated = len(lines_buffer) < total_lines
+
+        # 表示用に 1-based index に変換
+        start_display = offset + 1 if lines_buffer else 0
+        end_display = offset + len(lines_buffer)
+
+        # 切り捨て発生時のメッセージ付与
+        if is_truncated:
+            content = (
+                _truncation_header(
+                    start_display, end_display, total_lines, action
+                )
+                + content
+            )
+
+        return {
+            "content": content,
+            "lines_shown": (start_display, end_display),
+            "total_lines": total_lines,
+        }
+
+
+def _truncation_header(
+    start_display: int, end_display: int, total_lines: int, action: str
+) -> str:
+    """一部だけを返すときに内容の前に付ける案内"""
+    return (
+        f"\nIMPORTANT: The file content has been truncated.\n"
+        f"Status: Showing lines {start_display}-{end_display} of "
+        f"{total_lines} total lines.\n"
+        f"Action: {action}\n"
+        f"--- FILE CONTENT (truncated) ---"
+    )
+
 
 # --- 動作確認用 ---
 if __name__ == "__main__":
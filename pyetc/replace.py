@@ -8,12 +8,20 @@ accidental overwrites.
 import logging
 import os
 import sys
+import tempfile
 from pathlib import Path
+from typing import Optional
 
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# streaming を指定しない場合、これ以上の大きさのファイルはストリーミングで置換する
+STREAMING_THRESHOLD = 64 * 1024 * 1024
+
+# ストリーミング置換で1回に読む文字数
+STREAMING_CHUNK_SIZE = 1024 * 1024
+
 
 class AccessDenied(Exception):
     """プロジェクトのベースディレクトリ外のパスが指定された場合に送出される例外。"""
@@ -65,6 +73,7 @@ class ReplaceStringInFile:
         old_string: str,
         new_string: str,
         expected_replacements: int = 1,
+        streaming: Optional[bool] = None,
     ) -> None:
         """指定されたファイル内の old_string を new_string に置き換える。
 
@@ -100,6 +109,16 @@ class ReplaceStringInFile:
               * もしファイルの中に同じ old_string がいくつもあって、それを全部
                 まとめて変えたい時に使います。変えたい箇所の数を指定します。
                 デフォルトは「1」なので、指定しなかったら1箇所だけ変えます。
+            streaming: 大きなファイル向けのストリーミングモードを使うかどうか。
+              * True なら、ファイルをチャンクごとに読みながら数えて置き換え、
+                同じディレクトリの一時ファイルに書いてから fsync して
+                os.replace で差し替える。メモリ使用量はファイルの大きさに
+                よらず一定で、途中で落ちても元のファイルは壊れない。
+              * ファイルは新しい inode に置き換わる（ハードリンクは切れる。
+                シンボリックリンクはたどってリンク先を置き換える。
+                パーミッションと、権限があれば所有者・グループも引き継ぐ）。
+              * None（デフォルト）なら、STREAMING_THRESHOLD 以上のファイル
+                だけストリーミングモードにする。
         Raises:
             FileNotFoundError: If the file does not exist.
             ValueError: If the occurrence count does not match expected_replacements.
@@ -107,6 +126,18 @@ class ReplaceStringInFile:
         """
         self.validate(file_path)
 
+        if streaming is None:
+            streaming = os.path.getsize(file_path) >= STREAMING_THRESHOLD
+        if streaming:
+            count = self._execute_streaming(
+                file_path, old_string, new_string, expected_replacements
+            )
+            print(
+                f"Successfully replaced {count} occurrence(s) "
+                f"in '{file_path}'."
+            )
+            return
+
         # Read the file content
         # Using utf-8 as default.
         target_path = Path(file_path)
@@ -139,10 +170,136 @@ class ReplaceStringInFile:
         target_path.write_text(new_content, encoding="utf-8")
         print(f"Successfully replaced {count} occurrence(s) in '{file_path}'.")
 
+    def _execute_streaming(
+        self,
+        file_path: str,
+        old_string: str,
+        new_string: str,
+        expected_replacements: int,
+    ) -> int:
+        """ストリーミングモードで置換し、置き換えた数を返します。
+
+        チャンクの境界をまたぐ old_string を見落とさないよう、末尾の
+        len(old_string) - 1 文字は次のチャンクと合わせて探します。
+        数が expected_replacements と合わなければ一時ファイルを消して
+        ValueError を送出します（元のファイルには触れません）。
+        """
+        if not old_string:
+            raise ValueError("'old_string' must not be empty.")
 
-if __name__ == "__main__":
-    import tempfile
+        # シンボリックリンクならリンク先を置き換える（リンク自体を普通の
+        # ファイルで上書きしない）
+        file_path = os.path.realpath(file_path)
+        target_dir = os.path.dirname(file_path)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=target_dir,
+            prefix=f".{os.path.basename(file_path)}.",
+            suffix=".tmp",
+        )
+        try:
+            # 改行の扱いは read_text / write_text と同じ（テキストモード）。
+            # 元のファイルを開けなくても fd が閉じられるよう、先に fd を開く
+            with open(fd, "w", encoding="utf-8") as dst, open(
+                file_path, "r", encoding="utf-8"
+            ) as src:
+                try:
+                    count = self._replace_stream(
+                        src,
+                        dst,
+                        old_string,
+                        new_string,
+                        expected_replacements,
+                    )
+                except UnicodeDecodeError as e:
+                    raise ValueError(
+                        f"Failed to read '{file_path}' as UTF-8: {e}"
+                    )
+
+                if count == 0:
+                    raise ValueError(
+                        f"{file_path}: "
+                        "Could not find exact match for 'old_string'."
+                        " Please verify whitespace, indentation,"
+                        " and newlines match exactly."
+                    )
+                if count != expected_replacements:
+                    raise ValueError(
+                        f"Found {count} occurrence(s) of 'old_string', "
+                        f"but expected exactly {expected_replacements}."
+                    )
+
+                dst.flush()
+                os.fsync(dst.fileno())
+
+            # mkstemp の一時ファイルは 0600 で所有者も実行ユーザーなので、
+            # 元のファイルに揃える（chown で setuid などが落ちるので chmod は後）
+            st = os.stat(file_path)
+            if hasattr(os, "chown"):
+                try:
+                    os.chown(tmp_path, st.st_uid, st.st_gid)
+                except PermissionError:
+                    # 他人のファイルは root でなければ所有者を変えられない
+                    pass
+            os.chmod(tmp_path, st.st_mode & 0o7777)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        # 置き換え（リネーム）自体もディスクに書き出す
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(target_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return count
+
+    @staticmethod
+    def _replace_stream(
+        src, dst, old_string: str, new_string: str, expected_replacements: int
+    ) -> int:
+        """src を読みながら old_string を置き換えて dst に書き、数を返します。
 
+        str.replace と同じく、先頭から重ならないように置き換えます。
+        expected_replacements を超えたら、以降は書き込まずに数えるだけです。
+        """
+        count = 0
+        buf = ""
+        writing = True
+        while True:
+            chunk = src.read(STREAMING_CHUNK_SIZE)
+            buf += chunk
+            # ここより前で始まる一致は、buf の中に収まっている
+            safe = len(buf) - len(old_string) + 1 if chunk else len(buf)
+
+            pos = 0
+            while True:
+                i = buf.find(old_string, pos)
+                if i < 0 or i >= safe:
+                    break
+                count += 1
+                if count > expected_replacements:
+                    # 数が合わないことは確定したので、書き込みはやめる
+                    writing = False
+                if writing:
+                    dst.write(buf[pos:i])
+                    dst.write(new_string)
+                pos = i + len(old_string)
+
+            # 次のチャンクとつながるかもしれない末尾だけを持ち越す
+            cut = max(pos, safe)
+            if writing:
+                dst.write(buf[pos:cut])
+            buf = buf[cut:]
+            if not chunk:
+                return count
+
+
+if __name__ == "__main__":
     with tempfile.NamedTemporaryFile(
         "w", dir=".", delete=False, encoding="utf-8"
     ) as fp:
@@ -0,0 +1,95 @@
+"""GrepTool 用の検索結果キャッシュ。
+
+(pattern, include) ごとに、ファイル単位の検索結果とそのファイルの
+(mtime, size) を覚えておきます。同じ検索が繰り返されたときは、変更された
+ファイルだけを再検索して、残りはキャッシュの結果を使います。
+全体の使用量はおおよそのバイト数で管理し、上限を超えたら古いもの (LRU) から
+捨てます。
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 指紋 1件あたりの概算メモリ（dict のエントリ・パス文字列・タプル）
+FINGERPRINT_COST = 160
+
+
+@dataclass
+class CacheEntry:
+    """1つの検索についてのキャッシュ内容"""
+
+    # rel_path -> (mtime_ns, size)。マッチの無かったファイルも含む
+    fingerprints: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    # rel_path -> そのファイルの結果 (GrepResults)。マッチのあったファイルのみ
+    matches: Dict[str, object] = field(default_factory=dict)
+
+    def nbytes(self) -> int:
+        """おおよその使用メモリ量"""
+        return len(self.fingerprints) * FINGERPRINT_COST + sum(
+            m.nbytes() for m in self.matches.values()
+        )
+
+
+class ResultCache:
+    """
+    CacheEntry の LRU キャッシュです。max_bytes は概算の使用量の上限です。
+    hits / misses / evictions / rescanned_files で効き具合を確認できます。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[CacheEntry, int]]" = (
+            OrderedDict()
+        )
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rescanned_files = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key: Hashable, entry: CacheEntry) -> None:
+        self.discard(key)
+        size = entry.nbytes()
+        if size > self.max_bytes:
+            # 1件で上限を超えるものは覚えない
+            logger.debug(f"Result too large to cache: {size} bytes")
+            return
+        self._entries[key] = (entry, size)
+        self._total += size
+        while self._total > self.max_bytes:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self._total -= old_size
+            self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._total -= item[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._total = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rescanned_files": self.rescanned_files,
+        }
@@ -0,0 +1,221 @@
+"""プロジェクトのシンボル索引。
+
+対象ディレクトリ以下の Python ファイルを ast で解析し、クラス・関数ごとに
+名前・ファイル・行範囲を記録します。ReadFileTool はこれを使って、grep で
+定義を探してからファイルを読み直すことなく、定義の範囲だけを読みます。
+
+索引はファイルの (mtime, size) を見て差分更新され、変更のあったファイルは
+プロセスプールで並列に解析されます。索引は pickle 形式でディスクに保存
+できます。
+"""
+
+import ast
+import logging
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from index_store import load_index, save_index
+
+logger = logging.getLogger(__name__)
+
+# 索引フォーマットのバージョン（構造を変えたら上げる）
+INDEX_VERSION = 1
+
+# 索引の対象にする拡張子
+SOURCE_EXTENSIONS = (".py",)
+
+# 解析するファイルがこれより少なければ、プロセスプールを使わない
+MIN_PARALLEL_FILES = 32
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """クラス・関数の定義1つ分"""
+
+    # 入れ子を "." でつないだ名前 (例: "ReadFileTool.execute")
+    name: str
+    # "class" / "function"
+    kind: str
+    # 索引のルートからの相対パス
+    path: str
+    # 定義の範囲 (1-based, 両端を含む)。デコレータから本体の最後の行まで
+    start_line: int
+    end_line: int
+
+    @property
+    def short_name(self) -> str:
+        return self.name.rsplit(".", 1)[-1]
+
+
+def extract_symbols(source: bytes, rel_path: str) -> List[Symbol]:
+    """ソースコードからクラス・関数の定義を取り出します"""
+    tree = ast.parse(source, filename=rel_path)
+    symbols: List[Symbol] = []
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                kind = "class"
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "function"
+            else:
+                # if / try などの中の定義も拾う
+                visit(child, prefix)
+                continue
+
+            name = prefix + child.name
+            start = min(
+                [child.lineno] + [d.lineno for d in child.decorator_list]
+            )
+            symbols.append(
+                Symbol(name, kind, rel_path, start, child.end_lineno)
+            )
+            visit(child, name + ".")
+
+    visit(tree, "")
+    return symbols
+
+
+def _parse_file(
+    file_path: str, rel_path: str
+) -> Tuple[str, Optional[List[Symbol]]]:
+    """1ファイルを解析します（プロセスプールから呼ぶのでモジュール関数）"""
+    try:
+        with open(file_path, "rb") as f:
+            source = f.read()
+        # 無効なエスケープ ("\\d" など) の警告はファイルごとに出るので抑える
+        # （3.12 からは SyntaxWarning、それより前は DeprecationWarning）
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", SyntaxWarning)
+            warnings.simplefilter("ignore", DeprecationWarning)
+            return rel_path, extract_symbols(source, rel_path)
+    except (OSError, SyntaxError, ValueError, RecursionError) as e:
+        # 構文エラーのファイル（入れ子が深すぎて解析できないものを含む）は
+        # 空の結果として覚え、変更されたら再解析する
+        logger.debug(f"Failed to parse {file_path}: {e}")
+        return rel_path, None
+
+
+class SymbolIndex:
+    """
+    root_dir 以下の Python ファイルのシンボル索引を管理します。
+
+    exclusions には GrepTool の FileExclusions（walk を持つオブジェクト）を
+    渡します。index_path を指定すると索引をそこに保存・読み込みします
+    （None ならメモリ上のみ）。workers は解析に使うプロセス数です
+    （0 なら CPU 数）。
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        exclusions,
+        index_path: Optional[str] = None,
+        workers: int = 0,
+    ):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_path = (
+            os.path.abspath(index_path) if index_path is not None else None
+        )
+        self.exclusions = exclusions
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        # rel_path -> (mtime_ns, size, symbols)
+        # symbols が None のファイルは解析できなかったもの
+        self.files: Dict[str, Tuple[int, int, Optional[List[Symbol]]]] = {}
+        # 名前 (完全名と短い名前の両方) -> Symbol 一覧（メモリ上のみ）
+        self.by_name: Dict[str, List[Symbol]] = {}
+        self._load()
+
+    # --- 永続化 ---
+    def _load(self) -> None:
+        if self.index_path is None:
+            return
+        files = load_index(self.index_path, INDEX_VERSION, self.root_dir)
+        if files is None:
+            return
+        self.files = files
+        self._rebuild_names()
+
+    def save(self) -> None:
+        if self.index_path is None:
+            return
+        save_index(self.index_path, INDEX_VERSION, self.root_dir, self.files)
+
+    def _rebuild_names(self) -> None:
+        self.by_name = {}
+        for _, _, symbols in self.files.values():
+            for sym in symbols or ():
+                self.by_name.setdefault(sym.name, []).append(sym)
+                if sym.short_name != sym.name:
+                    self.by_name.setdefault(sym.short_name, []).append(sym)
+
+    # --- 差分更新 ---
+    def update(self) -> int:
+        """
+        ツリーを走査し、追加・変更・削除されたファイルだけ索引を更新します。
+        更新したファイル数を返します（変更があれば索引を保存します）。
+        """
+        seen = set()
+        stale: List[Tuple[str, str, os.stat_result]] = []
+
+        for root, files in self.exclusions.walk(self.root_dir):
+            for file in files:
+                if not file.endswith(SOURCE_EXTENSIONS):
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+
+                rel_path = os.path.relpath(file_path, self.root_dir)
+                seen.add(rel_path)
+                old = self.files.get(rel_path)
+                if old is None or old[:2] != (st.st_mtime_ns, st.st_size):
+                    stale.append((file_path, rel_path, st))
+
+        removed = [p for p in self.files if p not in seen]
+        for rel_path in removed:
+            del self.files[rel_path]
+
+        stats = {rel_path: st for _, rel_path, st in stale}
+        for rel_path, symbols in self._parse_all(stale):
+            st = stats[rel_path]
+            self.files[rel_path] = (st.st_mtime_ns, st.st_size, symbols)
+
+        changed = len(stale) + len(removed)
+        if changed:
+            logger.debug(f"Symbol index updated: {changed} file(s)")
+            self._rebuild_names()
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning(f"Failed to save index {self.index_path}: {e}")
+        return changed
+
+    def _parse_all(self, stale: List[Tuple[str, str, os.stat_result]]):
+        """変更のあったファイルを解析します（多ければプロセスプールで並列に）"""
+        paths = [file_path for file_path, _, _ in stale]
+        rel_paths = [rel_path for _, rel_path, _ in stale]
+        if self.workers <= 1 or len(stale) < MIN_PARALLEL_FILES:
+            return [_parse_file(p, r) for p, r in zip(paths, rel_paths)]
+
+        chunksize = max(len(stale) // (self.workers * 4), 1)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(
+                _parse_file, paths, rel_paths, chunksize=chunksize
+            )
+            return list(results)
+
+    # --- 検索 ---
+    def lookup(self, name: str) -> List[Symbol]:
+        """
+        名前に一致する定義を返します。"Class.method" のような完全名でも、
+        "method" のような短い名前でも引けます。
+        """
+        return sorted(
+            self.by_name.get(name, []), key=lambda s: (s.path, s.start_line)
+        )
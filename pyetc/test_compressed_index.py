@@ -0,0 +1,121 @@
+import gzip
+import io
+import lzma
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+import compressed_index
+from compressed_index import (
+    CompressedLineIndex,
+    GzipLineIndex,
+    XzLineIndex,
+)
+
+
+def _expected(data):
+    return io.TextIOWrapper(
+        io.BytesIO(data), encoding="utf-8", errors="replace"
+    ).readlines()
+
+
+def _check(path, data, rng):
+    expected = _expected(data)
+    index = CompressedLineIndex.build(str(path), os.stat(path))
+    assert index.line_count == len(expected)
+    for _ in range(40):
+        start = rng.randrange(0, len(expected) + 2)
+        count = rng.randrange(1, 30)
+        assert (
+            index.read_lines(str(path), start, count)
+            == expected[start : start + count]
+        )
+    return index
+
+
+# チェックポイントと読み込み単位を小さくして、境界を何度もまたがせる
+SMALL_CHUNKS = {
+    (compressed_index, "CHECKPOINT_SPAN"): 1000,
+    (compressed_index, "COMPRESSED_CHUNK_SIZE"): 257,
+    (compressed_index, "OUTPUT_CHUNK_SIZE"): 333,
+}
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        CompressedLineIndex(0, 0, 0, [0])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_gzip_single_member(tmp_path, seed, random_text):
+    rng = random.Random(seed)
+    data = random_text(rng, 500, 60, True)
+    path = tmp_path / "f.txt.gz"
+    path.write_bytes(gzip.compress(data))
+
+    index = _check(path, data, rng)
+    assert isinstance(index, GzipLineIndex)
+    assert len(index.states) > 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_gzip_multi_member(tmp_path, seed, random_text):
+    # メンバーを連結した gzip（ログのローテーションでよくある）
+    rng = random.Random(seed)
+    members = [
+        random_text(rng, rng.randrange(1, 200), 60, True) for _ in range(4)
+    ]
+    path = tmp_path / "f.txt.gz"
+    path.write_bytes(b"".join(gzip.compress(m) for m in members))
+
+    _check(path, b"".join(members), rng)
+
+
+def test_xz_single_block(tmp_path, random_text):
+    rng = random.Random(0)
+    data = random_text(rng, 500, 60, True)
+    path = tmp_path / "f.txt.xz"
+    path.write_bytes(lzma.compress(data))
+
+    index = _check(path, data, rng)
+    assert isinstance(index, XzLineIndex)
+    assert index.blocks is not None and len(index.blocks) == 1
+
+
+@pytest.mark.skipif(shutil.which("xz") is None, reason="xz is not installed")
+@pytest.mark.parametrize("seed", range(5))
+def test_xz_multi_block(tmp_path, seed, random_text):
+    rng = random.Random(seed)
+    data = random_text(rng, 500, 60, True)
+    # xz コマンドならブロックを分けて圧縮できる（lzma モジュールは1ブロック）
+    path = tmp_path / "f.txt.xz"
+    path.write_bytes(
+        subprocess.run(
+            ["xz", "-c", "--block-size=777"],
+            input=data,
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+    )
+
+    index = _check(path, data, rng)
+    assert index.blocks is not None and len(index.blocks) > 1
+
+
+@pytest.mark.skipif(shutil.which("xz") is None, reason="xz is not installed")
+def test_xz_crlf_split_across_blocks(tmp_path):
+    # ブロックの境界で \r\n が分かれる
+    data = b"x" * 9 + b"\r\n" + b"y\r\n" * 20
+    path = tmp_path / "f.txt.xz"
+    path.write_bytes(
+        subprocess.run(
+            ["xz", "-c", "--block-size=10"],
+            input=data,
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+    )
+    _check(path, data, random.Random(0))
@@ -0,0 +1,90 @@
+import os
+import time
+
+import pytest
+
+from dir_cache import DirCache
+
+
+def _names(cache, path):
+    return sorted(e.name for e in cache.list_dir(str(path)))
+
+
+def _eventually(check, timeout=5.0):
+    """inotify のイベントは別スレッドで届くので、少し待って確認する"""
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "poll"])
+def cache(request):
+    c = DirCache(use_inotify=request.param)
+    if request.param and c.mode != "inotify":
+        pytest.skip("inotify is not available")
+    yield c
+    c.close()
+
+
+def test_listing_follows_changes(cache, tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    assert _names(cache, tmp_path) == ["a.txt"]
+    assert _names(cache, tmp_path) == ["a.txt"]
+    assert cache.hits == 1
+
+    (tmp_path / "b.txt").write_text("b")
+    assert _eventually(lambda: _names(cache, tmp_path) == ["a.txt", "b.txt"])
+    os.remove(tmp_path / "a.txt")
+    assert _eventually(lambda: _names(cache, tmp_path) == ["b.txt"])
+
+
+def test_same_directory_through_symlink(cache, tmp_path):
+    real = tmp_path / "real"
+    real.mkdir()
+    link = tmp_path / "link"
+    link.symlink_to(real, target_is_directory=True)
+
+    assert _names(cache, real) == []
+    assert _names(cache, link) == []
+    # 片方を捨てても、もう片方の監視は残る
+    cache.invalidate(str(link))
+    assert _names(cache, link) == []
+
+    (real / "x.txt").write_text("x")
+    (real / "y.txt").write_text("y")
+    for path in (real, link):
+        assert _eventually(
+            lambda: _names(cache, path) == ["x.txt", "y.txt"]
+        ), path
+
+
+def test_change_during_concurrent_loads_is_not_cached(tmp_path, monkeypatch):
+    cache = DirCache(use_inotify=True)
+    if cache.mode != "inotify":
+        cache.close()
+        pytest.skip("inotify is not available")
+    path = str(tmp_path)
+    real_read = DirCache._read_dir
+    calls = []
+
+    def read_dir(dir_path, stat):
+        calls.append(dir_path)
+        entries = real_read(dir_path, stat)
+        if len(calls) == 1:
+            # 1つ目の読み込みの途中で、2つ目の読み込みが始まって終わる
+            cache.list_dir(dir_path)
+        elif len(calls) == 2:
+            # 2つ目の読み込み中 (= 1つ目の読み込み中) に変更が届く
+            cache._on_change(dir_path)
+        return entries
+
+    monkeypatch.setattr(DirCache, "_read_dir", staticmethod(read_dir))
+    try:
+        cache.list_dir(path)
+        assert path not in cache._entries
+        assert cache._loading == {}
+    finally:
+        cache.close()
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from grep import FileExclusions, GrepTool
+
+
+@pytest.fixture
+def tree(make_tree):
+    # 中身によるバイナリ判定は Python Fallback の除外処理で行う
+    return make_tree(
+        {
+            "blob": b"needle\0\x01\x02 binary\n",
+            "data.dat": "needle in ユーティーエフ\n",
+            "notes": "needle\n",
+            # cp932 のテキスト（UTF-8 としては読めないが、制御文字は無い）
+            "sjis.txt": "needle 日本語\n".encode("cp932"),
+        },
+        "python",
+    )
+
+
+def test_binary_files_are_skipped_by_content(tree):
+    found = sorted(m.file_path for m in GrepTool(str(tree)).execute("needle"))
+    assert found == ["data.dat", "notes", "sjis.txt"]
+
+
+def test_sniff_can_be_disabled(tree):
+    tool = GrepTool(str(tree))
+    tool.exclusions.sniff_binary = False
+    assert "blob" in {m.file_path for m in tool.execute("needle")}
+
+
+def test_sniff_result_is_reused_per_fingerprint(tree):
+    exclusions = FileExclusions()
+    path = str(tree / "notes")
+    assert not exclusions.is_binary(path)
+
+    # 大きさと mtime が同じなら、中身を読み直さずに前回の判定を使う
+    st = os.stat(path)
+    with open(path, "r+b") as f:
+        f.write(b"\0")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert not exclusions.is_binary(path)
+    assert len(exclusions._binary_cache) == 1
+
+    # 変更されたら判定し直す
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert exclusions.is_binary(path)
+    assert len(exclusions._binary_cache) == 2
+
+
+def test_sniff_does_not_reopen_cached_files(tree, monkeypatch):
+    exclusions = FileExclusions()
+    path = str(tree / "blob")
+    assert exclusions.is_binary(path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file was opened again")
+
+    monkeypatch.setattr("builtins.open", fail)
+    assert exclusions.is_binary(path)
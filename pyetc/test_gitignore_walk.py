@@ -0,0 +1,109 @@
+import os
+import subprocess
+
+import pytest
+
+from config import Config
+from dir_cache import DirCache
+from file_glob import FileGlobTool
+from get_gitignore import GitIgnoreTree
+from grep import FileExclusions, GrepTool
+
+FILES = [
+    "a.py",
+    "a.log",
+    "keep.log",
+    "src/a.py",
+    "src/b.txt",
+    "src/deep/c.txt",
+    "src/deep/c.log",
+    "docs/x.md",
+    "docs/sub/y.md",
+    "tmp/t.txt",
+    "lib/tmp/u.txt",
+    "lib/v.txt",
+    "out/w.txt",
+    "n[1].txt",
+]
+
+GITIGNORES = {
+    "whitelist": {".gitignore": "/*\n!/src/\n!.gitignore\n"},
+    "negated_file": {".gitignore": "*.log\n!keep.log\n"},
+    "anchored_glob": {".gitignore": "/*.txt\ndocs/*.md\n"},
+    "dir_only": {".gitignore": "tmp/\n/out/\n"},
+    "double_star": {".gitignore": "**/deep/*.log\ndocs/**\n!docs/x.md\n"},
+    "nested": {".gitignore": "*.txt\n", "src/.gitignore": "!b.txt\n"},
+    "bracket": {".gitignore": "n[[]1].txt\n[ab].py\n"},
+}
+
+
+def _git_files(tree):
+    out = subprocess.run(
+        ["git", "ls-files", "--cached", "--others", "--exclude-standard"],
+        cwd=tree,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return sorted(out.splitlines())
+
+
+def _walk_files(tree):
+    found = []
+    for root, files in FileExclusions().walk(str(tree)):
+        for f in files:
+            rel = os.path.relpath(os.path.join(root, f), tree)
+            found.append(rel.replace(os.sep, "/"))
+    return sorted(found)
+
+
+def _make_tree(make_tree, name):
+    files = {rel: "needle\n" for rel in FILES}
+    files.update(GITIGNORES[name])
+    return make_tree(files, "git")
+
+
+@pytest.mark.parametrize("name", sorted(GITIGNORES))
+def test_walk_matches_git(make_tree, name):
+    tree = _make_tree(make_tree, name)
+    assert _walk_files(tree) == _git_files(tree)
+
+
+@pytest.mark.parametrize("name", sorted(GITIGNORES))
+def test_gitignore_tree_matches_git(make_tree, name):
+    tree = _make_tree(make_tree, name)
+    gitignore = GitIgnoreTree(str(tree))
+    kept = [
+        rel
+        for rel in FILES + list(GITIGNORES[name])
+        if not gitignore.is_ignored(str(tree / rel))
+    ]
+    assert sorted(kept) == _git_files(tree)
+
+
+@pytest.mark.parametrize("name", sorted(GITIGNORES))
+@pytest.mark.parametrize("cached", [False, True])
+def test_file_glob_matches_git(make_tree, name, cached):
+    tree = _make_tree(make_tree, name)
+    tool = FileGlobTool(Config(str(tree)), DirCache() if cached else None)
+    found = [
+        p.replace(os.sep, "/") for p in tool.execute("*", root_path=str(tree))
+    ]
+    # glob の * は "." で始まる名前 (.gitignore) にマッチしない
+    expected = [
+        p for p in _git_files(tree) if not os.path.basename(p).startswith(".")
+    ]
+    assert sorted(found) == expected
+
+
+def test_python_fallback_respects_whitelist(make_tree):
+    tree = make_tree(
+        {
+            "src/a.py": "needle\n",
+            "b.py": "needle\n",
+            ".gitignore": "/*\n!/src/\n",
+        }
+    )
+    tool = GrepTool(str(tree))
+    found = tool._python_fallback("needle", None)
+    assert [m.file_path for m in found] == [os.path.join("src", "a.py")]
@@ -0,0 +1,19 @@
+import pytest
+
+from grep_bench import percentile
+
+
+@pytest.mark.parametrize(
+    "values, p, expected",
+    [
+        ([5, 1, 4, 2, 3], 50, 3),
+        ([1, 2, 3, 4], 50, 2),
+        ([1, 2, 3, 4, 5], 95, 5),
+        ([1, 2, 3, 4, 5], 0, 1),
+        ([1, 2, 3, 4, 5], 100, 5),
+        ([7], 50, 7),
+        (list(range(1, 101)), 95, 95),
+    ],
+)
+def test_percentile_nearest_rank(values, p, expected):
+    assert percentile(values, p) == expected
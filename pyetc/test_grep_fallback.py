@@ -0,0 +1,107 @@
+import pytest
+
+import grep
+from grep import GrepTool
+from pattern_analyzer import is_width_sensitive
+
+CONTENTS = {
+    "lf.txt": "class GrepTool:\nab \nab\nend$\nfoo bar\n",
+    "crlf.txt": "alpha\r\nend\r\nclass CrlfTool\r\nfoo\r\n",
+    "cr.txt": "a\rb\rc\rclass CrTool\rfiller\r" + "x\n" * 100 + "end\r",
+    "utf8.txt": "Ärger\närger über\nxあy\nwort_ü\nclass ÜTool\nxあいy\nあいうえ\n",
+    "mixed.txt": "one\ntwo\rthree\r\nclass MixedTool\n",
+}
+
+PATTERNS = [
+    "class .*Tool",
+    "ärger",
+    "ab\\s",
+    "end$",
+    "^end",
+    "x.y",
+    "x[^a]y",
+    "wort_\\w",
+    "r\\b",
+    "\\Aclass",
+    "foo",
+    "Tool\\Z",
+    "\\xc4rger",
+    "x.*y",
+    "x.+y",
+    "x.?y",
+    "x.{1}y",
+    "x.{2,}y",
+    "x[^a]+y",
+    "x[^a]*?y",
+    "([a-z]+_)+\\w",
+    "^.{4}$",
+    "wort_[a-z]",
+]
+
+
+@pytest.fixture
+def tree(make_tree):
+    return make_tree({k: v.encode("utf-8") for k, v in CONTENTS.items()})
+
+
+def _search(tree, pattern, **kwargs):
+    tool = GrepTool(str(tree), **kwargs)
+    files = sorted(CONTENTS)
+    return sorted(
+        (m.file_path, m.line_number, m.line_content)
+        for m in tool._python_fallback(pattern, None, files)
+    )
+
+
+def _baseline(tree, pattern):
+    """行単位の str 検索 (元の Python Fallback と同じ動作)"""
+    import re
+
+    regex = re.compile(pattern, re.IGNORECASE)
+    rows = []
+    for name in sorted(CONTENTS):
+        with open(tree / name, encoding="utf-8", errors="ignore") as f:
+            for i, line in enumerate(f):
+                if regex.search(line):
+                    rows.append((name, i + 1, line.strip()))
+    return sorted(rows)
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_python_fallback_matches_line_search(
+    tree, pattern, use_mmap, monkeypatch
+):
+    if use_mmap:
+        # 必須リテラルのあるパターンも、先読みフィルタではなく mmap で検索する
+        monkeypatch.setattr(grep, "MAX_PREFILTER_READ_SIZE", -1)
+    assert _search(tree, pattern, use_mmap=use_mmap) == _baseline(
+        tree, pattern
+    )
+
+
+def test_cr_only_line_numbers(tree):
+    rows = _search(tree, "class CrTool")
+    assert rows == [("cr.txt", 4, "class CrTool")]
+    assert _search(tree, "^end") == _baseline(tree, "^end")
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("class .*Tool", False),
+        ("foo\\.bar", False),
+        ("x[^a]+y", False),
+        ("[.]", False),
+        ("x.y", True),
+        ("x.{2}y", True),
+        ("x[^a]y", True),
+        ("wort_\\w", True),
+        ("[\\d,]+", True),
+        ("r\\b", True),
+        ("(a|b.c)", True),
+    ],
+)
+def test_width_sensitive(pattern, expected):
+    # mmap 検索で ASCII 以外の文字を含むファイルを str で読み直すかどうか
+    assert is_width_sensitive(pattern) is expected
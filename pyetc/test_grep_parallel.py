@@ -0,0 +1,57 @@
+import os
+import random
+
+import pytest
+
+from grep import GrepTool, _balance_by_size
+
+
+@pytest.fixture
+def tree(make_tree):
+    # 外部コマンドを使わせず、Python Fallback を逐次・並列で比べる
+    rng = random.Random(0)
+    files = {}
+    for i in range(60):
+        lines = [
+            rng.choice(["needle here", "hay", "x needle y", "other"])
+            for _ in range(rng.randrange(1, 400))
+        ]
+        files[f"d{i % 4}/s{i % 3}/f{i}.txt"] = "\n".join(lines) + "\n"
+    return make_tree(files, "python")
+
+
+def _rows(results):
+    return [(m.file_path, m.line_number, m.line_content) for m in results]
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+@pytest.mark.parametrize("timeout", [None, 60])
+def test_parallel_matches_serial(tree, use_mmap, timeout):
+    serial = GrepTool(str(tree), use_mmap=use_mmap)
+    parallel = GrepTool(
+        str(tree), workers=3, use_mmap=use_mmap, timeout=timeout
+    )
+
+    expected = _rows(serial.execute("needle"))
+    assert len(expected) > 1000
+    assert _rows(parallel.execute("needle")) == expected
+    assert parallel.execute_count("needle") == serial.execute_count("needle")
+    assert parallel.execute_files_with_matches(
+        "needle"
+    ) == serial.execute_files_with_matches("needle")
+
+
+def test_balance_by_size_keeps_every_file_once(tree):
+    paths = [
+        os.path.join(root, f)
+        for root, _, files in os.walk(tree)
+        for f in files
+    ]
+    bins = _balance_by_size(paths, 7)
+    assert len(bins) == 7
+    assert sorted(p for b in bins for p in b) == sorted(paths)
+
+    totals = [sum(os.path.getsize(p) for p in b) for b in bins]
+    largest = max(os.path.getsize(p) for p in paths)
+    # LPT なので、ビンの合計の差は最大のファイル1つ分を超えない
+    assert max(totals) - min(totals) <= largest
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from grep import GrepMatch, GrepResults
+
+
+def _matches(n, seed=0):
+    rng = random.Random(seed)
+    paths = [f"d{i % 5}/f{i}.txt" for i in range(40)]
+    return [
+        GrepMatch(
+            file_path=rng.choice(paths),
+            line_number=rng.randrange(1, 10**6),
+            line_content="".join(
+                rng.choice("abc あい\t") for _ in range(rng.randrange(0, 30))
+            ),
+        )
+        for _ in range(n)
+    ]
+
+
+def test_iteration_keeps_insertion_order():
+    matches = _matches(500)
+    results = GrepResults(matches)
+    assert len(results) == 500
+    assert list(results) == matches
+    assert results.files() == list(dict.fromkeys(m.file_path for m in matches))
+
+
+def test_empty():
+    results = GrepResults()
+    assert len(results) == 0
+    assert list(results) == []
+    assert results[:] == []
+    with pytest.raises(IndexError):
+        results[0]
+
+
+def test_indexing_and_slicing_match_list():
+    matches = _matches(100)
+    results = GrepResults(matches)
+    for i in [0, 1, 50, 99, -1, -100]:
+        assert results[i] == matches[i]
+    for bad in [100, -101]:
+        with pytest.raises(IndexError):
+            results[bad]
+    for s in [
+        slice(None),
+        slice(10, 20),
+        slice(-5, None),
+        slice(None, None, 3),
+        slice(90, 10, -7),
+        slice(200, 300),
+    ]:
+        assert results[s] == matches[s]
+
+
+def test_append_and_extend_round_trip():
+    matches = _matches(300)
+    results = GrepResults()
+    for m in matches[:100]:
+        results.append(m)
+    results.extend(matches[100:200])
+    # GrepResults 同士の連結は列ごとに行う（パス番号の振り直しがある）
+    results.extend(GrepResults(matches[200:]))
+    assert list(results) == matches
+    assert list(GrepResults(results)) == matches
+
+
+def test_sort_orders_by_file_then_line():
+    matches = _matches(300)
+    results = GrepResults(matches)
+    results.sort()
+    assert list(results) == sorted(
+        matches, key=lambda m: (m.file_path, m.line_number)
+    )
+
+    # file_order を渡すとその順にファイルを並べる
+    paths = sorted({m.file_path for m in matches}, reverse=True)
+    order = {p: i for i, p in enumerate(paths)}
+    results.sort(order)
+    assert list(results) == sorted(
+        matches, key=lambda m: (order[m.file_path], m.line_number)
+    )
+
+
+def test_large_result_set():
+    n = 200_000
+    results = GrepResults()
+    for i in range(n):
+        results.add(f"f{i % 7}.txt", i + 1, f"line {i}")
+    assert len(results) == n
+    assert len(results.files()) == 7
+    assert results[-1] == GrepMatch(f"f{(n - 1) % 7}.txt", n, f"line {n - 1}")
+    assert results[123_456].line_content == "line 123456"
+    assert sum(1 for _ in results) == n
+    # 1件ごとの GrepMatch よりずっと小さい
+    assert results.nbytes() < n * 40
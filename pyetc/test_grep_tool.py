@@ -0,0 +1,88 @@
+import pytest
+
+from grep import GrepTool
+
+
+@pytest.fixture(params=["git", "plain"])
+def tree(make_tree, request):
+    return make_tree(
+        {f"f{i}.txt": "hit\nmiss\nhit\n" for i in range(3)}, request.param
+    )
+
+
+@pytest.mark.parametrize("max_results", [0, 1, 4])
+def test_stream_max_results(tree, max_results):
+    tool = GrepTool(str(tree))
+    matches = list(tool.execute_stream("hit", max_results=max_results))
+    assert len(matches) == max_results
+
+
+def test_stream_max_per_file(tree):
+    tool = GrepTool(str(tree))
+    matches = list(tool.execute_stream("hit", max_per_file=1))
+    assert len(matches) == 3
+
+
+RISKY = "(a+)+$"
+
+
+@pytest.fixture
+def python_only(make_tree):
+    """外部コマンドが無い環境と同じく、Python Fallback で検索させる"""
+    return make_tree(
+        {"slow.txt": "a" * 40 + "!\n", "hit.txt": "needle\nx\nneeedle\n"},
+        "python",
+    )
+
+
+@pytest.mark.parametrize(
+    "run",
+    [
+        lambda t: t.execute(RISKY),
+        lambda t: t.execute_count(RISKY),
+        lambda t: t.execute_files_with_matches(RISKY),
+        lambda t: list(t.execute_stream(RISKY)),
+        lambda t: t.execute_many(["needle", RISKY]),
+    ],
+    ids=["execute", "count", "files", "stream", "many"],
+)
+def test_risky_pattern_rejected_without_timeout(python_only, run):
+    with pytest.raises(ValueError, match="rejected"):
+        run(GrepTool(str(python_only)))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_risky_pattern_runs_with_deadline(python_only, workers):
+    tool = GrepTool(str(python_only), timeout=0.5, workers=workers)
+    assert tool.execute(RISKY).timed_out
+    assert "slow.txt" not in tool.execute_count(RISKY)
+    assert "slow.txt" not in tool.execute_files_with_matches(RISKY)
+    assert list(tool.execute_stream(RISKY, max_results=1)) == []
+
+
+def test_many_merges_deadline_results(python_only):
+    tool = GrepTool(str(python_only), timeout=5)
+    found = [
+        (m.file_path, m.line_number, m.pattern)
+        for m in tool.execute_many(["needle", "n(e+)+dle", "x"])
+    ]
+    assert found == [
+        ("hit.txt", 1, "needle"),
+        ("hit.txt", 1, "n(e+)+dle"),
+        ("hit.txt", 2, "x"),
+        ("hit.txt", 3, "n(e+)+dle"),
+    ]
+
+
+def test_unambiguous_nesting_runs_without_timeout(python_only):
+    # 回の区切りが一意に決まる入れ子は拒否しない
+    (python_only / "dotted.txt").write_text("a.b.c\n1,2,3\n")
+    tool = GrepTool(str(python_only))
+    assert [m.line_number for m in tool.execute(r"(\w+\.)+\w+")] == [1]
+    assert [m.line_number for m in tool.execute(r"(\d+,)*\d+")] == [2]
+
+
+def test_python_counts(python_only):
+    tool = GrepTool(str(python_only))
+    assert tool.execute_count("ne+dle") == {"hit.txt": 2}
+    assert tool.execute_files_with_matches("ne+dle") == ["hit.txt"]
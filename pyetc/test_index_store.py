@@ -0,0 +1,25 @@
+import pytest
+
+from index_store import load_index, save_index
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "index")
+    files = {"a.py": (1, 2, ["x"]), "b.py": (3, 4, None)}
+    save_index(path, 1, "/root", files)
+    assert load_index(path, 1, "/root") == files
+    assert not (tmp_path / "index.tmp").exists()
+
+
+@pytest.mark.parametrize("version, root_dir", [(2, "/root"), (1, "/other")])
+def test_stale_index_is_ignored(tmp_path, version, root_dir):
+    path = str(tmp_path / "index")
+    save_index(path, 1, "/root", {"a.py": (1, 2, None)})
+    assert load_index(path, version, root_dir) is None
+
+
+def test_missing_or_broken_index(tmp_path):
+    path = tmp_path / "index"
+    assert load_index(str(path), 1, "/root") is None
+    path.write_bytes(b"not a pickle")
+    assert load_index(str(path), 1, "/root") is None
@@ -0,0 +1,110 @@
+import os
+import random
+
+import pytest
+
+import line_index
+from line_index import LineIndex, LineIndexCache
+
+
+def _expected(path):
+    with open(path, encoding="utf-8", errors="replace", newline=None) as f:
+        return f.readlines()
+
+
+# チェックポイントとチャンク境界を小さなファイルでも何度もまたぐようにする
+SMALL_CHUNKS = {
+    (line_index, "CHECKPOINT_INTERVAL"): 97,
+    (line_index, "READ_CHUNK_SIZE"): 61,
+}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_read_lines_matches_text_mode(tmp_path, seed, random_text):
+    rng = random.Random(seed)
+    path = tmp_path / "f.txt"
+    path.write_bytes(random_text(rng, rng.randrange(0, 300)))
+    expected = _expected(path)
+
+    index = LineIndex.build(str(path), os.stat(path))
+    assert index.line_count == len(expected)
+    for _ in range(30):
+        start = rng.randrange(0, len(expected) + 2)
+        count = rng.randrange(1, 20)
+        assert (
+            index.read_lines(str(path), start, count)
+            == expected[start : start + count]
+        )
+
+
+def test_crlf_split_across_chunks(tmp_path):
+    # \r\n がチャンク境界 (61 バイト目) でちょうど分かれる
+    path = tmp_path / "f.txt"
+    path.write_bytes(b"x" * 60 + b"\r\n" + b"y\r\n" * 100)
+    index = LineIndex.build(str(path), os.stat(path))
+    assert index.line_count == len(_expected(path))
+    assert index.read_lines(str(path), 50, 5) == _expected(path)[50:55]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_extend_matches_fresh_build(tmp_path, seed, random_text):
+    rng = random.Random(seed)
+    path = tmp_path / "log.txt"
+    path.write_bytes(random_text(rng, 200))
+    old = LineIndex.build(str(path), os.stat(path))
+
+    with open(path, "ab") as f:
+        f.write(random_text(rng, 200))
+    st = os.stat(path)
+    extended = old.extend(str(path), st)
+    fresh = LineIndex.build(str(path), st)
+
+    assert extended is not None
+    assert extended.line_count == fresh.line_count == len(_expected(path))
+    expected = _expected(path)
+    for start in range(0, len(expected), 7):
+        assert (
+            extended.read_lines(str(path), start, 7)
+            == expected[start : start + 7]
+        )
+
+
+def test_extend_rejects_rewritten_file(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_bytes(b"a\nb\n")
+    old = LineIndex.build(str(path), os.stat(path))
+    with open(path, "r+b") as f:
+        f.write(b"X")
+        f.seek(0, os.SEEK_END)
+        f.write(b"c\n")
+    assert old.extend(str(path), os.stat(path)) is None
+
+
+def test_sidecar_round_trip(tmp_path, random_text):
+    rng = random.Random(0)
+    path = tmp_path / "f.txt"
+    path.write_bytes(random_text(rng, 300))
+    st = os.stat(path)
+    index = LineIndex.build(str(path), st)
+    sidecar = str(path) + line_index.SIDECAR_SUFFIX
+    index.save(sidecar)
+
+    loaded = LineIndex.load(sidecar)
+    assert loaded is not None and loaded.matches(st)
+    assert loaded.line_count == index.line_count
+    assert list(loaded.offsets) == list(index.offsets)
+    assert loaded.read_lines(str(path), 10, 50) == _expected(path)[10:60]
+
+
+def test_cache_rebuilds_on_change(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_bytes(b"a\nb\n")
+    cache = LineIndexCache()
+    assert cache.get(str(path), os.stat(path)).line_count == 2
+    assert cache.get(str(path), os.stat(path)).line_count == 2
+    assert cache.hits == 1
+
+    path.write_bytes(b"only one line")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert cache.get(str(path), os.stat(path)).line_count == 1
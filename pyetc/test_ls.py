@@ -0,0 +1,200 @@
+import os
+
+import pytest
+
+import ls
+from ls import LsTool
+
+TREE = [
+    "a.txt",
+    "B.md",
+    "d1/x.txt",
+    "d1/sub/y.txt",
+    "d1/sub/deeper/z.txt",
+    "d2/w.txt",
+]
+
+
+@pytest.fixture
+def tree(make_tree):
+    return make_tree({rel: "x" * len(rel) for rel in TREE})
+
+
+def _names(result):
+    """content から、表示されたエントリの名前を順に取り出す"""
+    names = []
+    for line in result["content"].splitlines()[1:]:
+        if not line:
+            break
+        names.append(line.replace("[DIR] ", "", 1))
+    return names
+
+
+def test_listing_matches_os_listdir(tree):
+    result = LsTool(str(tree)).execute(".")
+    assert sorted(_names(result)) == sorted(os.listdir(tree))
+    # ディレクトリが先、名前は大文字小文字を区別せずに並べる
+    assert _names(result) == ["d1", "d2", "a.txt", "B.md"]
+    assert "[DIR] d1" in result["content"]
+
+
+@pytest.mark.parametrize(
+    "max_depth, expected",
+    [
+        (1, ["d1", "d2", "a.txt", "B.md"]),
+        (2, ["d1", "d1/sub", "d1/x.txt", "d2", "d2/w.txt", "a.txt", "B.md"]),
+        (
+            None,
+            [
+                "d1",
+                "d1/sub",
+                "d1/sub/deeper",
+                "d1/sub/deeper/z.txt",
+                "d1/sub/y.txt",
+                "d1/x.txt",
+                "d2",
+                "d2/w.txt",
+                "a.txt",
+                "B.md",
+            ],
+        ),
+    ],
+)
+def test_recursive_respects_max_depth(tree, max_depth, expected):
+    result = LsTool(str(tree)).execute(
+        ".", recursive=True, max_depth=max_depth
+    )
+    assert _names(result) == expected
+    assert result["total"] == len(expected)
+
+
+def test_recursive_does_not_follow_symlinks(tree):
+    (tree / "loop").symlink_to(tree, target_is_directory=True)
+    names = _names(LsTool(str(tree)).execute(".", recursive=True))
+    assert "loop" in names
+    assert not any(n.startswith("loop/") for n in names)
+
+
+@pytest.fixture
+def big_dir(tmp_path):
+    # サイズと mtime に重複を作り、名前による順序付けも確かめる
+    for i in range(200):
+        path = tmp_path / f"f{i:03d}.txt"
+        path.write_bytes(b"x" * (i * 7 % 23))
+        os.utime(path, ns=(0, (i * 11 % 37) * 1_000_000_000))
+    for i in range(5):
+        (tmp_path / f"dir{i}").mkdir()
+    return tmp_path
+
+
+@pytest.mark.parametrize("sort_by", ["name", "size", "mtime"])
+@pytest.mark.parametrize(
+    "offset, limit", [(0, 1), (0, 50), (30, 20), (190, 50)]
+)
+def test_top_k_page_matches_full_sort(big_dir, sort_by, offset, limit):
+    tool = LsTool(str(big_dir))
+    full = _names(tool.execute(".", sort_by=sort_by))
+    assert len(full) == 205
+    page = tool.execute(".", sort_by=sort_by, offset=offset, limit=limit)
+    assert _names(page) == full[offset : offset + limit]
+    assert page["total"] == 205
+    assert page["count"] == len(full[offset : offset + limit])
+
+
+@pytest.mark.parametrize("offset", [205, 1000])
+@pytest.mark.parametrize("limit", [None, 10])
+def test_offset_past_the_end(big_dir, offset, limit):
+    result = LsTool(str(big_dir)).execute(".", offset=offset, limit=limit)
+    assert _names(result) == []
+    assert result["count"] == 0
+    assert result["total"] == 205
+    assert "(showing none of 205 entries)" in result["content"]
+
+
+def test_limit_zero(big_dir):
+    result = LsTool(str(big_dir)).execute(".", offset=3, limit=0)
+    assert _names(result) == []
+    assert result["count"] == 0
+    assert result["total"] == 205
+
+
+def test_stream_matches_execute(big_dir):
+    tool = LsTool(str(big_dir))
+    kwargs = dict(sort_by="mtime", offset=10, limit=25)
+    lines = list(tool.execute_stream(".", **kwargs))
+    assert "\n".join(lines) == tool.execute(".", **kwargs)["content"]
+    assert "(showing 11-35 of 205 entries)" in lines
+
+
+def test_size_and_mtime_orders(big_dir):
+    tool = LsTool(str(big_dir))
+    names = os.listdir(big_dir)
+    stats = {n: os.stat(big_dir / n) for n in names}
+    size = {
+        n: 0 if (big_dir / n).is_dir() else stats[n].st_size for n in names
+    }
+    assert _names(tool.execute(".", sort_by="size")) == sorted(
+        names, key=lambda n: (-size[n], n.lower())
+    )
+    assert _names(tool.execute(".", sort_by="mtime")) == sorted(
+        names, key=lambda n: (-stats[n].st_mtime, n.lower())
+    )
+
+
+def _gitignore_tree(make_tree, gitignore):
+    files = {
+        rel: "x"
+        for rel in [
+            "a.log",
+            "keep.log",
+            "a/b.txt",
+            "a/b/c.txt",
+            "a/b/d.log",
+            "build/out.txt",
+        ]
+    }
+    files[".gitignore"] = gitignore
+    return make_tree(files)
+
+
+def test_negated_pattern_is_honoured(make_tree):
+    tree = _gitignore_tree(make_tree, "*.log\n!keep.log\nbuild/\n")
+    result = LsTool(str(tree)).execute(".", recursive=True)
+    names = _names(result)
+    assert "keep.log" in names
+    assert "a.log" not in names
+    assert "a/b/d.log" not in names
+    assert "build" not in names
+    assert result["ignored"] == 3
+
+
+def test_slash_pattern_does_not_cross_directories(make_tree):
+    tree = _gitignore_tree(make_tree, "a/*.txt\n")
+    names = _names(LsTool(str(tree)).execute(".", recursive=True))
+    # a/*.txt は .gitignore からの相対パスで、* は / をまたがない
+    assert "a/b.txt" not in names
+    assert "a/b/c.txt" in names
+
+
+def test_parent_gitignore_is_read(make_tree):
+    tree = _gitignore_tree(make_tree, "*.log\n!keep.log\n")
+    (tree / ".git").mkdir()
+    names = _names(LsTool(str(tree / "a")).execute(".", recursive=True))
+    assert names == ["b", "b/c.txt", "b.txt"]
+
+
+def test_aggregate_sizes(tree):
+    result = LsTool(str(tree)).execute(".", aggregate_sizes=True)
+    lines = result["content"].splitlines()
+    size = sum(len(rel) for rel in TREE if rel.startswith("d1/"))
+    assert f"[DIR] d1  ({size} B, 3 files)" in lines
+
+
+def test_size_cache_is_bounded(tree, monkeypatch):
+    monkeypatch.setattr(ls, "SIZE_CACHE_SIZE", 2)
+    tool = LsTool(str(tree))
+    first = tool.execute(".", aggregate_sizes=True)
+    assert len(tool._size_cache) == 2
+    # 捨てられたディレクトリは読み直すので、結果は変わらない
+    assert tool.execute(".", aggregate_sizes=True) == first
+    assert len(tool._size_cache) == 2
@@ -0,0 +1,39 @@
+import pytest
+
+from pattern_analyzer import find_risky_construct
+
+AMBIGUOUS = [
+    "(a+)+$",
+    "n(e+)+dle",
+    "(\\s*x*)*",
+    "(\\w+\\s?)+$",
+    "(.*a)+",
+    "(x+x+)+y",
+    "(a+|b)+",
+    "((a+))+",
+    "(?:A+a)+",
+    "(?:ぁ+[ぁ-ん])+",
+]
+
+UNAMBIGUOUS = [
+    "(\\w+\\.)+\\w+",
+    "(\\d+,)*\\d+",
+    "(?:[a-z]+_)+id",
+    "(x{2,3})+",
+    "(ne+)+dle",
+    "(\\w+\\s)+",
+    "[a-z]+(?:-[a-z]+)*",
+    "(?>a+)+",
+    "(a++)+",
+    "class .*Tool",
+]
+
+
+@pytest.mark.parametrize("pattern", AMBIGUOUS)
+def test_ambiguous_nesting_is_risky(pattern):
+    assert find_risky_construct(pattern) is not None
+
+
+@pytest.mark.parametrize("pattern", UNAMBIGUOUS)
+def test_unambiguous_nesting_is_not_risky(pattern):
+    assert find_risky_construct(pattern) is None
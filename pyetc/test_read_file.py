@@ -0,0 +1,176 @@
+import os
+import time
+
+import pytest
+
+import line_index
+from read_file import Config, ReadFileTool
+
+# 末尾からの読み戻しが何ブロックにもまたがるようにする
+SMALL_CHUNKS = {(line_index, "TAIL_BLOCK_SIZE"): 16}
+
+
+def _tool(tmp_path):
+    return ReadFileTool(Config(str(tmp_path)))
+
+
+def _write(tmp_path, data):
+    (tmp_path / "log.txt").write_bytes(data)
+    return "log.txt"
+
+
+def _body(result):
+    """切り捨ての案内を除いた本文"""
+    return result["content"].split("--- FILE CONTENT (truncated) ---")[-1]
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"])
+def test_tail_returns_last_lines_with_numbers(tmp_path, newline):
+    lines = [f"line {i}".encode() for i in range(1, 101)]
+    name = _write(tmp_path, newline.join(lines) + newline)
+
+    result = _tool(tmp_path).execute_tail(name, limit=3)
+    assert result["lines_shown"] == (98, 100)
+    assert result["total_lines"] == 100
+    assert _body(result) == "line 98\nline 99\nline 100\n"
+    assert "use offset=94 and limit=3" in result["content"]
+
+
+def test_tail_without_trailing_newline(tmp_path):
+    name = _write(tmp_path, b"one\ntwo\nthree")
+    result = _tool(tmp_path).execute_tail(name, limit=2)
+    assert result["lines_shown"] == (2, 3)
+    assert _body(result) == "two\nthree"
+
+
+def test_tail_larger_than_file(tmp_path):
+    name = _write(tmp_path, b"one\ntwo\n")
+    result = _tool(tmp_path).execute_tail(name, limit=50)
+    # 全部読めたので切り捨ての案内は付かない
+    assert result == {
+        "content": "one\ntwo\n",
+        "lines_shown": (1, 2),
+        "total_lines": 2,
+    }
+
+
+def test_tail_of_empty_file(tmp_path):
+    name = _write(tmp_path, b"")
+    result = _tool(tmp_path).execute_tail(name, limit=5)
+    assert result == {"content": "", "lines_shown": (0, 0), "total_lines": 0}
+
+
+def test_tail_rejects_bad_limit(tmp_path):
+    name = _write(tmp_path, b"x\n")
+    assert "error" in _tool(tmp_path).execute_tail(name, limit=0)
+    assert "error" in _tool(tmp_path).execute_tail("../outside", limit=1)
+
+
+def test_follow_picks_up_appended_lines(tmp_path):
+    tool = _tool(tmp_path)
+    name = _write(tmp_path, b"a\nb\n")
+
+    first = tool.execute_follow(name)
+    assert first["content"] == "a\nb\n"
+    assert first["lines_shown"] == (1, 2)
+    assert first["next_offset"] == 4
+
+    none = tool.execute_follow(name, first["next_offset"])
+    assert none["content"] == ""
+    assert none["next_offset"] == 4
+
+    with open(tmp_path / name, "ab") as f:
+        f.write(b"c\nd\npartial")
+    more = tool.execute_follow(name, first["next_offset"])
+    # 改行で終わっていない最後の行は、書き終わるまで返さない
+    assert more["content"] == "c\nd\n"
+    assert more["lines_shown"] == (3, 4)
+    assert more["next_offset"] == 8
+    assert not more["reset"]
+
+    with open(tmp_path / name, "ab") as f:
+        f.write(b" line\n")
+    rest = tool.execute_follow(name, more["next_offset"])
+    assert rest["content"] == "partial line\n"
+    assert rest["lines_shown"] == (5, 5)
+
+
+def test_follow_resets_after_truncation(tmp_path):
+    tool = _tool(tmp_path)
+    name = _write(tmp_path, b"old 1\nold 2\nold 3\n")
+    offset = tool.execute_follow(name)["next_offset"]
+
+    # ローテートで短くなったら先頭から読み直す
+    _write(tmp_path, b"new\n")
+    result = tool.execute_follow(name, offset)
+    assert result["reset"]
+    assert result["content"] == "new\n"
+    assert result["lines_shown"] == (1, 1)
+    assert result["next_offset"] == 4
+
+
+def test_follow_respects_limit(tmp_path):
+    tool = _tool(tmp_path)
+    name = _write(tmp_path, b"".join(b"%d\n" % i for i in range(10)))
+    result = tool.execute_follow(name, limit=4)
+    assert result["content"] == "0\n1\n2\n3\n"
+    rest = tool.execute_follow(name, result["next_offset"], limit=100)
+    assert rest["lines_shown"] == (5, 10)
+
+
+@pytest.fixture
+def many(tmp_path):
+    for i in range(6):
+        (tmp_path / f"f{i}.txt").write_text(
+            "".join(f"{i}-{n}\n" for n in range(10))
+        )
+    return tmp_path
+
+
+def test_read_many_keeps_request_order(many, monkeypatch):
+    tool = _tool(many)
+    read_range = tool._read_range
+
+    def slow_first(resolved_path, offset, limit):
+        # 先に頼んだファイルほど遅く読み終わるようにする
+        time.sleep(0.05 * (6 - int(os.path.basename(resolved_path)[1])))
+        return read_range(resolved_path, offset, limit)
+
+    monkeypatch.setattr(tool, "_read_range", slow_first)
+    requests = [f"f{i}.txt" for i in range(6)] + ["missing.txt"]
+    results = tool.read_many(requests)
+    assert [r["file_path"] for r in results] == requests
+    for i, r in enumerate(results[:6]):
+        assert r["content"].startswith(f"{i}-0\n")
+    assert "File not found" in results[-1]["error"]
+
+
+def test_read_many_shares_line_budget(many):
+    results = _tool(many).read_many(
+        ["f0.txt", {"file_path": "f1.txt", "offset": 2}, "f2.txt", "f3.txt"],
+        max_total_lines=25,
+    )
+    assert [r["lines_shown"] for r in results[:3]] == [
+        (1, 10),
+        (3, 10),
+        (1, 7),
+    ]
+    assert "use offset=7" in results[2]["content"]
+    assert "budget exhausted" in results[3]["error"]
+
+
+def test_read_many_shares_byte_budget(many):
+    # 1行は "i-n\n" の 4 バイト
+    results = _tool(many).read_many(
+        ["f0.txt", "f1.txt", "f2.txt"], max_total_bytes=50
+    )
+    assert results[0]["lines_shown"] == (1, 10)
+    assert results[1]["lines_shown"] == (1, 2)
+    assert "budget exhausted" in results[2]["error"]
+    shown = sum(len(_body(r).encode()) for r in results[:2])
+    assert shown <= 50
+
+
+def test_read_many_budget_smaller_than_first_line(many):
+    results = _tool(many).read_many(["f0.txt", "f1.txt"], max_total_bytes=3)
+    assert ["budget exhausted" in r["error"] for r in results] == [True, True]
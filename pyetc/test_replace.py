@@ -0,0 +1,132 @@
+import os
+import random
+
+import pytest
+
+import replace
+from config import Config
+from replace import ReplaceStringInFile
+
+# old_string がチャンクの境界をまたぐ場合を小さなファイルで作る
+SMALL_CHUNKS = {(replace, "STREAMING_CHUNK_SIZE"): 7}
+
+
+def _tool(tmp_path):
+    return ReplaceStringInFile(Config(str(tmp_path)))
+
+
+def _leftovers(tmp_path):
+    return [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_streaming_matches_in_memory(tmp_path, seed):
+    rng = random.Random(seed)
+    text = "".join(rng.choice("ab\nあ") for _ in range(rng.randrange(1, 200)))
+    old = "".join(rng.choice("ab\nあ") for _ in range(rng.randrange(1, 4)))
+    new = "".join(rng.choice("xyz\n") for _ in range(rng.randrange(0, 5)))
+    count = text.count(old)
+    if count == 0:
+        return
+
+    streamed = tmp_path / "streamed.txt"
+    in_memory = tmp_path / "in_memory.txt"
+    streamed.write_text(text, encoding="utf-8")
+    in_memory.write_text(text, encoding="utf-8")
+    _tool(tmp_path).execute(str(streamed), old, new, count, streaming=True)
+    _tool(tmp_path).execute(str(in_memory), old, new, count, streaming=False)
+
+    assert streamed.read_bytes() == in_memory.read_bytes()
+    assert streamed.read_text(encoding="utf-8") == text.replace(old, new)
+    assert _leftovers(tmp_path) == []
+
+
+def test_streaming_crlf_matches_in_memory(tmp_path):
+    # テキストモードで読むので、"\n" を含む old_string は "\r\n" にも一致する
+    data = b"one\r\ntwo\r\nthree\r\ntwo\r\n"
+    streamed = tmp_path / "streamed.txt"
+    in_memory = tmp_path / "in_memory.txt"
+    streamed.write_bytes(data)
+    in_memory.write_bytes(data)
+    _tool(tmp_path).execute(str(streamed), "two\n", "2\n", 2, streaming=True)
+    _tool(tmp_path).execute(str(in_memory), "two\n", "2\n", 2, streaming=False)
+    assert streamed.read_bytes() == in_memory.read_bytes()
+
+
+@pytest.mark.parametrize("expected", [1, 3])
+def test_streaming_mismatch_leaves_file_untouched(tmp_path, expected):
+    path = tmp_path / "f.txt"
+    path.write_text("abc abc\n", encoding="utf-8")
+    before = os.stat(path)
+
+    with pytest.raises(ValueError):
+        _tool(tmp_path).execute(str(path), "abc", "x", expected, True)
+
+    assert path.read_text(encoding="utf-8") == "abc abc\n"
+    assert os.stat(path).st_ino == before.st_ino
+    assert _leftovers(tmp_path) == []
+
+
+def test_streaming_not_found_leaves_no_temp_file(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_text("abc\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        _tool(tmp_path).execute(str(path), "zzz", "x", streaming=True)
+    assert _leftovers(tmp_path) == []
+
+
+def test_streaming_open_failure_closes_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / "f.txt"
+    path.write_text("abc\n", encoding="utf-8")
+    fds = []
+    mkstemp = replace.tempfile.mkstemp
+    real_open = open
+
+    def recording_mkstemp(*args, **kwargs):
+        fd, tmp = mkstemp(*args, **kwargs)
+        fds.append(fd)
+        return fd, tmp
+
+    def failing_open(file, *args, **kwargs):
+        if file == os.path.realpath(path):
+            raise PermissionError(file)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(replace.tempfile, "mkstemp", recording_mkstemp)
+    monkeypatch.setattr("builtins.open", failing_open)
+    with pytest.raises(PermissionError):
+        _tool(tmp_path).execute(str(path), "abc", "x", streaming=True)
+    monkeypatch.undo()
+    # 元のファイルを開けなくても、一時ファイルの fd は閉じられている
+    with pytest.raises(OSError):
+        os.fstat(fds[0])
+    assert _leftovers(tmp_path) == []
+
+
+def test_streaming_keeps_mode_and_owner(tmp_path):
+    path = tmp_path / "f.sh"
+    path.write_text("echo hello\n", encoding="utf-8")
+    os.chmod(path, 0o751)
+    before = os.stat(path)
+
+    _tool(tmp_path).execute(str(path), "hello", "bye", streaming=True)
+
+    after = os.stat(path)
+    assert after.st_mode & 0o7777 == 0o751
+    assert (after.st_uid, after.st_gid) == (before.st_uid, before.st_gid)
+    assert path.read_text(encoding="utf-8") == "echo bye\n"
+
+
+def test_streaming_replaces_symlink_target(tmp_path):
+    (tmp_path / "real").mkdir()
+    target = tmp_path / "real" / "f.txt"
+    target.write_text("abc\n", encoding="utf-8")
+    link = tmp_path / "link.txt"
+    link.symlink_to(target)
+
+    _tool(tmp_path).execute(str(link), "abc", "xyz", streaming=True)
+
+    assert link.is_symlink()
+    assert target.read_text(encoding="utf-8") == "xyz\n"
+    assert _leftovers(tmp_path) == []
+    assert _leftovers(tmp_path / "real") == []
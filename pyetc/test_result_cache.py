@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from grep import GrepTool
+
+TREE = {
+    "あ.py": "needle = 1\n",
+    "b.py": "x = 0\nneedle = 2\n",
+    "c.py": "nothing here\n",
+    # FileExclusions や .gitignore で除外されるが、grep -r は検索するもの
+    "build/gen.py": "needle from a generated file\n",
+    "debug.log": "needle in a log\n",
+    "sub/d.py": "needle\n",
+    ".gitignore": "*.log\n",
+}
+
+
+@pytest.fixture(params=["git", "grep", "python"])
+def tree(make_tree, request):
+    return make_tree(TREE, request.param)
+
+
+def _rows(results):
+    return [(m.file_path, m.line_number, m.line_content) for m in results]
+
+
+def _check(tree, cached, include=None):
+    """キャッシュ付きの結果が、キャッシュ無しと同じ順で一致することを確認する"""
+    expected = _rows(GrepTool(str(tree)).execute("needle", include))
+    assert _rows(cached.execute("needle", include)) == expected
+    return [os.path.normpath(r[0]) for r in expected]
+
+
+def test_cached_results_match_uncached(tree):
+    cached = GrepTool(str(tree), cache_bytes=1 << 20)
+    first = _check(tree, cached)
+    assert {"あ.py", "b.py", os.path.join("sub", "d.py")} <= set(first)
+    rescanned = cached.cache.rescanned_files
+    # 2回目は全てキャッシュから返る
+    _check(tree, cached)
+    assert cached.cache.rescanned_files == rescanned
+    assert cached.cache.hits == 1
+
+    _check(tree, cached, include="*.py")
+    _check(tree, cached, include="*.py")
+
+
+def test_cache_follows_changes(tree):
+    cached = GrepTool(str(tree), cache_bytes=1 << 20)
+    _check(tree, cached)
+
+    (tree / "c.py").write_text("needle here\nand needle again\n")
+    os.remove(tree / "b.py")
+    (tree / "e.py").write_text("needle\n")
+    (tree / "build" / "gen.py").write_text("regenerated needle\n")
+    rows = _check(tree, cached)
+    assert {"あ.py", "c.py", "e.py"} <= set(rows)
+    assert "b.py" not in rows
+
+    (tree / "あ.py").write_text("gone\n", encoding="utf-8")
+    rows = _check(tree, cached)
+    assert "あ.py" not in rows
+
+
+def test_cache_uses_the_index(tree):
+    indexed = GrepTool(
+        str(tree), cache_bytes=1 << 20, index_path=str(tree.parent / "index")
+    )
+    _check(tree, indexed)
+    (tree / "c.py").write_text("needle again\n")
+    _check(tree, indexed)
@@ -0,0 +1,47 @@
+import warnings
+
+from read_file import Config, ReadFileTool
+from symbol_index import _parse_file
+
+SOURCE = """import re
+
+
+class Tool:
+    PATTERN = re.compile("\\d+")
+
+    def run(self):
+        a = 1
+        b = 2
+        c = 3
+        return a + b + c
+"""
+
+
+def test_invalid_escape_is_parsed_quietly(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_text(SOURCE)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        _, symbols = _parse_file(str(path), "mod.py")
+    assert [s.name for s in symbols] == ["Tool", "Tool.run"]
+
+
+def test_too_deep_source_is_skipped(tmp_path):
+    path = tmp_path / "deep.py"
+    path.write_text("x = " + "1 + " * 300000 + "1\n")
+    assert _parse_file(str(path), "deep.py") == ("deep.py", None)
+
+
+def test_symbol_read_cut_by_limit_has_header(tmp_path):
+    (tmp_path / "mod.py").write_text(SOURCE)
+    tool = ReadFileTool(Config(str(tmp_path)), symbol_workers=1)
+
+    full = tool.execute(symbol="Tool.run")
+    assert full["lines_shown"] == (7, 11)
+    assert full["content"].startswith("    def run")
+
+    cut = tool.execute(symbol="Tool.run", limit=2)
+    assert cut["lines_shown"] == (7, 8)
+    assert "IMPORTANT: The file content has been truncated." in cut["content"]
+    assert "use offset=8" in cut["content"]
+    assert cut["content"].endswith("        a = 1\n")
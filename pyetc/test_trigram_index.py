@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from grep import GrepTool
+from pattern_analyzer import analyze
+
+PATTERNS = [
+    "foo bar",
+    "foo[[:space:]]bar",
+    "[[:alpha:]]oo bar",
+    "foo[^[:alnum:]]bar",
+    "foo[[=b=]]ar",
+    "foo[\\]]",
+    "class .*Tool",
+    "(foo|baz)qux",
+]
+
+
+TREE = {
+    "a.txt": "foo bar\n",
+    "b.txt": "foobar\nfoo\\]\n",
+    "c.py": "class GrepTool:\n    pass\n",
+    "d.txt": "bazqux\nfoo\tbar\n",
+    # FileExclusions では除外されるが、git grep / grep -r は検索するもの
+    "build/gen.txt": "foo bar from a generated file\n",
+    "a.log": "class LogTool\nfoo bar\n",
+    "sub/n[1].txt": "foo bar\n",
+    "sub/deep/-dash.txt": "bazqux\n",
+    ".gitignore": "*.log\n",
+}
+
+
+@pytest.fixture(params=["git", "grep", "python"])
+def tree(make_tree, request):
+    return make_tree(TREE, request.param)
+
+
+def _rows(results):
+    return [(m.file_path, m.line_number, m.line_content) for m in results]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_narrowed_results_match_unnarrowed(tree, pattern):
+    plain = GrepTool(str(tree))
+    # 索引は検索対象の外に置く（索引の有無でツリーの中身が変わらないように）
+    indexed = GrepTool(str(tree), index_path=str(tree.parent / "index"))
+
+    assert _rows(indexed.execute(pattern)) == _rows(plain.execute(pattern))
+    assert indexed.execute_count(pattern) == plain.execute_count(pattern)
+    assert indexed.execute_files_with_matches(
+        pattern
+    ) == plain.execute_files_with_matches(pattern)
+    assert _rows(indexed.execute_stream(pattern)) == _rows(
+        plain.execute_stream(pattern)
+    )
+    assert _rows(indexed.execute(pattern, include="*.txt")) == _rows(
+        plain.execute(pattern, include="*.txt")
+    )
+
+
+def test_ignored_files_are_still_searched(tree):
+    indexed = GrepTool(str(tree), index_path=str(tree.parent / "index"))
+    found = {os.path.normpath(m.file_path) for m in indexed.execute("foo bar")}
+    plain = {
+        os.path.normpath(m.file_path)
+        for m in GrepTool(str(tree)).execute("foo bar")
+    }
+    assert found == plain
+    assert "c.py" not in found
+
+
+def test_posix_bracket_is_not_narrowed():
+    assert not analyze("foo[[:space:]]bar")
+    assert not analyze("x[[.a.]]yz")
+    assert not analyze("[\\d]abc")
+    assert analyze("foo[ ]bar").clauses == [(b"foo bar",)]
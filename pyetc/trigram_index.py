@@ -0,0 +1,203 @@
+"""GrepTool 用の永続トライグラム索引。
+
+対象ディレクトリ以下のファイルごとに「含まれる3バイト列（トライグラム）」の
+集合を記録しておき、正規表現に必ず含まれるリテラルのトライグラムを全て持つ
+ファイルだけを検索候補として返します。索引はファイルの (mtime, size) を見て
+差分更新され、pickle 形式でディスクに保存されます。
+"""
+
+import logging
+import os
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from index_store import load_index, save_index
+from pattern_analyzer import analyze
+
+logger = logging.getLogger(__name__)
+
+# 索引フォーマットのバージョン（構造を変えたら上げる）
+INDEX_VERSION = 1
+
+# これより大きいファイルは索引せず、常に検索候補として扱う
+MAX_INDEXED_FILE_SIZE = 16 * 1024 * 1024
+
+
+def extract_trigrams(data: bytes) -> FrozenSet[bytes]:
+    """バイト列に含まれるトライグラムの集合を返します（ASCII は小文字化）"""
+    data = data.lower()
+    return frozenset(data[i : i + 3] for i in range(len(data) - 2))
+
+
+class TrigramIndex:
+    """
+    target_dir 以下のファイルのトライグラム索引を管理します。
+
+    exclusions には GrepTool の FileExclusions（walk / is_ignored を
+    持つオブジェクト）を渡します。
+    """
+
+    def __init__(self, root_dir: str, index_path: str, exclusions):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_path = os.path.abspath(index_path)
+        self.exclusions = exclusions
+        # rel_path -> (mtime_ns, size, trigrams)
+        # trigrams が None のファイルは索引対象外（常に候補になる）
+        self.files: Dict[str, Tuple[int, int, Optional[FrozenSet[bytes]]]] = {}
+        # trigram -> rel_path の集合（転置索引。メモリ上のみ）
+        self.postings: Dict[bytes, Set[str]] = {}
+        self._load()
+
+    # --- 永続化 ---
+    def _load(self) -> None:
+        files = load_index(self.index_path, INDEX_VERSION, self.root_dir)
+        if files is None:
+            return
+        self.files = files
+        for rel_path, (_, _, trigrams) in self.files.items():
+            self._add_postings(rel_path, trigrams)
+
+    def save(self) -> None:
+        save_index(self.index_path, INDEX_VERSION, self.root_dir, self.files)
+
+    # --- 転置索引の管理 ---
+    def _add_postings(
+        self, rel_path: str, trigrams: Optional[FrozenSet[bytes]]
+    ) -> None:
+        if trigrams is None:
+            return
+        for t in trigrams:
+            self.postings.setdefault(t, set()).add(rel_path)
+
+    def _remove_postings(self, rel_path: str) -> None:
+        _, _, trigrams = self.files.pop(rel_path)
+        if trigrams is None:
+            return
+        for t in trigrams:
+            paths = self.postings.get(t)
+            if paths is None:
+                continue
+            paths.discard(rel_path)
+            if not paths:
+                del self.postings[t]
+
+    # --- 差分更新 ---
+    def update(self) -> int:
+        """
+        ツリーを走査し、追加・変更・削除されたファイルだけ索引を更新します。
+        更新したファイル数を返します（変更があれば索引を保存します）。
+        """
+        seen = set()
+        changed = 0
+
+        for root, files in self.exclusions.walk(self.root_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                if file_path in (self.index_path, self.index_path + ".tmp"):
+                    continue
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+
+                if self.exclusions.is_ignored(file_path, self.root_dir, st):
+                    continue
+
+                rel_path = os.path.relpath(file_path, self.root_dir)
+                seen.add(rel_path)
+
+                old = self.files.get(rel_path)
+                if old is not None and old[:2] == (st.st_mtime_ns, st.st_size):
+                    continue
+
+                if old is not None:
+                    self._remove_postings(rel_path)
+                trigrams = self._read_trigrams(file_path, st.st_size)
+                self.files[rel_path] = (st.st_mtime_ns, st.st_size, trigrams)
+                self._add_postings(rel_path, trigrams)
+                changed += 1
+
+        for rel_path in [p for p in self.files if p not in seen]:
+            self._remove_postings(rel_path)
+            changed += 1
+
+        if changed:
+            logger.debug(f"Index updated: {changed} file(s)")
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning(f"Failed to save index {self.index_path}: {e}")
+        return changed
+
+    def _read_trigrams(
+        self, file_path: str, size: int
+    ) -> Optional[FrozenSet[bytes]]:
+        if size > MAX_INDEXED_FILE_SIZE:
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                return extract_trigrams(f.read())
+        except OSError:
+            return None
+
+    # --- 検索 ---
+    def candidates(self, pattern: str) -> Optional[List[str]]:
+        """
+        pattern にマッチし得るファイルの相対パス一覧を返します。
+        必須トライグラムが取り出せず絞り込めない場合は None を返します。
+        """
+        matched = self._matching(pattern)
+        if matched is None:
+            return None
+
+        # 索引対象外のファイルは常に候補
+        result = {p for p, (_, _, t) in self.files.items() if t is None}
+        result |= matched
+        return sorted(result)
+
+    def rejected(self, pattern: str) -> Optional[Set[str]]:
+        """
+        索引済みのファイルのうち、pattern にマッチし得ないと分かったものの
+        相対パスの集合を返します。絞り込めない場合は None を返します。
+        索引に無いファイルは、マッチし得ないとは言えないので含みません。
+        """
+        matched = self._matching(pattern)
+        if matched is None:
+            return None
+        return {
+            p
+            for p, (_, _, t) in self.files.items()
+            if t is not None and p not in matched
+        }
+
+    def _matching(self, pattern: str) -> Optional[Set[str]]:
+        """必須トライグラムを全て持つ索引済みファイルの集合を返します"""
+        # 必須条件 (OR 集合の AND) のうち、全選択肢が3バイト以上のものを使う
+        clauses = [
+            clause
+            for clause in analyze(pattern).clauses
+            if all(len(lit) >= 3 for lit in clause)
+        ]
+        if not clauses:
+            return None
+
+        matched: Optional[Set[str]] = None
+        for clause in clauses:
+            # OR 集合: どれかのリテラルのトライグラムを全て持つファイルの和集合
+            paths: Set[str] = set()
+            for lit in clause:
+                paths |= self._files_with_all(extract_trigrams(lit))
+            matched = paths if matched is None else matched & paths
+            if not matched:
+                break
+        return matched or set()
+
+    def _files_with_all(self, trigrams: FrozenSet[bytes]) -> Set[str]:
+        """全てのトライグラムを含むファイルの集合を返します"""
+        matched: Optional[Set[str]] = None
+        # 出現ファイル数の少ないトライグラムから積集合を取る
+        for t in sorted(trigrams, key=lambda t: len(self.postings.get(t, ()))):
+            paths = self.postings.get(t, set())
+            matched = set(paths) if matched is None else matched & paths
+            if not matched:
+                break
+        return matched or set()